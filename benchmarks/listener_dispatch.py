@@ -0,0 +1,120 @@
+r"""Benchmarks the overhead of dispatching a packet to its listeners.
+
+A :class:`~.Client` dispatching a packet to no listeners and to
+one listener, and a :class:`~.Proxy` forwarding a packet, are
+each compared against creating a task per listener within a
+listener task group, as they did before awaiting sequential
+listeners inline::
+
+    python benchmarks/listener_dispatch.py
+"""
+
+import asyncio
+import time
+import pak
+import caseus
+
+NUMBER = 20_000
+
+REPEAT = 5
+
+class ReferenceClient(caseus.Client):
+    # The implementation before awaiting listeners inline.
+
+    async def _listen_to_packet(self, server, packet, *, outgoing):
+        async with self.listener_task_group(listen_sequentially=self._listen_sequentially) as group:
+            for listener in self.listeners_for_packet(packet, outgoing=outgoing):
+                group.create_task(listener(server, packet))
+
+class ReferenceProxy(caseus.Proxy):
+    # The implementation before proxying packets inline.
+
+    async def _listen_to_packet(self, source_conn, packet):
+        async with self.listener_task_group(listen_sequentially=source_conn._listen_sequentially) as group:
+            before_listeners = self.listeners_for_packet(packet, after=False)
+            async def proxy_wrapper():
+                results = await asyncio.gather(*[listener(source_conn, packet) for listener in before_listeners])
+
+                if self.DO_NOTHING in results:
+                    return
+
+                if self.REPLACE_PACKET in results:
+                    await source_conn.destination._replace_packet(packet)
+
+                    return
+
+                await source_conn.destination.write_packet_instance(packet)
+
+                after_listeners = self.listeners_for_packet(packet, after=True)
+                await asyncio.gather(*[listener(source_conn, packet) for listener in after_listeners])
+
+            group.create_task(proxy_wrapper())
+
+async def _listener(source, packet):
+    pass
+
+async def _time(func, *args, **kwargs):
+    # The best of several repeats, in microseconds per call.
+
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+
+        for _ in range(NUMBER):
+            await func(*args, **kwargs)
+
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best / NUMBER * 1_000_000
+
+def _client(client_cls, *, listening):
+    client = client_cls(
+        secrets       = caseus.Secrets(),
+        username      = "Username",
+        password_hash = "",
+        start_room    = "1",
+    )
+
+    if listening:
+        client.register_packet_listener(_listener, caseus.clientbound.SetFacingPacket, outgoing=False)
+
+    return client
+
+def _proxy_connection(proxy_cls):
+    proxy = proxy_cls()
+
+    source = proxy.ServerConnection(proxy, reader=asyncio.StreamReader(), writer=pak.io.ByteStreamWriter())
+
+    source.destination = proxy.ClientConnection(proxy, destination=source, reader=asyncio.StreamReader(), writer=pak.io.ByteStreamWriter())
+
+    return proxy, source
+
+async def main():
+    packet = caseus.clientbound.SetFacingPacket(session_id=1, facing_right=True)
+    packet.make_immutable()
+
+    print(f"{'dispatch':>24}  {'reference':>11}  {'inline':>10}")
+
+    for listening in (False, True):
+        reference = _client(ReferenceClient, listening=listening)
+        current   = _client(caseus.Client,   listening=listening)
+
+        print(
+            f"{'Client, ' + ('one listener' if listening else 'no listeners'):>24}  "
+            f"{await _time(reference._listen_to_packet, None, packet, outgoing=False):>9.2f}us  "
+            f"{await _time(current._listen_to_packet,   None, packet, outgoing=False):>8.2f}us"
+        )
+
+    reference, reference_source = _proxy_connection(ReferenceProxy)
+    current,   current_source   = _proxy_connection(caseus.Proxy)
+
+    print(
+        f"{'Proxy, forward a packet':>24}  "
+        f"{await _time(reference._listen_to_packet, reference_source, packet):>9.2f}us  "
+        f"{await _time(current._listen_to_packet,   current_source,   packet):>8.2f}us"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+r"""Benchmarks resolving the listeners for a packet.
+
+A :class:`pak.AsyncPacketHandler`, which walks every registered
+listener for each packet, is compared against the caching
+:class:`caseus.util.AsyncPacketHandler`, each with 50 listeners
+registered across several packet classes and flags, as a
+:class:`~.Proxy` would have before and after forwarding::
+
+    python benchmarks/listener_resolution.py
+"""
+
+import timeit
+import pak
+import caseus
+
+NUM_LISTENERS = 50
+
+NUMBER = 2000
+
+# Movement traffic, which is listened to, and
+# pings, which no listener is registered for.
+PACKETS = (
+    caseus.clientbound.PlayerMovementPacket(),
+    caseus.clientbound.SetFacingPacket(),
+    caseus.clientbound.PingPacket(),
+)
+
+LISTENED_CLASSES = (
+    caseus.clientbound.PlayerMovementPacket,
+    caseus.clientbound.SetFacingPacket,
+    caseus.clientbound.ObjectSyncPacket,
+    caseus.clientbound.RoomMessagePacket,
+    caseus.clientbound.LoadShopPacket,
+)
+
+def _listener():
+    async def listener(source, packet):
+        pass
+
+    return listener
+
+LISTENERS = [_listener() for _ in range(NUM_LISTENERS)]
+
+def _register_listeners(handler):
+    for i, listener in enumerate(LISTENERS):
+        handler.register_packet_listener(listener, LISTENED_CLASSES[i % len(LISTENED_CLASSES)], after=(i % 2 == 0))
+
+    return handler
+
+def _time(func, *args, **kwargs):
+    # The best of several repeats, in microseconds per call.
+    return min(timeit.repeat(lambda: func(*args, **kwargs), number=NUMBER, repeat=5)) / NUMBER * 1_000_000
+
+def main():
+    reference = _register_listeners(pak.AsyncPacketHandler())
+    current   = _register_listeners(caseus.util.AsyncPacketHandler())
+
+    print(f"{'packet':>22}  {'reference':>11}  {'cached':>10}")
+
+    for packet in PACKETS:
+        for after in (False, True):
+            assert current.listeners_for_packet(packet, after=after) == reference.listeners_for_packet(packet, after=after)
+
+        print(
+            f"{type(packet).__qualname__:>22}  "
+            f"{_time(reference.listeners_for_packet, packet, after=False):>9.2f}us  "
+            f"{_time(current.listeners_for_packet,   packet, after=False):>8.2f}us"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+r"""Benchmarks decoding :class:`.clientbound.LoadShopPacket`.
+
+The eager :class:`.clientbound.LoadShopPacket` is compared against
+the :class:`~.LazyLoadShopPacket`, for a shop the size of a
+long-time player's, in the time taken and memory kept to:
+
+- unpack the packet and read the player's cheese,
+- and unpack the packet and total the cheese cost of every item,
+  which the lazy packet streams through.
+
+::
+
+    python benchmarks/load_shop.py
+"""
+
+import time
+import tracemalloc
+import caseus
+
+LoadShopPacket = caseus.clientbound.LoadShopPacket
+
+NUM_ITEMS                = 3000
+NUM_OWNED_ITEMS          = 1000
+NUM_SHAMAN_OBJECTS       = 500
+NUM_OWNED_SHAMAN_OBJECTS = 300
+NUM_EMOJIS               = 200
+NUM_BANNERS              = 100
+
+REPEAT = 5
+
+def _load_shop_body():
+    return LoadShopPacket(
+        cheese  = 1234,
+        fraises = 56,
+
+        owned_items = [
+            LoadShopPacket.OwnedShopItemInfo(unique_id=i, favorited=(i % 7 == 0), colors=[0xFF0000, -1] if i % 3 == 0 else [])
+
+            for i in range(NUM_OWNED_ITEMS)
+        ],
+
+        items = [
+            LoadShopPacket.ItemInfo(category_id=i % 20, item_id=i, cheese_cost=20 + i, fraise_cost=-1, needed_item=5 if i % 10 == 0 else None)
+
+            for i in range(NUM_ITEMS)
+        ],
+
+        outfits            = [LoadShopPacket.OutfitInfo(outfit_id=i, look="1;0,0,0,0,0,0,0,0,0") for i in range(50)],
+        owned_outfit_looks = ["1;0,0,0,0,0,0,0,0,0"] * 20,
+
+        owned_shaman_objects = [
+            LoadShopPacket.OwnedShamanObjectInfo(shaman_object_id=i, equipped=(i % 2 == 0), colors=[1, 2] if i % 4 == 0 else None)
+
+            for i in range(NUM_OWNED_SHAMAN_OBJECTS)
+        ],
+
+        shaman_objects = [LoadShopPacket.ShamanObjectInfo(shaman_object_id=i, cheese_cost=10) for i in range(NUM_SHAMAN_OBJECTS)],
+
+        emojis          = [LoadShopPacket.EmojiInfo(emoji_id=i, fraise_cost=-1) for i in range(NUM_EMOJIS)],
+        owned_emoji_ids = list(range(0, NUM_EMOJIS, 2)),
+
+        banners           = [LoadShopPacket.BannerInfo(banner_id=i, cheese_cost=200) for i in range(NUM_BANNERS)],
+        owned_banner_ids  = list(range(0, NUM_BANNERS, 3)),
+        current_banner_id = 3,
+    ).pack_without_header()
+
+def _read_cheese(packet_cls, body):
+    packet = packet_cls.unpack(body)
+
+    return packet, packet.cheese
+
+def _total_item_cost(packet_cls, body):
+    packet = packet_cls.unpack(body)
+
+    return packet, sum(item.cheese_cost for item in packet.items)
+
+def _measure(func, packet_cls, body):
+    # The best time of several repeats in milliseconds,
+    # and the memory kept and peak memory in KiB.
+
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(packet_cls, body)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    tracemalloc.start()
+    try:
+        # NOTE: We keep the packet alive so
+        # that its memory is still traced.
+        packet, result = func(packet_cls, body)
+
+        kept, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    return result, best * 1_000, kept / 1024, peak / 1024
+
+def main():
+    body = _load_shop_body()
+
+    print(f"shop packet body: {len(body) / 1024:.1f} KiB")
+    print()
+    print(f"{'':>16}  {'eager time/kept/peak':>32}  {'lazy time/kept/peak':>32}")
+
+    for name, func in (("read cheese", _read_cheese), ("total item cost", _total_item_cost)):
+        eager_result, *eager = _measure(func, LoadShopPacket,                   body)
+        lazy_result,  *lazy  = _measure(func, caseus.packets.LazyLoadShopPacket, body)
+
+        assert eager_result == lazy_result
+
+        print(
+            f"{name:>16}  "
+            f"{eager[0]:>8.1f}ms/{eager[1]:>7.0f}KiB/{eager[2]:>7.0f}KiB  "
+            f"{lazy[0]:>8.1f}ms/{lazy[1]:>7.0f}KiB/{lazy[2]:>7.0f}KiB"
+        )
+
+if __name__ == "__main__":
+    main()
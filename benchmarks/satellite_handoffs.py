@@ -0,0 +1,139 @@
+r"""Benchmarks the bookkeeping a :class:`~.Proxy` does per session.
+
+For each number of concurrent sessions, each with a pending
+handoff to a satellite server, this times a session logging
+into the satellite server and being handed off again, and
+then a session's connection closing. Each is compared against
+the list the :class:`~.Proxy` scanned for handoffs and the
+lists it removed closed connections from before::
+
+    python benchmarks/satellite_handoffs.py
+"""
+
+import asyncio
+import random
+import time
+import pak
+import caseus
+
+# A busy proxy, and a proxy for a whole community.
+SESSIONS = (1_000, 10_000)
+
+# The number of sessions which log into the satellite server.
+LOGINS = 200
+
+REPEAT = 3
+
+class _ReferenceRegistry(list):
+    # The lists which connections were kept in before using sets.
+
+    def add(self, client):
+        self.append(client)
+
+    def discard(self, client):
+        try:
+            self.remove(client)
+
+        # We might already have been closed.
+        except ValueError:
+            pass
+
+class ReferenceProxy(caseus.Proxy):
+    # The implementation before indexing handoffs by auth ID.
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.main_clients      = _ReferenceRegistry()
+        self.satellite_clients = _ReferenceRegistry()
+
+        self._satellite_packets = []
+
+    def _satellite_info_with_auth_id(self, auth_id):
+        for packet, main_client in self._satellite_packets:
+            if packet.auth_id == auth_id:
+                return packet, main_client
+
+        return None, None
+
+    def _add_satellite_handoff(self, packet, main_client, *, now=None):
+        self._satellite_packets.append((packet, main_client))
+
+    def _pop_satellite_handoff(self, auth_id, *, now=None):
+        original_packet, main_client = self._satellite_info_with_auth_id(auth_id)
+        if original_packet is not None:
+            self._satellite_packets.remove((original_packet, main_client))
+
+        return original_packet, main_client
+
+def _time_handoffs(proxy, packets):
+    for packet in packets:
+        proxy._add_satellite_handoff(packet, None, now=0)
+
+    logins = random.sample(packets, LOGINS)
+
+    start = time.perf_counter()
+
+    for packet in logins:
+        assert proxy._pop_satellite_handoff(packet.auth_id, now=0)[0] is packet
+
+        proxy._add_satellite_handoff(packet, None, now=0)
+
+    elapsed = time.perf_counter() - start
+
+    for packet in packets:
+        proxy._pop_satellite_handoff(packet.auth_id, now=0)
+
+    return elapsed / LOGINS
+
+def _time_closes(proxy, num_sessions):
+    clients = [
+        proxy.ClientConnection(proxy, reader=asyncio.StreamReader(), writer=pak.io.ByteStreamWriter())
+
+        for _ in range(num_sessions)
+    ]
+
+    random.shuffle(clients)
+
+    start = time.perf_counter()
+
+    for client in clients:
+        client.close()
+
+    return (time.perf_counter() - start) / num_sessions
+
+def _best(func, *args):
+    # The best of several repeats, in microseconds.
+    return min(func(*args) for _ in range(REPEAT)) * 1_000_000
+
+async def main():
+    print(f"{'sessions':>8}  {'reference handoff/close':>25}  {'Proxy handoff/close':>22}")
+
+    for num_sessions in SESSIONS:
+        packets = [
+            caseus.clientbound.ChangeSatelliteServerPacket(auth_id=auth_id, address="address", ports=[1])
+
+            for auth_id in range(num_sessions)
+        ]
+
+        reference = ReferenceProxy()
+        current   = caseus.Proxy()
+
+        reference_times = (
+            _best(_time_handoffs, reference, packets),
+            _best(_time_closes,   reference, num_sessions),
+        )
+
+        current_times = (
+            _best(_time_handoffs, current, packets),
+            _best(_time_closes,   current, num_sessions),
+        )
+
+        print(
+            f"{num_sessions:>8}  "
+            f"{reference_times[0]:>12.1f}/{reference_times[1]:<10.1f}us  "
+            f"{current_times[0]:>9.1f}/{current_times[1]:<10.1f}us"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
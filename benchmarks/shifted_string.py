@@ -0,0 +1,84 @@
+r"""Benchmarks packing and unpacking :class:`~.ShiftedString`.
+
+Each is compared against shifting every byte in Python,
+as :class:`~.ShiftedString` did before translating bytes
+with precomputed tables, for strings of several sizes::
+
+    python benchmarks/shifted_string.py
+"""
+
+import timeit
+import pak
+import caseus
+
+from caseus.types import ShiftedString, String, UnsignedShort
+
+# A chat message, a typical room message, and a large localized string.
+SIZES = (12, 525, 31386)
+
+NUMBER = 200
+
+class ReferenceShiftedString(ShiftedString):
+    # The implementation before translating bytes with tables.
+
+    @classmethod
+    def _unpack(cls, buf, *, ctx):
+        if ctx.is_bot_role() or ctx.secrets.game_version is None:
+            return String.unpack(buf, ctx=ctx)
+
+        data_length = UnsignedShort.unpack(buf, ctx=ctx)
+
+        data = buf.read(data_length)
+        if len(data) < data_length:
+            raise pak.util.BufferOutOfDataError("Reading shifted string data failed")
+
+        shift_amount = cls._shift_amount(ctx=ctx)
+
+        return bytes((byte + shift_amount) & 0xFF for byte in data).decode()
+
+    @classmethod
+    def _pack(cls, value, *, ctx):
+        if ctx.is_bot_role() or ctx.secrets.game_version is None:
+            return String.pack(value, ctx=ctx)
+
+        shift_amount = cls._shift_amount(ctx=ctx)
+
+        data = bytes((byte - shift_amount) & 0xFF for byte in value.encode())
+
+        return UnsignedShort.pack(len(data), ctx=ctx) + data
+
+def _time(func, *args, **kwargs):
+    # The best of several repeats, in microseconds per call.
+    return min(timeit.repeat(lambda: func(*args, **kwargs), number=NUMBER, repeat=5)) / NUMBER * 1_000_000
+
+def main():
+    ctx = pak.Type.Context(ctx=caseus.ServerboundPacket.Context(caseus.Secrets(game_version=3, auth_key=0)))
+
+    print(f"{'size':>8}  {'reference pack/unpack':>24}  {'ShiftedString pack/unpack':>28}")
+
+    for size in SIZES:
+        value = ("shifted é" * (size // 10 + 1)).encode()[:size].decode(errors="ignore")
+
+        data = ShiftedString.pack(value, ctx=ctx)
+
+        assert data == ReferenceShiftedString.pack(value, ctx=ctx)
+        assert ShiftedString.unpack(data, ctx=ctx) == ReferenceShiftedString.unpack(data, ctx=ctx) == value
+
+        reference = (
+            _time(ReferenceShiftedString.pack,   value, ctx=ctx),
+            _time(ReferenceShiftedString.unpack, data,  ctx=ctx),
+        )
+
+        current = (
+            _time(ShiftedString.pack,   value, ctx=ctx),
+            _time(ShiftedString.unpack, data,  ctx=ctx),
+        )
+
+        print(
+            f"{len(value.encode()):>8}  "
+            f"{reference[0]:>10.1f}/{reference[1]:<10.1f}us  "
+            f"{current[0]:>12.1f}/{current[1]:<10.1f}us"
+        )
+
+if __name__ == "__main__":
+    main()
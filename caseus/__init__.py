@@ -1,21 +1,94 @@
-import importlib.metadata
+# NOTE: Our subpackages, and the packets especially, are
+# costly to import, and so we only import them once they're
+# accessed, so that e.g. 'python -m caseus shakikoo' doesn't
+# pay for what it doesn't use. See PEP 562 for the mechanism.
 
-# Dynamically get version.
-__version__ = importlib.metadata.version(__name__)
+from importlib import import_module as _import_module
 
-# Remove import from our exported variables
-del importlib
+_LAZY_SUBMODULES = {
+    "clients",
+    "enums",
+    "game",
+    "loadtest",
+    "packets",
+    "proxies",
+    "secrets",
+    "servers",
+    "sniffers",
+    "stats",
+    "types",
+    "util",
+}
 
-from . import types
-from . import clients
-from . import proxies
-from . import secrets
-from . import servers
-from . import game
+# The submodules exported by 'from caseus import *',
+# as were always imported before they were lazy.
+_STAR_SUBMODULES = (
+    "clients",
+    "enums",
+    "game",
+    "packets",
+    "proxies",
+    "secrets",
+    "servers",
+    "types",
+    "util",
+)
 
-from .packets import *
+# Maps attributes to the submodules they're from.
+_LAZY_ATTRS = {
+    "Client":        "clients",
+    "Proxy":         "proxies",
+    "Secrets":       "secrets",
+    "MinimalServer": "servers",
+}
 
-from .clients  import Client
-from .proxies  import Proxy
-from .secrets import Secrets
-from .servers  import MinimalServer
+def __getattr__(name):
+    if name == "__version__":
+        # NOTE: 'importlib.metadata' is itself slow to import.
+        import importlib.metadata
+
+        value = importlib.metadata.version(__name__)
+
+    elif name == "__all__":
+        # NOTE: 'from caseus import *' looks up '__all__'
+        # through us, and then each name within it, so
+        # that only star-imports pay for what they export.
+        packets = _import_module(".packets", __name__)
+
+        value = [
+            *_STAR_SUBMODULES,
+            *_LAZY_ATTRS,
+
+            *(name for name in dir(packets) if not name.startswith("_") and name not in _LAZY_SUBMODULES),
+        ]
+
+    elif name in _LAZY_SUBMODULES:
+        # NOTE: Importing a submodule sets it as
+        # an attribute of ours, so we're not
+        # called again for it.
+        return _import_module(f".{name}", __name__)
+
+    elif name in _LAZY_ATTRS:
+        value = getattr(_import_module(f".{_LAZY_ATTRS[name]}", __name__), name)
+
+    else:
+        # Everything public from our packets is exported.
+        packets = _import_module(".packets", __name__)
+
+        if name.startswith("_") or not hasattr(packets, name):
+            raise AttributeError(f"module {repr(__name__)} has no attribute {repr(name)}")
+
+        value = getattr(packets, name)
+
+    globals()[name] = value
+
+    return value
+
+def __dir__():
+    packets = _import_module(".packets", __name__)
+
+    return sorted(
+        set(globals()) | _LAZY_SUBMODULES | set(_LAZY_ATTRS) | {"__version__"} |
+
+        {name for name in dir(packets) if not name.startswith("_")}
+    )
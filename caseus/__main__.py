@@ -1,22 +1,53 @@
-from . import util
-
-from .proxies import LoggingProxy
-from .servers import LoggingServer
-
 import argparse
 
+# NOTE: We import what each action needs only when
+# it's run so that each action stays quick to start.
+
 def run_proxy(args):
+    from .proxies import LoggingProxy
+
     print("Proxying...")
 
     LoggingProxy().run()
 
 def run_server(args):
+    from .servers import LoggingServer
+
     print("Serving...")
 
     LoggingServer().run()
 
 def run_shakikoo(args):
-    print("Shakikoo hash:", util.shakikoo(args.target))
+    from .util.crypto import shakikoo
+
+    print("Shakikoo hash:", shakikoo(args.target))
+
+def run_loadtest(args):
+    import asyncio
+    import json
+
+    from .loadtest import LoadTest, local_load_test
+    from .util     import MemoryTransport
+
+    options = dict(
+        num_clients   = args.clients,
+        connect_rate  = args.connect_rate,
+        duration      = args.duration,
+        movement_rate = args.movement_rate,
+        chat_rate     = args.chat_rate,
+    )
+
+    if args.address is not None:
+        report = LoadTest(args.address, args.port, **options).run()
+    else:
+        transport = MemoryTransport() if args.in_memory else None
+
+        report = asyncio.run(local_load_test(proxy=args.proxy, transport=transport, **options))
+
+    if args.json:
+        print(json.dumps(report.snapshot(), indent=4))
+    else:
+        print(report.format())
 
 def main(args):
     if args.action == "proxy":
@@ -28,6 +59,9 @@ def main(args):
     elif args.action == "shakikoo":
         run_shakikoo(args)
 
+    elif args.action == "loadtest":
+        run_loadtest(args)
+
 parser = argparse.ArgumentParser(prog="caseus")
 
 subparsers = parser.add_subparsers()
@@ -43,4 +77,19 @@ shakikoo_parser.set_defaults(action="shakikoo")
 
 shakikoo_parser.add_argument("target", help="The string to hash")
 
+loadtest_parser = subparsers.add_parser("loadtest")
+loadtest_parser.set_defaults(action="loadtest")
+
+loadtest_parser.add_argument("--clients",       type=int,   default=100, help="The number of clients to run")
+loadtest_parser.add_argument("--connect-rate",  type=float, default=100, help="How many clients to start per second")
+loadtest_parser.add_argument("--duration",      type=float, default=10,  help="How long to send traffic for once every client is started")
+loadtest_parser.add_argument("--movement-rate", type=float, default=10,  help="How many movement packets each client sends per second")
+loadtest_parser.add_argument("--chat-rate",     type=float, default=0.5, help="How many chat messages each client sends per second")
+
+loadtest_parser.add_argument("--address",   help="The address of a running server to test, instead of a local one")
+loadtest_parser.add_argument("--port",      type=int, default=11801, help="The port of the running server to test")
+loadtest_parser.add_argument("--proxy",     action="store_true", help="Front the local server with a proxy")
+loadtest_parser.add_argument("--in-memory", action="store_true", help="Connect to the local server without sockets")
+loadtest_parser.add_argument("--json",      action="store_true", help="Print the results as JSON")
+
 main(parser.parse_args())
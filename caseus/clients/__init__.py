@@ -1,3 +1,4 @@
 from .client import *
 from .debug  import *
+from .keep_alive import *
 from .util   import *
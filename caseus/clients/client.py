@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import io
 import random
 import fixedint
@@ -8,13 +9,20 @@ from public import public
 
 from ..packets import (
     ClientboundPacket,
+    ColumnarObjectSyncPacket,
+    LazyLoadShopPacket,
+    immutable_view,
     serverbound,
     clientbound,
 )
 
+from ..util import AsyncPacketHandler, TCPTransport
+
 from .. import enums
 from .. import types
 
+_NOT_TIMED = contextlib.nullcontext()
+
 @public
 class AccountError(Exception):
     def __init__(self, error_code):
@@ -23,7 +31,7 @@ class AccountError(Exception):
         super().__init__(f"Error code: '{error_code}'")
 
 @public
-class Client(pak.AsyncPacketHandler):
+class Client(AsyncPacketHandler):
     # NOTE: By default, we act like a Windows standalone client.
     # These values are directly taken from such.
 
@@ -42,11 +50,30 @@ class Client(pak.AsyncPacketHandler):
     FLASH_VERSION       = "WIN 50,1,1,2"
     LOADER_URL          = "app:/TransformiceAIR.swf/[[DYNAMIC]]/2/[[DYNAMIC]]/4"
 
-    class Connection(pak.io.Connection):
-        def __init__(self, client, **kwargs):
-            super().__init__(ctx=ClientboundPacket.Context(client.secrets), **kwargs)
+    class BaseConnection(pak.io.Connection):
+        """A connection framing packets just as the game client does.
 
-            self.client = client
+        No listeners are dispatched to and no metrics are
+        recorded, so that this may be used without a :class:`Client`.
+
+        Parameters
+        ----------
+        secrets : :class:`~.Secrets`
+            The secrets of the connection.
+        clientbound_overrides : :class:`dict` or ``None``
+            Maps packet IDs to the packet classes to
+            read in place of the usual ones for them.
+        **kwargs
+            Forwarded to :class:`pak.io.Connection`.
+        """
+
+        def __init__(self, *, secrets, clientbound_overrides=None, **kwargs):
+            super().__init__(ctx=ClientboundPacket.Context(secrets), **kwargs)
+
+            if clientbound_overrides is None:
+                clientbound_overrides = {}
+
+            self.clientbound_overrides = clientbound_overrides
 
             self.fingerprint = random.randrange(0, 90)
 
@@ -67,27 +94,50 @@ class Client(pak.AsyncPacketHandler):
             if data is None:
                 return None
 
-            buf = io.BytesIO(data)
+            return self._decode_packet(io.BytesIO(data), size=len(data))
+
+        def _decode_packet(self, buf, *, size):
+            return self._packet_from_data(buf)
 
+        def _packet_from_data(self, buf):
             header = ClientboundPacket.Header.unpack(buf, ctx=self.ctx)
 
-            packet_cls = ClientboundPacket.subclass_with_id(header.id, ctx=self.ctx)
+            packet_cls = None
+
+            overrides = self.clientbound_overrides
+            if len(overrides) > 0:
+                packet_cls = overrides.get(header.id)
+
+            if packet_cls is None:
+                packet_cls = ClientboundPacket.subclass_with_id(header.id, ctx=self.ctx)
+
             if packet_cls is None:
                 packet_cls = ClientboundPacket.GenericWithID(header.id)
 
             return packet_cls.unpack(buf, ctx=self.ctx)
 
-        async def write_packet_instance(self, packet):
-            header = packet.Header(fingerprint=self.fingerprint, id=packet.id(ctx=self.ctx))
+        def _advance_fingerprint(self):
+            fingerprint = self.fingerprint
 
             self.fingerprint = (self.fingerprint + 1) % 100
 
-            packet_body = packet.pack_without_header(ctx=self.ctx)
-            packet_body = packet.cipher_data(packet_body, ctx=self.ctx, fingerprint=header.fingerprint)
+            return fingerprint
+
+        def _timed(self, name, packet_cls, direction):
+            return _NOT_TIMED
+
+        def _packet_frame(self, packet, *, fingerprint):
+            header = packet.Header(fingerprint=fingerprint, id=packet.id(ctx=self.ctx))
+
+            with self._timed("encode", type(packet), "outgoing"):
+                packet_body = packet.pack_without_header(ctx=self.ctx)
+
+            with self._timed("cipher", type(packet), "outgoing"):
+                packet_body = packet.cipher_data(packet_body, ctx=self.ctx, fingerprint=header.fingerprint)
 
             packet_data = header.pack(ctx=self.ctx) + packet_body
 
-            await self.write_data(
+            return (
                 types.PacketLength.pack(
                     len(packet_data) - 1,
 
@@ -97,7 +147,56 @@ class Client(pak.AsyncPacketHandler):
                 packet_data
             )
 
-            await self.client._listen_to_packet_with_fingerprint(self, packet, fingerprint=header.fingerprint)
+        async def _packet_written(self, packet, frame, *, fingerprint):
+            # Called after each packet is written.
+
+            pass
+
+        async def write_packet_instance(self, packet, *, frame_cache=None):
+            fingerprint = self._advance_fingerprint()
+
+            if frame_cache is None:
+                frame = self._packet_frame(packet, fingerprint=fingerprint)
+
+            else:
+                # NOTE: It is up to the caller to only use a frame
+                # cache for packets which would all be packed the
+                # same, e.g. for a single, immutable packet.
+                frame_key = (self.ctx, fingerprint)
+
+                frame = frame_cache.get(frame_key)
+                if frame is None:
+                    frame = self._packet_frame(packet, fingerprint=fingerprint)
+
+                    frame_cache[frame_key] = frame
+
+            await self.write_data(frame)
+
+            await self._packet_written(packet, frame, fingerprint=fingerprint)
+
+    class Connection(BaseConnection):
+        def __init__(self, client, **kwargs):
+            super().__init__(secrets=client.secrets, clientbound_overrides=client._clientbound_overrides, **kwargs)
+
+            self.client = client
+
+        def _decode_packet(self, buf, *, size):
+            metrics = self.client.metrics
+            if metrics is not None:
+                return metrics.decode_packet(self._packet_from_data, buf, size=size)
+
+            return self._packet_from_data(buf)
+
+        def _timed(self, name, packet_cls, direction):
+            return self.client._timed(name, packet_cls, direction)
+
+        async def _packet_written(self, packet, frame, *, fingerprint):
+            metrics = self.client.metrics
+            if metrics is not None:
+                # NOTE: The fingerprint is not included in the packet length.
+                metrics.count_packet(type(packet), "outgoing", types.PacketLength.unpack(frame) + 1)
+
+            await self.client._listen_to_packet_with_fingerprint(self, packet, fingerprint=fingerprint)
 
     def __init__(
         self,
@@ -116,6 +215,13 @@ class Client(pak.AsyncPacketHandler):
         connect_to_satellite = True,
 
         listen_sequentially = False,
+
+        keep_alive_scheduler = None,
+
+        columnar_object_sync = False,
+        lazy_load_shop       = False,
+
+        transport = None,
     ):
         super().__init__()
 
@@ -146,6 +252,26 @@ class Client(pak.AsyncPacketHandler):
         self.listen_sequentially  = listen_sequentially
         self._listen_sequentially = True
 
+        self.keep_alive_scheduler = keep_alive_scheduler
+
+        # Maps packet IDs to the packet classes to
+        # read in place of the usual ones for them.
+        self._clientbound_overrides = {}
+
+        if columnar_object_sync:
+            self._clientbound_overrides[ColumnarObjectSyncPacket.id()] = ColumnarObjectSyncPacket
+
+        if lazy_load_shop:
+            self._clientbound_overrides[LazyLoadShopPacket.id()] = LazyLoadShopPacket
+
+        if transport is None:
+            transport = TCPTransport()
+
+        self.transport = transport
+
+        # Set whenever we connect to a new satellite server.
+        self._satellite_changed = None
+
     def is_bot_role(self):
         return self.secrets.is_bot_role()
 
@@ -163,23 +289,25 @@ class Client(pak.AsyncPacketHandler):
         if len(listeners) <= 0:
             return
 
-        packet = packet.immutable_copy(fingerprint=fingerprint)
+        packet = immutable_view(packet, fingerprint=fingerprint)
 
-        async with self.listener_task_group(listen_sequentially=self._listen_sequentially) as group:
-            for listener in listeners:
-                group.create_task(listener(server, packet))
+        await self._dispatch_to_listeners(listeners, server, packet, listen_sequentially=self._listen_sequentially)
 
     async def _listen_to_packet(self, server, packet, *, outgoing):
-        async with self.listener_task_group(listen_sequentially=self._listen_sequentially) as group:
-            for listener in self.listeners_for_packet(packet, outgoing=outgoing):
-                # NOTE: The game does not track what connection
-                # a packet came from, and so almost all packet
-                # listeners should simply ignore the passed
-                # connection. However some listeners will need
-                # to know what connection a packet came from,
-                # and as a matter of principle it would be
-                # unfortunate to throw away such information.
-                group.create_task(listener(server, packet))
+        # NOTE: The game does not track what connection
+        # a packet came from, and so almost all packet
+        # listeners should simply ignore the passed
+        # connection. However some listeners will need
+        # to know what connection a packet came from,
+        # and as a matter of principle it would be
+        # unfortunate to throw away such information.
+        await self._dispatch_to_listeners(
+            self.listeners_for_packet(packet, outgoing=outgoing),
+
+            server, packet,
+
+            listen_sequentially = self._listen_sequentially,
+        )
 
     async def listen(self, server):
         try:
@@ -223,7 +351,7 @@ class Client(pak.AsyncPacketHandler):
     async def open_streams(self, address, ports):
         for port in random.sample(ports, len(ports)):
             try:
-                return await asyncio.open_connection(address, port)
+                return await self.transport.open_connection(address, port)
 
             except Exception:
                 continue
@@ -240,6 +368,8 @@ class Client(pak.AsyncPacketHandler):
         # satellite server.
         self.satellite = self.main
 
+        self._satellite_changed = asyncio.Event()
+
     async def _keep_alive(self):
         # NOTE: The client normally checks whether the player has done
         # nothing for 6 hours and ends the connection if so, with some
@@ -266,7 +396,9 @@ class Client(pak.AsyncPacketHandler):
         try:
             while not self.main.is_closing():
                 if self.satellite is self.main or self.satellite.is_closing():
-                    await pak.util.yield_exec()
+                    # Wait until we connect to a new satellite server.
+                    await self._satellite_changed.wait()
+                    self._satellite_changed.clear()
 
                     continue
 
@@ -319,7 +451,13 @@ class Client(pak.AsyncPacketHandler):
     async def on_start(self):
         await self.handshake()
 
-        keep_alive_task       = asyncio.create_task(self._keep_alive())
+        if self.keep_alive_scheduler is None:
+            keep_alive_task = asyncio.create_task(self._keep_alive())
+        else:
+            keep_alive_task = None
+
+            self.keep_alive_scheduler.register(self)
+
         satellite_listen_task = asyncio.create_task(self._satellite_listen())
 
         try:
@@ -327,16 +465,23 @@ class Client(pak.AsyncPacketHandler):
 
         finally:
             satellite_listen_task.cancel()
-            keep_alive_task.cancel()
+
+            if keep_alive_task is not None:
+                keep_alive_task.cancel()
+            else:
+                self.keep_alive_scheduler.unregister(self)
 
             await satellite_listen_task
-            await keep_alive_task
+
+            if keep_alive_task is not None:
+                await keep_alive_task
 
     async def start(self):
-        await self.startup()
+        async with self._monitoring_loop_lag():
+            await self.startup()
 
-        async with self.main:
-            await self.on_start()
+            async with self.main:
+                await self.on_start()
 
     def run(self):
         try:
@@ -428,6 +573,8 @@ class Client(pak.AsyncPacketHandler):
         reader, writer = await self.open_streams(packet.address, packet.ports)
         self.satellite = self.Connection(self, reader=reader, writer=writer)
 
+        self._satellite_changed.set()
+
         # NOTE: The game delays sending this packet until it
         # otherwise tries to send a packet to the satellite
         # server. We do not do this and instead send it right away.
@@ -459,24 +606,24 @@ class Client(pak.AsyncPacketHandler):
 
     @pak.packet_listener(clientbound.TribulleWrapperPacket)
     async def _on_tribulle_wrapper(self, server, packet):
-        await self._listen_to_packet(server, packet.nested.immutable_copy(), outgoing=False)
+        await self._listen_to_packet(server, immutable_view(packet.nested), outgoing=False)
 
     @pak.packet_listener(serverbound.TribulleWrapperPacket, outgoing=True)
     async def _on_tribulle_wrapper_outgoing(self, server, packet):
-        await self._listen_to_packet(server, packet.nested.immutable_copy(), outgoing=True)
+        await self._listen_to_packet(server, immutable_view(packet.nested), outgoing=True)
 
     @pak.packet_listener(clientbound.LegacyWrapperPacket)
     async def _on_legacy_wrapper(self, server, packet):
-        await self._listen_to_packet(server, packet.nested.immutable_copy(), outgoing=False)
+        await self._listen_to_packet(server, immutable_view(packet.nested), outgoing=False)
 
     @pak.packet_listener(serverbound.LegacyWrapperPacket, outgoing=True)
     async def _on_legacy_wrapper_outgoing(self, server, packet):
-        await self._listen_to_packet(server, packet.nested.immutable_copy(), outgoing=True)
+        await self._listen_to_packet(server, immutable_view(packet.nested), outgoing=True)
 
     @pak.packet_listener(clientbound.ExtensionWrapperPacket)
     async def _on_extension_wrapper(self, server, packet):
-        await self._listen_to_packet(server, packet.nested.immutable_copy(), outgoing=False)
+        await self._listen_to_packet(server, immutable_view(packet.nested), outgoing=False)
 
     @pak.packet_listener(serverbound.ExtensionWrapperPacket, outgoing=True)
     async def _on_extension_wrapper_outgoing(self, server, packet):
-        await self._listen_to_packet(server, packet.nested.immutable_copy(), outgoing=True)
+        await self._listen_to_packet(server, immutable_view(packet.nested), outgoing=True)
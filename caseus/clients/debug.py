@@ -1,7 +1,5 @@
 import pak
 
-from aioconsole import aprint
-
 from public import public
 
 from .client import Client
@@ -38,6 +36,8 @@ class LoggingClient(Client):
         else:
             connection_name = "SATELLITE"
 
+        from aioconsole import aprint
+
         await aprint(f"{connection_name}: {bound}: {packet}")
 
     async def _log_all_incoming_packets(self, server, packet):
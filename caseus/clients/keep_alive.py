@@ -0,0 +1,100 @@
+import asyncio
+import random
+
+from public import public
+
+from ..packets import serverbound
+
+@public
+class KeepAliveScheduler:
+    r"""Writes the keep alive packets of many :class:`~.Client`\s on one shared tick.
+
+    Each :class:`~.Client` normally runs its own task which wakes up every
+    :attr:`INTERVAL` seconds to write its keep alive packets. When running
+    many :class:`~.Client`\s within the same process, a single scheduler
+    may be passed to each of them instead, so that their keep alive packets
+    are all written together on a single periodic tick.
+
+    Parameters
+    ----------
+    interval : :class:`int` or :class:`float`
+        The number of seconds between each tick.
+    jitter : :class:`int` or :class:`float`
+        The maximum number of seconds by which each tick is
+        randomly moved earlier or later.
+
+        This may be used to keep the ticks of several processes
+        from lining up with each other.
+    """
+
+    INTERVAL = 15
+
+    def __init__(self, *, interval=INTERVAL, jitter=0):
+        self.interval = interval
+        self.jitter   = jitter
+
+        self._clients = set()
+        self._task    = None
+
+        # Keep alive packets are empty, and so they are
+        # only ever packed differently for different
+        # contexts and fingerprints. We therefore cache
+        # each packed frame to avoid packing them again.
+        self._keep_alive_packet = serverbound.KeepAlivePacket()
+        self._keep_alive_packet.make_immutable()
+
+        self._keep_alive_frames = {}
+
+    def register(self, client):
+        self._clients.add(client)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._tick_forever())
+
+    def unregister(self, client):
+        self._clients.discard(client)
+
+        if len(self._clients) <= 0 and self._task is not None:
+            self._task.cancel()
+
+            self._task = None
+
+    def _next_delay(self):
+        if self.jitter <= 0:
+            return self.interval
+
+        return max(0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    async def _keep_alive(self, client):
+        if client.main.is_closing():
+            return
+
+        # NOTE: The satellite connection is the same as
+        # the main connection until the client is told
+        # to change the satellite server, in which case
+        # two keep alive packets are written to the main
+        # connection, just as the game does.
+        await client.main.write_packet_instance(self._keep_alive_packet, frame_cache=self._keep_alive_frames)
+        await client.satellite.write_packet_instance(self._keep_alive_packet, frame_cache=self._keep_alive_frames)
+
+    async def tick(self):
+        """Writes the keep alive packets of every registered :class:`~.Client`."""
+
+        # NOTE: We do not let an error writing to one client
+        # stop the others from being kept alive. A broken
+        # connection will be noticed when reading from it.
+        await asyncio.gather(
+            *[self._keep_alive(client) for client in list(self._clients)],
+
+            return_exceptions = True,
+        )
+
+    async def _tick_forever(self):
+        try:
+            while True:
+                await asyncio.sleep(self._next_delay())
+
+                await self.tick()
+
+        except asyncio.CancelledError:
+            return
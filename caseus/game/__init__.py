@@ -1,4 +1,6 @@
 from .anchor     import *
+from .physics    import *
 from .room       import *
+from .roster     import *
 from .translator import *
 from .util       import *
@@ -0,0 +1,380 @@
+r"""Tracking the physical state of the players in a room."""
+
+import time
+
+from public import public
+
+from ..packets import clientbound
+
+@public
+class RoomPhysicsState:
+    r"""The physical state of every player in a room.
+
+    The positions, velocities, facing, and friction info
+    of players are kept in contiguous NumPy arrays, so that
+    every player may be extrapolated and queried at once.
+    Each player occupies a slot of those arrays, and the
+    slots of the players in the room are always the first
+    ``len(state)`` slots.
+
+    State is updated by passing packets to :meth:`apply`.
+    The packets it understands are in :attr:`PACKET_TYPES`,
+    so that it may be fed by registering a listener, e.g.::
+
+        state = caseus.game.RoomPhysicsState()
+
+        async def on_physics_packet(server, packet):
+            state.apply(packet)
+
+        client.register_packet_listener(on_physics_packet, *state.PACKET_TYPES)
+
+    Positions are in pixels and velocities are in the units
+    of the game's physics engine, i.e. meters per second.
+
+    .. note::
+
+        NumPy is only imported once the state is created,
+        and must be installed to do so.
+
+    Parameters
+    ----------
+    own_session_id : :class:`int` or ``None``
+        The session ID of the player that the client controls.
+
+        :class:`~.MovePlayerPacket` only ever moves this player.
+        If ``None``, then it is set from :class:`~.LoginSuccessPacket`.
+    capacity : :class:`int`
+        How many players to allocate room for up front.
+    """
+
+    # NOTE: The game's physics engine uses 30 pixels per meter.
+    PIXELS_PER_METER = 30
+
+    PACKET_TYPES = (
+        clientbound.PlayerMovementPacket,
+        clientbound.MovePlayerPacket,
+        clientbound.SetFacingPacket,
+        clientbound.PlayerVictoryPacket,
+        clientbound.PlayerDiedPacket,
+        clientbound.NewRoundPacket,
+        clientbound.LoginSuccessPacket,
+    )
+
+    # The attributes holding the arrays indexed by slot.
+    _ARRAY_NAMES = (
+        "_session_ids",
+        "_positions",
+        "_velocities",
+        "_facing_right",
+        "_friction_charges",
+        "_friction_loss_rates",
+        "_update_times",
+    )
+
+    def __init__(self, *, own_session_id=None, capacity=64):
+        import numpy
+
+        self.own_session_id = own_session_id
+
+        # Maps session IDs to their slots.
+        self._slots = {}
+
+        self._session_ids = numpy.zeros(capacity, dtype=numpy.int64)
+
+        self._positions  = numpy.zeros((capacity, 2), dtype=numpy.float64)
+        self._velocities = numpy.zeros((capacity, 2), dtype=numpy.float64)
+
+        self._facing_right = numpy.zeros(capacity, dtype=numpy.bool_)
+
+        self._friction_charges    = numpy.zeros(capacity, dtype=numpy.float64)
+        self._friction_loss_rates = numpy.zeros(capacity, dtype=numpy.float64)
+
+        # When each slot was last updated, in seconds.
+        self._update_times = numpy.zeros(capacity, dtype=numpy.float64)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, session_id):
+        return session_id in self._slots
+
+    @property
+    def session_ids(self):
+        """The session IDs of the tracked players, in slot order."""
+
+        return self._session_ids[:len(self)]
+
+    @property
+    def positions(self):
+        """The positions of the tracked players as of their last updates.
+
+        An array of shape ``(len(state), 2)``, in slot order.
+        """
+
+        return self._positions[:len(self)]
+
+    @property
+    def velocities(self):
+        """The velocities of the tracked players.
+
+        An array of shape ``(len(state), 2)``, in slot order.
+        """
+
+        return self._velocities[:len(self)]
+
+    @property
+    def facing_right(self):
+        """Whether each tracked player is facing right, in slot order."""
+
+        return self._facing_right[:len(self)]
+
+    @property
+    def friction_charges(self):
+        """The friction charge of each tracked player, in slot order."""
+
+        return self._friction_charges[:len(self)]
+
+    @property
+    def friction_loss_rates(self):
+        """The friction loss rate of each tracked player, in slot order."""
+
+        return self._friction_loss_rates[:len(self)]
+
+    @property
+    def update_times(self):
+        """When each tracked player was last updated, in slot order."""
+
+        return self._update_times[:len(self)]
+
+    def slot(self, session_id):
+        """Gets the slot of a player.
+
+        Parameters
+        ----------
+        session_id : :class:`int`
+            The session ID of the player.
+
+        Returns
+        -------
+        :class:`int` or ``None``
+            The slot of the player, or ``None`` if not tracked.
+        """
+
+        return self._slots.get(session_id)
+
+    def _grow(self):
+        import numpy
+
+        capacity = 2 * max(len(self._session_ids), 1)
+
+        for name in self._ARRAY_NAMES:
+            array = getattr(self, name)
+
+            grown = numpy.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[:len(array)] = array
+
+            setattr(self, name, grown)
+
+    def _slot_for(self, session_id):
+        slot = self._slots.get(session_id)
+        if slot is not None:
+            return slot
+
+        slot = len(self._slots)
+        if slot >= len(self._session_ids):
+            self._grow()
+
+        self._slots[session_id] = slot
+
+        self._session_ids[slot] = session_id
+
+        self._positions[slot]           = 0
+        self._velocities[slot]          = 0
+        self._facing_right[slot]        = True
+        self._friction_charges[slot]    = 0
+        self._friction_loss_rates[slot] = 0
+        self._update_times[slot]        = 0
+
+        return slot
+
+    def remove(self, session_id):
+        """Stops tracking a player.
+
+        The last slot is moved into the removed
+        player's slot, to keep slots contiguous.
+
+        Parameters
+        ----------
+        session_id : :class:`int`
+            The session ID of the player.
+        """
+
+        slot = self._slots.pop(session_id, None)
+        if slot is None:
+            return
+
+        last = len(self._slots)
+        if slot == last:
+            return
+
+        for name in self._ARRAY_NAMES:
+            array = getattr(self, name)
+
+            array[slot] = array[last]
+
+        self._slots[int(self._session_ids[slot])] = slot
+
+    def clear(self):
+        """Stops tracking every player."""
+
+        self._slots.clear()
+
+    def apply(self, packet, *, now=None):
+        """Updates the state from a packet.
+
+        Packets not in :attr:`PACKET_TYPES` are ignored.
+
+        .. note::
+
+            Players are only tracked once their position
+            is known. A player is no longer tracked once
+            they win or die, since they leave the map,
+            nor once a new round starts.
+
+        Parameters
+        ----------
+        packet : :class:`~.ClientboundPacket`
+            The packet to update from.
+        now : :class:`float` or ``None``
+            The time the packet was received, in seconds.
+
+            If ``None``, then :func:`time.monotonic` is used.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        if isinstance(packet, clientbound.PlayerMovementPacket):
+            slot = self._slot_for(packet.session_id)
+
+            self._positions[slot]  = (packet.x,          packet.y)
+            self._velocities[slot] = (packet.velocity_x, packet.velocity_y)
+
+            # NOTE: The facing of a player only
+            # changes when they're moving one way.
+            if packet.moving_right != packet.moving_left:
+                self._facing_right[slot] = packet.moving_right
+
+            self._friction_charges[slot]    = packet.friction_info.charge
+            self._friction_loss_rates[slot] = packet.friction_info.loss_rate
+
+            self._update_times[slot] = now
+
+        elif isinstance(packet, clientbound.MovePlayerPacket):
+            if self.own_session_id is None:
+                return
+
+            # NOTE: A relative move says nothing
+            # of where an untracked player is.
+            if packet.position_relative and self.own_session_id not in self:
+                return
+
+            slot = self._slot_for(self.own_session_id)
+
+            position = self._positions[slot]
+            if packet.position_relative:
+                position += (packet.x, packet.y)
+            else:
+                position[:] = (packet.x, packet.y)
+
+            velocity = self._velocities[slot]
+            for axis, value in enumerate((packet.velocity_x, packet.velocity_y)):
+                if value is packet.IGNORE:
+                    continue
+
+                if packet.velocity_relative:
+                    velocity[axis] += value
+                else:
+                    velocity[axis] = value
+
+            self._update_times[slot] = now
+
+        elif isinstance(packet, clientbound.SetFacingPacket):
+            slot = self.slot(packet.session_id)
+            if slot is None:
+                return
+
+            self._facing_right[slot] = packet.facing_right
+
+        elif isinstance(packet, (clientbound.PlayerVictoryPacket, clientbound.PlayerDiedPacket)):
+            self.remove(packet.session_id)
+
+        elif isinstance(packet, clientbound.NewRoundPacket):
+            self.clear()
+
+        elif isinstance(packet, clientbound.LoginSuccessPacket):
+            if self.own_session_id is None:
+                self.own_session_id = packet.session_id
+
+    def extrapolate(self, now=None):
+        """Extrapolates the positions of every tracked player.
+
+        Each player is assumed to have kept moving
+        at their last known velocity since their
+        last update, i.e. dead reckoning.
+
+        Parameters
+        ----------
+        now : :class:`float` or ``None``
+            The time to extrapolate to, in seconds.
+
+            If ``None``, then :func:`time.monotonic` is used.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The extrapolated positions, of shape
+            ``(len(state), 2)``, in slot order.
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        elapsed = (now - self.update_times) * self.PIXELS_PER_METER
+
+        return self.positions + self.velocities * elapsed[:, None]
+
+    def within_radius(self, x, y, radius, *, now=None, extrapolate=False):
+        """Gets the players within a radius of a point.
+
+        Parameters
+        ----------
+        x : :class:`float`
+            The x coordinate of the point.
+        y : :class:`float`
+            The y coordinate of the point.
+        radius : :class:`float`
+            The radius around the point.
+        now : :class:`float` or ``None``
+            The time to extrapolate to, if extrapolating.
+        extrapolate : :class:`bool`
+            Whether to query the positions returned by
+            :meth:`extrapolate` instead of the last known ones.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The session IDs of the players within the radius.
+        """
+
+        if extrapolate:
+            positions = self.extrapolate(now)
+        else:
+            positions = self.positions
+
+        offsets = positions - (x, y)
+
+        # NOTE: We compare squared distances to avoid square roots.
+        squared_distances = (offsets * offsets).sum(axis=1)
+
+        return self.session_ids[squared_distances <= radius * radius]
@@ -0,0 +1,392 @@
+r"""Tracking the players in a room."""
+
+import bisect
+
+from public import public
+
+from ..packets import clientbound
+
+from .. import enums
+
+@public
+class RosterPlayer:
+    """A player within a :class:`Roster`.
+
+    Only what's relevant to the roster is kept from
+    the :class:`~.PlayerInfo` that the player is made
+    from, so that large rooms stay cheap to track.
+
+    .. warning::
+
+        The score of a player in a roster should only be
+        changed with :meth:`Roster.set_score`, so that the
+        roster's order of players by score stays correct.
+    """
+
+    __slots__ = (
+        "session_id",
+        "username",
+        "is_shaman",
+        "activity",
+        "score",
+        "cheeses",
+        "title_id",
+        "title_stars",
+        "gender",
+        "look",
+        "mouse_color",
+        "shaman_color",
+        "name_color",
+    )
+
+    def __init__(
+        self,
+        *,
+        session_id,
+        username,
+        is_shaman    = False,
+        activity     = enums.PlayerActivity.Alive,
+        score        = 0,
+        cheeses      = 0,
+        title_id     = 0,
+        title_stars  = 0,
+        gender       = enums.Gender.Unknown,
+        look         = "",
+        mouse_color  = 0,
+        shaman_color = 0,
+        name_color   = 0,
+    ):
+        self.session_id   = session_id
+        self.username     = username
+        self.is_shaman    = is_shaman
+        self.activity     = activity
+        self.score        = score
+        self.cheeses      = cheeses
+        self.title_id     = title_id
+        self.title_stars  = title_stars
+        self.gender       = gender
+        self.look         = look
+        self.mouse_color  = mouse_color
+        self.shaman_color = shaman_color
+        self.name_color   = name_color
+
+    @classmethod
+    def from_player_info(cls, info):
+        """Makes a player from a :class:`~.PlayerInfo`.
+
+        Parameters
+        ----------
+        info : :class:`~.PlayerInfo`
+            The info of the player.
+
+        Returns
+        -------
+        :class:`RosterPlayer`
+            The player.
+        """
+
+        return cls(
+            session_id   = info.session_id,
+            username     = info.username,
+            is_shaman    = info.is_shaman,
+            activity     = info.activity,
+            score        = info.score,
+            cheeses      = info.cheeses,
+            title_id     = info.title_id,
+            title_stars  = info.title_stars,
+            gender       = info.gender,
+            look         = info.look,
+            mouse_color  = info.mouse_color,
+            shaman_color = info.shaman_color,
+            name_color   = info.name_color,
+        )
+
+    @property
+    def alive(self):
+        return self.activity is enums.PlayerActivity.Alive
+
+    def __repr__(self):
+        return (
+            f"{type(self).__qualname__}("
+
+            + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+
+            + ")"
+        )
+
+@public
+class Roster:
+    r"""The players within a room.
+
+    The roster is updated by passing packets to :meth:`apply`.
+    The packets it understands are in :attr:`PACKET_TYPES`,
+    so that it may be fed by registering a listener on either
+    a :class:`~.Client` or a :class:`~.Proxy`, e.g.::
+
+        roster = caseus.game.Roster()
+
+        async def on_roster_packet(server, packet):
+            roster.apply(packet)
+
+        client.register_packet_listener(on_roster_packet, *roster.PACKET_TYPES)
+
+    Players may be looked up by session ID or by username
+    in constant time, and the order of players by score is
+    kept up to date as scores change, rather than sorted
+    each time it's needed.
+
+    .. note::
+
+        Usernames are looked up case-insensitively.
+    """
+
+    PACKET_TYPES = (
+        clientbound.SetPlayerListPacket,
+        clientbound.UpdatePlayerListPacket,
+        clientbound.SetPlayerScorePacket,
+        clientbound.SetCheesesPacket,
+        clientbound.SetShamanPacket,
+        clientbound.UnsetShamanPacket,
+        clientbound.ShamanInfoPacket,
+        clientbound.PlayerVictoryPacket,
+        clientbound.PlayerDiedPacket,
+    )
+
+    def __init__(self):
+        # Maps session IDs to players.
+        self._by_session_id = {}
+
+        # Maps casefolded usernames to players.
+        self._by_username = {}
+
+        # The sort keys of players, from the highest score to the lowest.
+        self._score_keys = []
+
+    @staticmethod
+    def _username_key(username):
+        return username.casefold()
+
+    @staticmethod
+    def _score_key(player):
+        # NOTE: Players with the same score
+        # are ordered by their session IDs.
+        return (-player.score, player.session_id)
+
+    def __len__(self):
+        return len(self._by_session_id)
+
+    def __iter__(self):
+        return iter(self._by_session_id.values())
+
+    def __contains__(self, session_id):
+        return session_id in self._by_session_id
+
+    def get(self, session_id):
+        """Gets a player by their session ID.
+
+        Parameters
+        ----------
+        session_id : :class:`int`
+            The session ID of the player.
+
+        Returns
+        -------
+        :class:`RosterPlayer` or ``None``
+            The player, or ``None`` if not in the room.
+        """
+
+        return self._by_session_id.get(session_id)
+
+    def get_by_username(self, username):
+        """Gets a player by their username.
+
+        Parameters
+        ----------
+        username : :class:`str`
+            The username of the player.
+
+        Returns
+        -------
+        :class:`RosterPlayer` or ``None``
+            The player, or ``None`` if not in the room.
+        """
+
+        return self._by_username.get(self._username_key(username))
+
+    @property
+    def shamans(self):
+        """The players who are shaman.
+
+        Returns
+        -------
+        :class:`list` of :class:`RosterPlayer`
+            The shamans.
+        """
+
+        return [player for player in self if player.is_shaman]
+
+    def by_score(self):
+        """Gets the players ordered by score.
+
+        Returns
+        -------
+        :class:`list` of :class:`RosterPlayer`
+            The players, from the highest score to the lowest.
+        """
+
+        return [self._by_session_id[session_id] for _, session_id in self._score_keys]
+
+    def top(self, count):
+        """Gets the players with the highest scores.
+
+        Parameters
+        ----------
+        count : :class:`int`
+            How many players to get.
+
+        Returns
+        -------
+        :class:`list` of :class:`RosterPlayer`
+            The players, from the highest score to the lowest.
+        """
+
+        return [self._by_session_id[session_id] for _, session_id in self._score_keys[:count]]
+
+    def rank(self, session_id):
+        """Gets the rank of a player by score.
+
+        Parameters
+        ----------
+        session_id : :class:`int`
+            The session ID of the player.
+
+        Returns
+        -------
+        :class:`int` or ``None``
+            The rank of the player, starting from ``0`` for
+            the highest score, or ``None`` if not in the room.
+        """
+
+        player = self.get(session_id)
+        if player is None:
+            return None
+
+        return bisect.bisect_left(self._score_keys, self._score_key(player))
+
+    def add(self, player):
+        """Adds a player, replacing any with the same session ID.
+
+        Parameters
+        ----------
+        player : :class:`RosterPlayer`
+            The player to add.
+        """
+
+        self.remove(player.session_id)
+
+        self._by_session_id[player.session_id]                 = player
+        self._by_username[self._username_key(player.username)] = player
+
+        bisect.insort(self._score_keys, self._score_key(player))
+
+    def remove(self, session_id):
+        """Removes a player.
+
+        Parameters
+        ----------
+        session_id : :class:`int`
+            The session ID of the player.
+
+        Returns
+        -------
+        :class:`RosterPlayer` or ``None``
+            The removed player, or ``None`` if not in the room.
+        """
+
+        player = self._by_session_id.pop(session_id, None)
+        if player is None:
+            return None
+
+        username_key = self._username_key(player.username)
+        if self._by_username.get(username_key) is player:
+            del self._by_username[username_key]
+
+        del self._score_keys[bisect.bisect_left(self._score_keys, self._score_key(player))]
+
+        return player
+
+    def clear(self):
+        """Removes every player."""
+
+        self._by_session_id.clear()
+        self._by_username.clear()
+        self._score_keys.clear()
+
+    def set_score(self, session_id, score):
+        """Sets the score of a player.
+
+        Parameters
+        ----------
+        session_id : :class:`int`
+            The session ID of the player.
+        score : :class:`int`
+            The new score of the player.
+        """
+
+        player = self.get(session_id)
+        if player is None or player.score == score:
+            return
+
+        del self._score_keys[bisect.bisect_left(self._score_keys, self._score_key(player))]
+
+        player.score = score
+
+        bisect.insort(self._score_keys, self._score_key(player))
+
+    def _set_attr(self, session_id, name, value):
+        player = self.get(session_id)
+        if player is None:
+            return
+
+        setattr(player, name, value)
+
+    def apply(self, packet):
+        """Updates the roster from a packet.
+
+        Packets not in :attr:`PACKET_TYPES` are ignored.
+
+        Parameters
+        ----------
+        packet : :class:`~.ClientboundPacket` or :class:`~.ClientboundLegacyPacket`
+            The packet to update from.
+        """
+
+        if isinstance(packet, clientbound.SetPlayerListPacket):
+            self.clear()
+
+            for info in packet.players:
+                self.add(RosterPlayer.from_player_info(info))
+
+        elif isinstance(packet, clientbound.UpdatePlayerListPacket):
+            self.add(RosterPlayer.from_player_info(packet.player))
+
+        elif isinstance(packet, (clientbound.SetPlayerScorePacket, clientbound.PlayerVictoryPacket)):
+            self.set_score(packet.session_id, packet.score)
+
+        elif isinstance(packet, clientbound.PlayerDiedPacket):
+            self.set_score(packet.session_id, packet.score)
+
+            self._set_attr(packet.session_id, "activity", enums.PlayerActivity.Dead)
+
+        elif isinstance(packet, clientbound.SetCheesesPacket):
+            self._set_attr(packet.session_id, "cheeses", packet.cheeses)
+
+        elif isinstance(packet, clientbound.SetShamanPacket):
+            self._set_attr(packet.session_id, "is_shaman", True)
+
+        elif isinstance(packet, clientbound.UnsetShamanPacket):
+            self._set_attr(packet.session_id, "is_shaman", False)
+
+        elif isinstance(packet, clientbound.ShamanInfoPacket):
+            for player in self:
+                player.is_shaman = player.session_id in (packet.blue_session_id, packet.pink_session_id)
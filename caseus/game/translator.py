@@ -1,7 +1,6 @@
 import collections
 import re
 import zlib
-import aiohttp
 
 from public import public
 
@@ -29,6 +28,10 @@ class Translator(collections.abc.MutableMapping):
 
     @classmethod
     async def download(cls, language):
+        # We import this lazily, upon first downloading,
+        # to improve performance upon importing our library.
+        import aiohttp
+
         async with aiohttp.ClientSession() as session:
             async with session.get(cls.TRANSLATIONS_URL_FMT.format(language=language)) as response:
                 return cls.from_compressed_data(await response.read())
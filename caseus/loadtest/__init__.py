@@ -0,0 +1,3 @@
+from .client import *
+from .runner import *
+from .server import *
@@ -0,0 +1,286 @@
+r"""Lightweight scripted clients for load testing."""
+
+import asyncio
+import random
+import time
+
+from public import public
+
+from ..clients import Client
+from ..packets import serverbound, clientbound
+from ..util    import TCPTransport
+
+class _LoadTestConnection(Client.BaseConnection):
+    def __init__(self, report, **kwargs):
+        super().__init__(**kwargs)
+
+        self.report = report
+
+    async def _packet_written(self, packet, frame, *, fingerprint):
+        self.report.packets_sent += 1
+
+@public
+class LoadTestClient:
+    r"""A lightweight, scripted game client.
+
+    Unlike :class:`~.Client`, no listeners are dispatched to and
+    no satellite connection is made, so that thousands of them may
+    be run at once. Its connection is a :class:`.Client.BaseConnection`,
+    so that servers see the same bytes as from a :class:`~.Client`.
+
+    The client sends the packet key sources and auth key just as
+    the proxy loader does, handshakes, sends its system information,
+    logs in, and then moves and chats at a steady rate until told
+    to stop.
+
+    Parameters
+    ----------
+    report : :class:`~.LoadTestReport`
+        What to record the client's traffic and latencies in.
+    secrets : :class:`~.Secrets`
+        The secrets to connect with.
+    username : :class:`str`
+        The username to log in with.
+    movement_rate : :class:`float`
+        How many movement packets to send per second.
+    chat_rate : :class:`float`
+        How many chat messages to send per second.
+
+        The latency of each message is measured by
+        the server echoing it back to the client.
+    timeout : :class:`float`
+        How long, in seconds, to wait for the server
+        to respond to the handshake and login.
+    transport : :class:`~.Transport` or ``None``
+        The transport to connect through.
+
+        If ``None``, then a :class:`~.TCPTransport` is used.
+    """
+
+    # NOTE: The game sends keep alive packets every 15 seconds.
+    KEEP_ALIVE_INTERVAL = 15
+
+    def __init__(self, report, *, secrets, username, movement_rate, chat_rate, timeout, transport=None):
+        if transport is None:
+            transport = TCPTransport()
+
+        self.report = report
+
+        self.secrets  = secrets
+        self.username = username
+
+        self.movement_rate = movement_rate
+        self.chat_rate     = chat_rate
+        self.timeout       = timeout
+        self.transport     = transport
+
+        self.main = None
+
+        self._handshake_response = None
+        self._login_response     = None
+
+        # Maps the messages we've sent to when we sent them.
+        self._pending_messages = {}
+        self._message_counter  = 0
+
+    async def _read_packets(self):
+        async for packet in self.main.continuously_read_packets():
+            self.report.packets_received += 1
+
+            if isinstance(packet, clientbound.RoomMessagePacket):
+                sent_time = self._pending_messages.pop(packet.message, None)
+                if sent_time is not None:
+                    self.report.record_latency(self.report.CHAT, time.perf_counter_ns() - sent_time)
+
+            elif isinstance(packet, clientbound.HandshakeResponsePacket):
+                if not self._handshake_response.done():
+                    self._handshake_response.set_result(packet)
+
+            elif isinstance(packet, (clientbound.LoginSuccessPacket, clientbound.AccountErrorPacket)):
+                if not self._login_response.done():
+                    self._login_response.set_result(packet)
+
+            elif isinstance(packet, clientbound.PingPacket):
+                await self.main.write_packet(serverbound.PongPacket, payload=packet.payload)
+
+    async def _request(self, stage, response, packet_cls, /, **fields):
+        start = time.perf_counter_ns()
+
+        await self.main.write_packet(packet_cls, **fields)
+
+        packet = await asyncio.wait_for(asyncio.shield(response), self.timeout)
+
+        self.report.record_latency(stage, time.perf_counter_ns() - start)
+
+        return packet
+
+    async def _log_in(self):
+        await self.main.write_packet(
+            serverbound.ExtensionWrapperPacket,
+
+            nested = serverbound.KeySourcesPacket(packet_key_sources=self.secrets.packet_key_sources),
+        )
+
+        if self.secrets.auth_key is not None:
+            await self.main.write_packet(
+                serverbound.ExtensionWrapperPacket,
+
+                nested = serverbound.AuthKeyPacket(auth_key=self.secrets.auth_key),
+            )
+
+        handshake_response = await self._request(
+            self.report.HANDSHAKE, self._handshake_response,
+
+            serverbound.HandshakePacket,
+
+            game_version                = self.secrets.game_version,
+            language                    = "en",
+            connection_token            = self.secrets.connection_token,
+            player_type                 = Client.PLAYER_TYPE,
+            browser_info                = Client.BROWSER_INFO,
+            loader_stage_size           = Client.LOADER_SIZE,
+            concatenated_font_name_hash = Client.FONTS_HASH,
+            server_string               = Client.SERVER_STRING,
+            referrer                    = Client.REFERRER,
+            milliseconds_since_start    = Client.TIME_TILL_HANDSHAKE,
+        )
+
+        await self.main.write_packet(
+            serverbound.SystemInformationPacket,
+
+            language      = "en",
+            os            = Client.OS,
+            flash_version = Client.FLASH_VERSION,
+        )
+
+        if self.secrets.auth_key is not None:
+            ciphered_auth_token = handshake_response.auth_token ^ self.secrets.auth_key
+        else:
+            ciphered_auth_token = None
+
+        login_response = await self._request(
+            self.report.LOGIN, self._login_response,
+
+            serverbound.LoginPacket,
+
+            username            = self.username,
+            password_hash       = "",
+            loader_url          = Client.LOADER_URL,
+            start_room          = "1",
+            ciphered_auth_token = ciphered_auth_token,
+            unk_short_6         = 18,
+        )
+
+        if isinstance(login_response, clientbound.AccountErrorPacket):
+            raise ValueError(f"Login failed with error code: {login_response.error_code}")
+
+    async def _send_traffic(self, stop_time):
+        loop = asyncio.get_running_loop()
+
+        # Each kind of traffic is sent on its own schedule,
+        # offset randomly so that clients don't send in lockstep.
+        schedules = []
+
+        if self.movement_rate > 0:
+            schedules.append([1 / self.movement_rate, self._move])
+
+        if self.chat_rate > 0:
+            schedules.append([1 / self.chat_rate, self._chat])
+
+        schedules.append([self.KEEP_ALIVE_INTERVAL, self._keep_alive])
+
+        now = loop.time()
+        for schedule in schedules:
+            schedule.append(now + random.uniform(0, schedule[0]))
+
+        while not self.main.is_closing():
+            schedule = min(schedules, key=lambda schedule: schedule[2])
+
+            interval, send, next_time = schedule
+
+            if next_time >= stop_time:
+                return
+
+            await asyncio.sleep(next_time - loop.time())
+
+            await send()
+
+            # NOTE: We schedule from when we meant to send
+            # so that the rate holds even if we fall behind.
+            schedule[2] = next_time + interval
+
+    async def _move(self):
+        await self.main.write_packet(
+            serverbound.PlayerMovementPacket,
+
+            moving_right = True,
+            x            = random.randrange(800),
+            y            = random.randrange(400),
+        )
+
+    async def _chat(self):
+        self._message_counter += 1
+
+        message = f"{self.username} {self._message_counter}"
+
+        self._pending_messages[message] = time.perf_counter_ns()
+
+        await self.main.write_packet(serverbound.RoomMessagePacket, message=message)
+
+    async def _keep_alive(self):
+        await self.main.write_packet(serverbound.KeepAlivePacket)
+
+    async def start(self, address, port, *, stop_time):
+        """Runs the client until a certain time.
+
+        Parameters
+        ----------
+        address : :class:`str`
+            The address of the server to connect to.
+        port : :class:`int`
+            The port of the server to connect to.
+        stop_time : :class:`float`
+            The time, according to the event loop, to stop at.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        self._handshake_response = loop.create_future()
+        self._login_response     = loop.create_future()
+
+        start = time.perf_counter_ns()
+
+        reader, writer = await asyncio.wait_for(self.transport.open_connection(address, port), self.timeout)
+
+        self.report.record_latency(self.report.CONNECT, time.perf_counter_ns() - start)
+        self.report.connected += 1
+
+        self.main = _LoadTestConnection(self.report, secrets=self.secrets, reader=reader, writer=writer)
+
+        async with self.main:
+            read_task = asyncio.create_task(self._read_packets())
+
+            try:
+                await self._log_in()
+
+                self.report.record_login()
+
+                await self._send_traffic(stop_time)
+
+                # NOTE: We let the server close the connection
+                # once it has read everything we've sent, and read
+                # everything it sends until then, so that neither
+                # side is reset by closing with unread data.
+                if self.main.writer.can_write_eof():
+                    self.main.writer.write_eof()
+
+                    await asyncio.wait_for(asyncio.shield(read_task), self.timeout)
+
+            finally:
+                read_task.cancel()
+
+                try:
+                    await read_task
+
+                except (asyncio.CancelledError, Exception):
+                    pass
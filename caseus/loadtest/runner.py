@@ -0,0 +1,380 @@
+r"""Running many :class:`~.LoadTestClient`\s against a server."""
+
+import asyncio
+import collections
+import time
+
+from public import public
+
+from ..proxies import Proxy
+from ..stats   import Histogram
+from ..util    import TCPTransport
+
+from .client import LoadTestClient
+from .server import LoadTestServer
+
+@public
+class LoadTestReport:
+    """The results of a :class:`LoadTest`.
+
+    Latencies are recorded in nanoseconds.
+    """
+
+    CONNECT   = "connect"
+    HANDSHAKE = "handshake"
+    LOGIN     = "login"
+    CHAT      = "chat"
+
+    STAGES = (CONNECT, HANDSHAKE, LOGIN, CHAT)
+
+    def __init__(self, *, num_clients):
+        self.num_clients = num_clients
+
+        self.connected = 0
+        self.logged_in = 0
+
+        # Maps the names of the errors clients stopped with to their counts.
+        self.errors = collections.Counter()
+
+        self.packets_sent     = 0
+        self.packets_received = 0
+
+        self.latencies = {stage: Histogram() for stage in self.STAGES}
+
+        self.start_time      = time.perf_counter()
+        self.last_login_time = None
+
+        # How long the test took.
+        self.elapsed = None
+
+    @property
+    def failed(self):
+        """The number of clients which stopped with an error."""
+
+        return sum(self.errors.values())
+
+    def record_latency(self, stage, ns):
+        self.latencies[stage].record(ns)
+
+    def record_login(self):
+        self.logged_in       += 1
+        self.last_login_time  = time.perf_counter()
+
+    @property
+    def connection_rate(self):
+        """The number of clients logged in per second until the last one logged in."""
+
+        if self.last_login_time is None or self.last_login_time <= self.start_time:
+            return None
+
+        return self.logged_in / (self.last_login_time - self.start_time)
+
+    @property
+    def send_rate(self):
+        """The number of packets sent per second."""
+
+        if not self.elapsed:
+            return None
+
+        return self.packets_sent / self.elapsed
+
+    @property
+    def receive_rate(self):
+        """The number of packets received per second."""
+
+        if not self.elapsed:
+            return None
+
+        return self.packets_received / self.elapsed
+
+    def snapshot(self):
+        """Gets a snapshot of the results.
+
+        Returns
+        -------
+        :class:`dict`
+            The results, suitable for serializing to JSON.
+        """
+
+        return dict(
+            num_clients = self.num_clients,
+            connected   = self.connected,
+            logged_in   = self.logged_in,
+            errors      = dict(self.errors),
+
+            packets_sent     = self.packets_sent,
+            packets_received = self.packets_received,
+
+            elapsed = self.elapsed,
+
+            connection_rate = self.connection_rate,
+            send_rate       = self.send_rate,
+            receive_rate    = self.receive_rate,
+
+            latencies = {
+                stage: dict(
+                    count = histogram.count,
+                    mean  = histogram.mean,
+                    p50   = histogram.percentile(50),
+                    p90   = histogram.percentile(90),
+                    p99   = histogram.percentile(99),
+                    max   = histogram.max,
+                )
+
+                for stage, histogram in self.latencies.items()
+            },
+        )
+
+    def format(self):
+        """Formats the results for display.
+
+        Returns
+        -------
+        :class:`str`
+            The results, with latencies in milliseconds.
+        """
+
+        def rate(value):
+            return "n/a" if value is None else f"{value:.1f}/s"
+
+        lines = [
+            f"Clients:     {self.logged_in}/{self.num_clients} logged in, {self.failed} failed",
+            f"Connections: {rate(self.connection_rate)}",
+            f"Sent:        {self.packets_sent} packets, {rate(self.send_rate)}",
+            f"Received:    {self.packets_received} packets, {rate(self.receive_rate)}",
+        ]
+
+        for error, count in self.errors.most_common():
+            lines.append(f"  {count} x {error}")
+
+        header = ("Latency (ms)", "Count", "p50", "p90", "p99", "Max")
+
+        table = [header]
+        for stage, histogram in self.latencies.items():
+            if histogram.count == 0:
+                continue
+
+            table.append((
+                stage,
+                str(histogram.count),
+
+                *(
+                    f"{value / 1_000_000:.3f}"
+
+                    for value in (
+                        histogram.percentile(50),
+                        histogram.percentile(90),
+                        histogram.percentile(99),
+                        histogram.max,
+                    )
+                ),
+            ))
+
+        widths = [max(len(row[column]) for row in table) for column in range(len(header))]
+
+        lines.append("")
+        lines.extend(
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+
+            for row in table
+        )
+
+        return "\n".join(lines)
+
+@public
+class LoadTest:
+    """Runs many scripted clients against a server.
+
+    Clients are started at a steady rate, and each one sends
+    traffic from when it logs in until the test is over.
+
+    Parameters
+    ----------
+    address : :class:`str`
+        The address of the server to test.
+    port : :class:`int`
+        The port of the server to test.
+    num_clients : :class:`int`
+        The number of clients to run.
+    connect_rate : :class:`float`
+        How many clients to start per second.
+    duration : :class:`float`
+        How long, in seconds, to keep every client
+        sending traffic after the last one is started.
+    movement_rate : :class:`float`
+        How many movement packets each client sends per second.
+    chat_rate : :class:`float`
+        How many chat messages each client sends per second.
+    secrets : :class:`~.Secrets` or ``None``
+        The secrets for clients to connect with.
+
+        If ``None``, then :meth:`.LoadTestServer.client_secrets` is used.
+    timeout : :class:`float`
+        How long, in seconds, clients wait for each
+        step of connecting and logging in.
+    transport : :class:`~.Transport` or ``None``
+        The transport for clients to connect through.
+
+        If ``None``, then a :class:`~.TCPTransport` is used.
+    """
+
+    def __init__(
+        self,
+        address,
+        port,
+        *,
+        num_clients   = 100,
+        connect_rate  = 100,
+        duration      = 10,
+        movement_rate = 10,
+        chat_rate     = 0.5,
+        secrets       = None,
+        timeout       = 10,
+        transport     = None,
+    ):
+        if secrets is None:
+            secrets = LoadTestServer.client_secrets(address, [port])
+
+        self.address = address
+        self.port    = port
+
+        self.num_clients   = num_clients
+        self.connect_rate  = connect_rate
+        self.duration      = duration
+        self.movement_rate = movement_rate
+        self.chat_rate     = chat_rate
+        self.secrets       = secrets
+        self.timeout       = timeout
+        self.transport     = transport
+
+    def make_client(self, report, index):
+        return LoadTestClient(
+            report,
+
+            secrets       = self.secrets,
+            username      = f"Loadtest{index}",
+            movement_rate = self.movement_rate,
+            chat_rate     = self.chat_rate,
+            timeout       = self.timeout,
+            transport     = self.transport,
+        )
+
+    async def _run_client(self, report, client, *, stop_time):
+        try:
+            await client.start(self.address, self.port, stop_time=stop_time)
+
+        except Exception as e:
+            report.errors[type(e).__name__] += 1
+
+    async def start(self):
+        """Runs the load test.
+
+        Returns
+        -------
+        :class:`LoadTestReport`
+            The results of the test.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        report = LoadTestReport(num_clients=self.num_clients)
+
+        start_time = loop.time()
+        stop_time  = start_time + self.num_clients / self.connect_rate + self.duration
+
+        tasks = []
+        for index in range(self.num_clients):
+            await asyncio.sleep(start_time + index / self.connect_rate - loop.time())
+
+            tasks.append(asyncio.create_task(
+                self._run_client(report, self.make_client(report, index), stop_time=stop_time)
+            ))
+
+        await asyncio.gather(*tasks)
+
+        report.elapsed = time.perf_counter() - report.start_time
+
+        return report
+
+    def run(self):
+        return asyncio.run(self.start())
+
+async def _wait_for_disconnects(clients, *, timeout):
+    # NOTE: Before Python 3.12, closing a server does not wait
+    # for its connections to finish, and so we wait for them
+    # ourselves so that they aren't cancelled when we return.
+
+    loop     = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    while len(clients) > 0 and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+@public
+async def local_load_test(*, proxy=False, transport=None, **kwargs):
+    """Runs a :class:`LoadTest` against a local :class:`~.LoadTestServer`.
+
+    Parameters
+    ----------
+    proxy : :class:`bool`
+        Whether to front the server with a :class:`~.Proxy`,
+        which the clients then connect to instead.
+    transport : :class:`~.Transport` or ``None``
+        The transport for the server, proxy, and clients to use.
+
+        If ``None``, then a :class:`~.TCPTransport` is used. A
+        :class:`~.MemoryTransport` measures the throughput of
+        the protocol and packet dispatch without any sockets.
+    **kwargs
+        Forwarded to :class:`LoadTest`.
+
+    Returns
+    -------
+    :class:`LoadTestReport`
+        The results of the test.
+    """
+
+    if transport is None:
+        transport = TCPTransport()
+
+    async with LoadTestServer(
+        host_main_address = "127.0.0.1",
+        host_main_port    = 0,
+
+        host_socket_policy_port = None,
+
+        transport = transport,
+    ) as server:
+        await server.startup()
+
+        port = server.main_srv.sockets[0].getsockname()[1]
+
+        if not proxy:
+            report = await LoadTest("127.0.0.1", port, transport=transport, **kwargs).start()
+
+            await _wait_for_disconnects(server.main_clients, timeout=1)
+
+            return report
+
+        async with Proxy(
+            host_address        = "127.0.0.1",
+            host_main_port      = 0,
+            host_satellite_port = 0,
+
+            host_socket_policy_port = None,
+
+            main_server_address = "127.0.0.1",
+            main_server_ports   = [port],
+
+            transport = transport,
+        ) as proxy:
+            await proxy.startup()
+
+            port = proxy.main_srv.sockets[0].getsockname()[1]
+
+            report = await LoadTest("127.0.0.1", port, transport=transport, **kwargs).start()
+
+            await _wait_for_disconnects(proxy.main_clients,  timeout=1)
+            await _wait_for_disconnects(server.main_clients, timeout=1)
+
+            return report
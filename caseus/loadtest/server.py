@@ -0,0 +1,82 @@
+r"""A server for scripted clients to load test against."""
+
+import pak
+
+from public import public
+
+from ..packets import serverbound, clientbound
+from ..secrets import Secrets
+from ..servers import MinimalServer
+
+@public
+class LoadTestServer(MinimalServer):
+    r"""A :class:`~.MinimalServer` which lets anyone log in.
+
+    Chat messages are echoed back to their sender so
+    that :class:`~.LoadTestClient`\s may measure their latency.
+    """
+
+    # NOTE: These are not the game's, the server just needs to know
+    # them ahead of time, as a proxy never forwards them to it.
+    PACKET_KEY_SOURCES = tuple(range(20))
+
+    def __init__(self, *, packet_key_sources=PACKET_KEY_SOURCES, **kwargs):
+        super().__init__(**kwargs)
+
+        self.initial_secrets = self.initial_secrets.copy(packet_key_sources=packet_key_sources)
+
+        self._next_session_id = 1
+
+    @classmethod
+    def client_secrets(cls, address=None, ports=None):
+        """Makes :class:`~.Secrets` for clients to connect with.
+
+        Parameters
+        ----------
+        address : :class:`str` or ``None``
+            The address of the server.
+        ports : iterable of :class:`int` or ``None``
+            The ports of the server.
+
+        Returns
+        -------
+        :class:`~.Secrets`
+            Secrets which a server with no game
+            version or auth key set will accept.
+        """
+
+        return Secrets(
+            server_address     = address,
+            server_ports       = ports,
+            game_version       = 1,
+            connection_token   = "",
+            auth_key           = 0,
+            packet_key_sources = cls.PACKET_KEY_SOURCES,
+        )
+
+    async def on_login(self, client, packet):
+        client.logged_in = True
+        client.username  = packet.username
+
+        session_id = self._next_session_id
+        self._next_session_id += 1
+
+        await client.write_packet(
+            clientbound.LoginSuccessPacket,
+
+            global_id  = session_id,
+            username   = packet.username,
+            session_id = session_id,
+        )
+
+    @pak.packet_listener(serverbound.RoomMessagePacket)
+    async def _echo_room_message(self, client, packet):
+        if not client.logged_in:
+            return
+
+        await client.write_packet(
+            clientbound.RoomMessagePacket,
+
+            username = client.username,
+            message  = packet.message,
+        )
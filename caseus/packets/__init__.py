@@ -3,3 +3,6 @@ from .common import *
 
 from . import serverbound
 from . import clientbound
+
+from .columnar import *
+from .lazy     import *
@@ -1089,30 +1089,55 @@ class CaptchaPacket(ClientboundPacket):
     def _lerp_white(component, alpha):
         return 0xFF - alpha + ((component * alpha) // 0xFF)
 
-    def draw_image(self):
-        from PIL import Image
+    def image_array(self):
+        """Gets the pixels of the captcha as a NumPy array.
+
+        This does not require PIL, for solvers which
+        operate on the pixels of the captcha directly.
+
+        Pixels which the colors do not cover are white.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The RGB pixels of the captcha, of shape
+            ``(height, width, 3)`` and dtype ``uint8``.
+        """
 
-        im = Image.new("RGB", (self.info.width, self.info.height))
-        im.paste(0xFFFFFF, (0, 0, self.info.width, self.info.height))
+        import numpy
 
-        for i, color in enumerate(self.info.colors):
-            y, x = divmod(i, self.info.width)
+        num_pixels = self.info.width * self.info.height
 
-            if self.info.scale is not None:
-                color *= self.info.scale
+        colors = numpy.zeros(num_pixels, dtype=numpy.uint32)
 
-            color &= 0xFFFFFFFF
+        # NOTE: The colors are signed, and so we mask
+        # them to get their unsigned 32-bit values.
+        given = numpy.array(self.info.colors[:num_pixels], dtype=numpy.int64)
+        colors[:len(given)] = given & 0xFFFFFFFF
 
-            alpha = (color >> 24) & 0xFF
-            red   = (color >> 16) & 0xFF
-            green = (color >>  8) & 0xFF
-            blue  = (color >>  0) & 0xFF
+        if self.info.scale is not None:
+            # NOTE: Multiplying unsigned 32-bit values wraps
+            # just as masking the full product would.
+            colors *= numpy.uint32(self.info.scale & 0xFFFFFFFF)
 
-            rgb = tuple(self._lerp_white(component, alpha) for component in (red, green, blue))
+        alpha = colors >> 24
+        rgb   = numpy.stack([(colors >> shift) & 0xFF for shift in (16, 8, 0)], axis=-1)
 
-            im.putpixel((x, y), rgb)
+        rgb = self._lerp_white(rgb, alpha[:, None])
 
-        return im
+        return rgb.astype(numpy.uint8).reshape(self.info.height, self.info.width, 3)
+
+    def draw_image(self):
+        from PIL import Image
+
+        return Image.frombuffer(
+            "RGB",
+
+            (self.info.width, self.info.height),
+            self.image_array().tobytes(),
+
+            "raw", "RGB", 0, 1,
+        )
 
 @public
 class IPSPongPacket(ClientboundPacket):
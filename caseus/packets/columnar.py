@@ -0,0 +1,257 @@
+r"""Columnar decoding of packets into NumPy arrays.
+
+.. note::
+
+    NumPy is only imported once something is decoded
+    or encoded, and must be installed to do so.
+"""
+
+import functools
+import struct
+import pak
+
+from public import public
+
+from .packet import Packet
+
+from . import clientbound
+
+# The name, underlying type, and divisor of each scaled
+# field of the attributes of an object, in wire order.
+_SCALED_FIELDS = (
+    ("x",                ">i4", 100 / 30),
+    ("y",                ">i4", 100 / 30),
+    ("velocity_x",       ">i2", 10),
+    ("velocity_y",       ">i2", 10),
+    ("rotation",         ">i2", 100),
+    ("angular_velocity", ">i2", 100),
+)
+
+_FLAG_FIELDS = ("mice_collidable", "inactive", "add_if_missing")
+
+# The object ID and shaman object ID.
+_REMOVAL_SIZE = 6
+
+_SHAMAN_OBJECT_ID = struct.Struct(">h")
+
+@functools.lru_cache(maxsize=None)
+def _wire_dtype():
+    # The layout of an object which isn't being removed.
+
+    import numpy
+
+    return numpy.dtype([
+        ("object_id",        ">i4"),
+        ("shaman_object_id", ">i2"),
+
+        *((name, underlying) for name, underlying, _ in _SCALED_FIELDS),
+        *((name, "u1")       for name                in _FLAG_FIELDS),
+    ])
+
+@public
+@functools.lru_cache(maxsize=None)
+def object_info_dtype():
+    r"""Gets the NumPy dtype of the values of :class:`ObjectInfoArray`.
+
+    There is a field for each field of :class:`~.ClientboundObjectInfo`
+    and its attributes, with scaled fields as ``float64``\s.
+
+    For objects which should be removed, i.e. whose ``shaman_object_id``
+    is ``-1``, every field besides the object ID and shaman object ID
+    is zero.
+
+    Returns
+    -------
+    :class:`numpy.dtype`
+        The structured dtype.
+    """
+
+    import numpy
+
+    return numpy.dtype([
+        ("object_id",        numpy.int32),
+        ("shaman_object_id", numpy.int16),
+
+        *((name, numpy.float64) for name, _, _ in _SCALED_FIELDS),
+        *((name, numpy.bool_)   for name    in _FLAG_FIELDS),
+    ])
+
+def _record_starts(data, record_size):
+    # NOTE: Only objects being removed are shorter than
+    # the rest, and so we only need to read the shaman
+    # object ID of each object to find where they start.
+
+    starts = []
+
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < _REMOVAL_SIZE:
+            raise pak.util.BufferOutOfDataError("Truncated object info")
+
+        starts.append(offset)
+
+        if _SHAMAN_OBJECT_ID.unpack_from(data, offset + 4)[0] == -1:
+            offset += _REMOVAL_SIZE
+        else:
+            offset += record_size
+
+    if offset != len(data):
+        raise pak.util.BufferOutOfDataError("Truncated object info")
+
+    return starts
+
+@public
+class ObjectInfoArray(pak.Type):
+    """An array of :class:`~.ClientboundObjectInfo` as a NumPy structured array.
+
+    The array takes up the rest of the buffer, and its
+    values have the dtype returned by :func:`object_info_dtype`.
+
+    When no objects are being removed, each object takes up the
+    same number of bytes, and so the whole array is decoded with
+    a single view of the buffer. Otherwise the start of each object
+    is found first, and the objects are then gathered all at once.
+
+    Unpacked arrays are read-only, so that they may not be modified
+    in-place when their packet is immutable. A mutable copy of the
+    packet, made with :meth:`pak.Packet.copy`, has a writeable array.
+    """
+
+    @classmethod
+    def _default(cls, *, ctx):
+        import numpy
+
+        return numpy.empty(0, dtype=object_info_dtype())
+
+    @classmethod
+    def _unpack(cls, buf, *, ctx):
+        import numpy
+
+        data       = buf.read()
+        wire_dtype = _wire_dtype()
+
+        wire = None
+        if len(data) % wire_dtype.itemsize == 0:
+            wire = numpy.frombuffer(data, dtype=wire_dtype)
+
+            if (wire["shaman_object_id"] == -1).any():
+                wire = None
+
+        if wire is None:
+            starts = numpy.array(_record_starts(data, wire_dtype.itemsize), dtype=numpy.intp)
+
+            # NOTE: We pad the data so that an object being removed
+            # at the end may be gathered as if it were full length.
+            padded = numpy.frombuffer(data + bytes(wire_dtype.itemsize - _REMOVAL_SIZE), dtype=numpy.uint8)
+
+            wire = padded[starts[:, None] + numpy.arange(wire_dtype.itemsize)].view(wire_dtype).reshape(-1)
+
+        present = wire["shaman_object_id"] != -1
+
+        objects = numpy.zeros(len(wire), dtype=object_info_dtype())
+
+        objects["object_id"]        = wire["object_id"]
+        objects["shaman_object_id"] = wire["shaman_object_id"]
+
+        for name, _, divisor in _SCALED_FIELDS:
+            objects[name] = numpy.where(present, wire[name] / divisor, 0)
+
+        for name in _FLAG_FIELDS:
+            objects[name] = present & (wire[name] != 0)
+
+        objects.flags.writeable = False
+
+        return objects
+
+    @classmethod
+    def _pack(cls, value, *, ctx):
+        import numpy
+
+        wire_dtype = _wire_dtype()
+
+        wire = numpy.zeros(len(value), dtype=wire_dtype)
+
+        wire["object_id"]        = value["object_id"]
+        wire["shaman_object_id"] = value["shaman_object_id"]
+
+        # NOTE: We truncate just as 'pak.ScaledInteger' does
+        # so that we pack the same bytes for the same values.
+        for name, _, divisor in _SCALED_FIELDS:
+            wire[name] = numpy.trunc(value[name] * divisor)
+
+        for name in _FLAG_FIELDS:
+            wire[name] = value[name]
+
+        present = wire["shaman_object_id"] != -1
+        if present.all():
+            return wire.tobytes()
+
+        # Only keep the object ID and shaman object
+        # ID of the objects which are being removed.
+        lengths = numpy.where(present, wire_dtype.itemsize, _REMOVAL_SIZE)
+        keep    = numpy.arange(wire_dtype.itemsize) < lengths[:, None]
+
+        return wire.view(numpy.uint8).reshape(-1, wire_dtype.itemsize)[keep].tobytes()
+
+@public
+class ColumnarObjectSyncPacket(Packet):
+    """A columnar alternative to :class:`.clientbound.ObjectSyncPacket`.
+
+    The objects are decoded into a NumPy structured array
+    instead of a :class:`~.ClientboundObjectInfo` for each,
+    so that they may be processed without a Python object
+    per object.
+
+    .. note::
+
+        So that it is not decoded in place of
+        :class:`.clientbound.ObjectSyncPacket`, this
+        does not inherit from :class:`~.ClientboundPacket`.
+
+        A :class:`~.Client` may decode it instead with its
+        ``columnar_object_sync`` parameter, and it may be
+        converted to and from :class:`.clientbound.ObjectSyncPacket`.
+    """
+
+    id = (4, 3)
+
+    objects: ObjectInfoArray
+
+    @classmethod
+    def from_object_sync(cls, packet, *, ctx=None):
+        """Converts a :class:`.clientbound.ObjectSyncPacket`.
+
+        If ``packet`` has memoized its packed body, such as
+        those read by a :class:`~.Proxy`, then its objects
+        are decoded straight from that body.
+
+        Parameters
+        ----------
+        packet : :class:`.clientbound.ObjectSyncPacket`
+            The packet to convert.
+        ctx : :class:`~.Packet.Context` or ``None``
+            The context for the packets.
+
+        Returns
+        -------
+        :class:`ColumnarObjectSyncPacket`
+            The converted packet.
+        """
+
+        return cls.unpack(packet.pack_without_header(ctx=ctx), ctx=ctx)
+
+    def object_sync(self, *, ctx=None):
+        """Converts to a :class:`.clientbound.ObjectSyncPacket`.
+
+        Parameters
+        ----------
+        ctx : :class:`~.Packet.Context` or ``None``
+            The context for the packets.
+
+        Returns
+        -------
+        :class:`.clientbound.ObjectSyncPacket`
+            The converted packet.
+        """
+
+        return clientbound.ObjectSyncPacket.unpack(self.pack_without_header(ctx=ctx), ctx=ctx)
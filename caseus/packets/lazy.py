@@ -0,0 +1,339 @@
+r"""Lazy decoding of large packets.
+
+Some packets carry arrays of thousands of values, most
+of which are never looked at. The packets here skim over
+those arrays when unpacked, only recording where they
+are, and decode their values once they're used.
+"""
+
+import collections.abc
+import io
+import struct
+import pak
+
+from public import public
+
+from .packet import Packet
+
+from . import clientbound
+
+from .. import types
+
+_UNSIGNED_SHORT = struct.Struct(">H")
+
+def _skim_leb128(data, offset):
+    while data[offset] & 0x80:
+        offset += 1
+
+    return offset + 1
+
+def _read_leb128(data, offset):
+    value = 0
+    shift = 0
+
+    while True:
+        byte = data[offset]
+        offset += 1
+
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if not byte & 0x80:
+            break
+
+    if byte & 0x40:
+        value -= 1 << shift
+
+    return value, offset
+
+def _skim_string(data, offset):
+    return offset + 2 + _UNSIGNED_SHORT.unpack_from(data, offset)[0]
+
+@public
+class LazySequence(collections.abc.Sequence):
+    r"""A sequence of values which are decoded once used.
+
+    Made by :class:`LazyArray` when unpacking.
+
+    The length of the sequence is known without decoding
+    anything. Iterating over the sequence decodes values
+    one at a time without keeping them, so that they may
+    be streamed through. Indexing the sequence decodes
+    and keeps every value.
+
+    Packing an unmodified :class:`LazySequence` writes
+    its original data back out without decoding it.
+    """
+
+    def __init__(self, elem_type, data, length, *, ctx):
+        self.elem_type = elem_type
+        self.data      = data
+
+        self._length = length
+        self._ctx    = ctx
+
+        self._values = None
+
+    @property
+    def decoded(self):
+        """Whether the values have been decoded and kept."""
+
+        return self._values is not None
+
+    def _decode(self):
+        if self._values is None:
+            self._values = list(self)
+
+        return self._values
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        if self._values is not None:
+            yield from self._values
+
+            return
+
+        buf = io.BytesIO(self.data)
+
+        for _ in range(self._length):
+            yield self.elem_type.unpack(buf, ctx=self._ctx)
+
+    def __getitem__(self, index):
+        return self._decode()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, LazySequence):
+            return list(self) == list(other)
+
+        if isinstance(other, list):
+            return list(self) == other
+
+        return NotImplemented
+
+    def __repr__(self):
+        if self._values is not None:
+            return repr(self._values)
+
+        return f"<{type(self).__qualname__} of {self._length} undecoded {self.elem_type.__qualname__}>"
+
+@public
+class LazyArray(pak.Type):
+    r"""A length-prefixed array which is skimmed over and decoded lazily.
+
+    Its values are :class:`LazySequence`\s when unpacked,
+    but any iterable of values may be packed.
+
+    Parameters
+    ----------
+    elem_type : typelike
+        The type of the values of the array.
+    length_type : typelike
+        The type of the prefixed length of the array.
+    skim : :class:`int` or callable
+        How to skim over a value of the array.
+
+        If an :class:`int`, then the size of each value.
+        Otherwise called with the data being unpacked and
+        the offset of a value, and returns the offset of
+        the value after it.
+    """
+
+    elem_type   = None
+    length_type = None
+    skim        = None
+
+    @classmethod
+    def _default(cls, *, ctx):
+        return []
+
+    @classmethod
+    def _skim(cls, data, offset, length):
+        if isinstance(cls.skim, int):
+            return offset + cls.skim * length
+
+        for _ in range(length):
+            offset = cls.skim(data, offset)
+
+        return offset
+
+    @classmethod
+    def _skim_section(cls, data, offset, length):
+        try:
+            end = cls._skim(data, offset, length)
+
+        except (IndexError, struct.error):
+            end = None
+
+        if end is None or end > len(data):
+            raise pak.util.BufferOutOfDataError("Skimming lazy array failed")
+
+        return end
+
+    @classmethod
+    def _unpack(cls, buf, *, ctx):
+        length = max(cls.length_type.unpack(buf, ctx=ctx), 0)
+
+        # NOTE: When able, we skim over the buffer's
+        # data without copying all of what's left.
+        if isinstance(buf, io.BytesIO):
+            start = buf.tell()
+
+            with buf.getbuffer() as data:
+                end     = cls._skim_section(data, start, length)
+                section = bytes(data[start:end])
+
+            buf.seek(end)
+
+        else:
+            data = buf.read()
+
+            end     = cls._skim_section(data, 0, length)
+            section = data[:end]
+
+            buf.seek(end - len(data), io.SEEK_CUR)
+
+        return LazySequence(cls.elem_type, section, length, ctx=ctx)
+
+    @classmethod
+    def _pack(cls, value, *, ctx):
+        if isinstance(value, LazySequence) and not value.decoded:
+            return cls.length_type.pack(len(value), ctx=ctx) + value.data
+
+        value = list(value)
+
+        return cls.length_type.pack(len(value), ctx=ctx) + b"".join(
+            cls.elem_type.pack(elem, ctx=ctx) for elem in value
+        )
+
+    @classmethod
+    def _call(cls, elem_type, length_type, skim):
+        elem_type   = pak.Type(elem_type)
+        length_type = pak.Type(length_type)
+
+        return cls.make_type(
+            f"{cls.__qualname__}({elem_type.__qualname__}, {length_type.__qualname__})",
+
+            elem_type   = elem_type,
+            length_type = length_type,
+            skim        = skim,
+        )
+
+def _skim_owned_shop_item(data, offset):
+    offset = _skim_leb128(data, offset)
+
+    # Skip 'favorited'.
+    offset += 1
+
+    num_colors, offset = _read_leb128(data, offset)
+    for _ in range(num_colors):
+        offset = _skim_leb128(data, offset)
+
+    return offset
+
+def _skim_item(data, offset):
+    # Skip to 'needed_item'.
+    offset += 15
+
+    if data[offset]:
+        return offset + 5
+
+    return offset + 1
+
+def _skim_outfit(data, offset):
+    return _skim_string(data, offset + 2) + 1
+
+def _skim_owned_shaman_object(data, offset):
+    # NOTE: The number of colors is a signed byte,
+    # and is one more than the number of colors.
+    num_colors = data[offset + 3]
+    if num_colors > 0x7F:
+        num_colors -= 0x100
+
+    return offset + 4 + 4 * max(num_colors - 1, 0)
+
+def _skim_emoji_or_banner(data, offset):
+    for _ in range(3):
+        offset = _skim_leb128(data, offset)
+
+    # Skip 'is_new'.
+    return offset + 1
+
+@public
+class LazyLoadShopPacket(Packet):
+    r"""A lazily decoded :class:`.clientbound.LoadShopPacket`.
+
+    :class:`.clientbound.LoadShopPacket` is the largest
+    packet the client receives, but often only its ``cheese``
+    and ``fraises`` are wanted. Here its arrays are only
+    skimmed over when unpacked, and are :class:`LazySequence`\s
+    which decode their values once used.
+
+    .. note::
+
+        So that it is not decoded in place of
+        :class:`.clientbound.LoadShopPacket`, this
+        does not inherit from :class:`~.ClientboundPacket`.
+
+        A :class:`~.Client` may decode it instead with its
+        ``lazy_load_shop`` parameter, and it may be converted
+        to and from :class:`.clientbound.LoadShopPacket`.
+    """
+
+    id = (8, 20)
+
+    cheese:  types.Int
+    fraises: types.Int
+    look:    types.String
+
+    owned_items: LazyArray(clientbound.LoadShopPacket.OwnedShopItemInfo, types.LEB128, _skim_owned_shop_item)
+    items:       LazyArray(clientbound.LoadShopPacket.ItemInfo,          types.Int,    _skim_item)
+
+    outfits:            LazyArray(clientbound.LoadShopPacket.OutfitInfo, types.Byte,  _skim_outfit)
+    owned_outfit_looks: LazyArray(types.String,                         types.Short, _skim_string)
+
+    owned_shaman_objects: LazyArray(clientbound.LoadShopPacket._OwnedShamanObjectInfoType, types.Short, _skim_owned_shaman_object)
+    shaman_objects:       LazyArray(clientbound.LoadShopPacket.ShamanObjectInfo,           types.Short, 13)
+
+    emojis:          LazyArray(clientbound.LoadShopPacket.EmojiInfo, types.LEB128, _skim_emoji_or_banner)
+    owned_emoji_ids: LazyArray(types.LEB128,                         types.LEB128, _skim_leb128)
+
+    banners:           LazyArray(clientbound.LoadShopPacket.BannerInfo, types.LEB128, _skim_emoji_or_banner)
+    owned_banner_ids:  LazyArray(types.LEB128,                          types.LEB128, _skim_leb128)
+    current_banner_id: types.LEB128
+
+    @classmethod
+    def from_load_shop(cls, packet, *, ctx=None):
+        """Converts a :class:`.clientbound.LoadShopPacket`.
+
+        Parameters
+        ----------
+        packet : :class:`.clientbound.LoadShopPacket`
+            The packet to convert.
+        ctx : :class:`~.Packet.Context` or ``None``
+            The context for the packets.
+
+        Returns
+        -------
+        :class:`LazyLoadShopPacket`
+            The converted packet.
+        """
+
+        return cls.unpack(packet.pack_without_header(ctx=ctx), ctx=ctx)
+
+    def load_shop(self, *, ctx=None):
+        """Converts to a :class:`.clientbound.LoadShopPacket`.
+
+        Parameters
+        ----------
+        ctx : :class:`~.Packet.Context` or ``None``
+            The context for the packets.
+
+        Returns
+        -------
+        :class:`.clientbound.LoadShopPacket`
+            The converted packet.
+        """
+
+        return clientbound.LoadShopPacket.unpack(self.pack_without_header(ctx=ctx), ctx=ctx)
@@ -1,6 +1,8 @@
 r"""The foundation for Transformice :class:`~.Packet`\s."""
 
 import abc
+import copy
+import enum
 import pak
 
 from public import public
@@ -32,8 +34,52 @@ class PacketCode(pak.Type):
 
         return types.UnsignedByte.pack(C, ctx=ctx) + types.UnsignedByte.pack(CC, ctx=ctx)
 
+class _ViewablePacket:
+    # A mixin for packets whose views made by 'immutable_view'
+    # may share their mutable values, copying them lazily.
+
+    def __getattr__(self, attr):
+        # NOTE: This is only called when an attribute is not
+        # found normally, which for views includes the values
+        # which have not yet been copied from their packet.
+        shared_values = self.__dict__.get("_shared_values")
+        if shared_values is None or attr not in shared_values:
+            raise AttributeError(f"'{type(self).__qualname__}' object has no attribute '{attr}'")
+
+        value = copy.deepcopy(shared_values.pop(attr))
+
+        self.__dict__[attr] = value
+
+        return value
+
+    def __setattr__(self, attr, value):
+        # NOTE: We check the flag in our '__dict__' instead
+        # of with 'hasattr' like 'pak.Packet' does, so that
+        # setting fields does not go through '__getattr__'.
+        if "_immutable_flag" in self.__dict__:
+            raise AttributeError(f"This '{type(self).__qualname__}' instance has been made immutable")
+
+        # NOTE: A 'Packet' may have memoized its packed body
+        # while mutable, which would be stale after this.
+        if attr != "_immutable_flag":
+            self.__dict__.pop("_packed_bodies", None)
+
+        object.__setattr__(self, attr, value)
+
+    def copy(self, **new_attrs):
+        copied = super().copy(**new_attrs)
+
+        # The shared values of a view have been deeply copied
+        # along with the view, and so may simply be moved in.
+        shared_values = copied.__dict__.pop("_shared_values", None)
+        if shared_values is not None:
+            for attr, value in shared_values.items():
+                copied.__dict__.setdefault(attr, value)
+
+        return copied
+
 @public
-class Packet(pak.Packet):
+class Packet(_ViewablePacket, pak.Packet):
     r"""A Transformice packet.
 
     The ID should be a pair of :class:`int`\s, such as ``(3, 4)``::
@@ -68,6 +114,52 @@ class Packet(pak.Packet):
     class Header(pak.Packet.Header):
         id: PacketCode
 
+    def _memoize_packed_body(self, body, *, ctx):
+        # NOTE: We bypass '__setattr__' so that
+        # this works for immutable packets.
+        self.__dict__.setdefault("_packed_bodies", {})[ctx] = body
+
+    def pack_without_header(self, *, ctx=None):
+        """Overrides :meth:`pak.Packet.pack_without_header` to memoize
+        the packed body of immutable packets.
+
+        The packed body is memoized per :class:`Packet.Context`.
+        Mutable packets are always packed anew.
+
+        .. warning::
+
+            Modifying a field value of an immutable packet
+            in-place, such as appending to a :class:`list`,
+            will not be reflected in its memoized body.
+        """
+
+        if "_immutable_flag" not in self.__dict__:
+            return super().pack_without_header(ctx=ctx)
+
+        if ctx is None:
+            ctx = self.Context()
+
+        packed_bodies = self.__dict__.get("_packed_bodies")
+        if packed_bodies is not None:
+            body = packed_bodies.get(ctx)
+            if body is not None:
+                return body
+
+        body = super().pack_without_header(ctx=ctx)
+
+        self._memoize_packed_body(body, ctx=ctx)
+
+        return body
+
+    def copy(self, **new_attrs):
+        copied = super().copy(**new_attrs)
+
+        # NOTE: The copy may be mutated, and so
+        # must not keep our memoized bodies.
+        copied.__dict__.pop("_packed_bodies", None)
+
+        return copied
+
 @public
 class ServerboundPacket(Packet):
     r"""A serverbound :class:`Packet`.
@@ -137,7 +229,7 @@ class ClientboundPacket(Packet):
     """
 
 @public
-class TribullePacket(pak.SubPacket):
+class TribullePacket(_ViewablePacket, pak.SubPacket):
     """A packet for the community platform.
 
     Such packets are used for inter-room and inter-game communication.
@@ -185,7 +277,7 @@ class FingerprintedClientboundTribullePacket(ClientboundTribullePacket):
     fingerprint: types.Int
 
 @public
-class LegacyPacket(pak.Packet, abc.ABC):
+class LegacyPacket(_ViewablePacket, pak.Packet, abc.ABC):
     """A legacy packet.
 
     These packets are from an older time and are of
@@ -292,7 +384,7 @@ class ClientboundLegacyPacket(LegacyPacket):
     """
 
 @public
-class ExtensionPacket(pak.SubPacket):
+class ExtensionPacket(_ViewablePacket, pak.SubPacket):
     """A packet not contained in the vanilla protocol."""
 
     class Header(pak.Packet.Header):
@@ -309,3 +401,97 @@ class ServerboundExtensionPacket(ExtensionPacket):
 @public
 class ClientboundExtensionPacket(ExtensionPacket):
     pass
+
+# The types of values which may be shared between a packet and its views.
+_IMMUTABLE_TYPES = (type(None), int, float, complex, str, bytes, frozenset, enum.Enum)
+
+def _is_immutable_value(value):
+    if isinstance(value, tuple):
+        return all(_is_immutable_value(elem) for elem in value)
+
+    return isinstance(value, _IMMUTABLE_TYPES)
+
+@public
+def immutable_view(packet, **new_attrs):
+    r"""Makes an immutable view of a :class:`pak.Packet`.
+
+    Unlike :meth:`pak.Packet.immutable_copy`, the view shares
+    its attribute values with ``packet`` instead of deeply
+    copying them, so it is cheap to make. To modify the view,
+    a mutable copy must be made of it with :meth:`pak.Packet.copy`.
+
+    .. note::
+
+        Immutable values, such as :class:`int`\s and :class:`str`\s,
+        are shared outright. Mutable values, such as :class:`list`\s
+        and nested packets, are instead deeply copied the first time
+        they are accessed through the view, so that the view may not
+        modify ``packet`` in-place.
+
+        Until a mutable value is accessed however, in-place changes
+        to it through ``packet`` will be seen by the view, and so
+        ``packet`` should not be modified while the view is in use.
+
+    Parameters
+    ----------
+    packet : :class:`pak.Packet`
+        The packet to make a view of.
+    **new_attrs
+        The new attributes to set on the view.
+
+        These do not affect ``packet``.
+
+    Returns
+    -------
+    :class:`pak.Packet`
+        The immutable view of ``packet``.
+    """
+
+    view = object.__new__(type(packet))
+
+    attrs = view.__dict__
+
+    # NOTE: The values not yet copied by a view of a view
+    # are still the values of the original packet.
+    shared_values = dict(packet.__dict__.get("_shared_values", {}))
+
+    for attr, value in packet.__dict__.items():
+        if _is_immutable_value(value):
+            attrs[attr] = value
+        else:
+            shared_values[attr] = value
+
+    attrs.pop("_immutable_flag", None)
+    shared_values.pop("_shared_values", None)
+
+    # Memoized packed bodies may only be shared if the
+    # packet is immutable and no field is overridden.
+    packed_bodies = shared_values.pop("_packed_bodies", None)
+    if (
+        packed_bodies is not None and
+
+        "_immutable_flag" in packet.__dict__ and
+
+        not any(packet.has_field(name) for name in new_attrs)
+    ):
+        attrs["_packed_bodies"] = packed_bodies
+
+    for name, value in new_attrs.items():
+        setattr(view, name, value)
+
+    # NOTE: The overridden values must not be
+    # replaced by the values of the packet.
+    for attr in attrs.keys() & shared_values.keys():
+        del shared_values[attr]
+
+    if isinstance(view, _ViewablePacket):
+        attrs["_shared_values"] = shared_values
+    else:
+        # Other packets cannot copy their values
+        # lazily, and so we copy them upfront.
+        for attr, value in shared_values.items():
+            attrs[attr] = copy.deepcopy(value)
+
+    view.make_immutable()
+
+    return view
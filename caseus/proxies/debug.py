@@ -2,8 +2,6 @@ import pak
 
 from public import public
 
-from aioconsole import aprint
-
 from .proxy import Proxy
 
 from ..packets import Packet, ServerboundPacket
@@ -31,6 +29,8 @@ class LoggingProxy(Proxy):
         else:
             connection = "MAIN"
 
+        from aioconsole import aprint
+
         await aprint(f"{connection}: {bound}: {packet}")
 
     async def _log_specific_packets(self, source, packet):
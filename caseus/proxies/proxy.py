@@ -10,16 +10,19 @@ from ..packets import (
     Packet,
     ServerboundPacket,
     ClientboundPacket,
+    immutable_view,
     serverbound,
     clientbound,
 )
 
 from ..secrets import Secrets
 
+from ..util import AsyncPacketHandler, TCPTransport
+
 from .. import types
 
 @public
-class Proxy(pak.AsyncPacketHandler):
+class Proxy(AsyncPacketHandler):
     SOCKET_POLICY_RESPONSE = b'<cross-domain-policy><allow-access-from domain="*" to-ports="*" secure="false" /></cross-domain-policy>\x00'
 
     CORRECTED_LOADER_SIZE = 0x1FBD
@@ -44,11 +47,31 @@ class Proxy(pak.AsyncPacketHandler):
                 self.server = server
 
         def __init__(self, proxy, *, destination=None, **kwargs):
+            self._destination_set = asyncio.Event()
+
             self.proxy       = proxy
             self.destination = destination
 
             super().__init__(ctx=Packet.Context(), **kwargs)
 
+        @property
+        def destination(self):
+            return self._destination
+
+        @destination.setter
+        def destination(self, value):
+            self._destination = value
+
+            if value is None:
+                self._destination_set.clear()
+            else:
+                self._destination_set.set()
+
+        async def wait_for_destination(self):
+            await self._destination_set.wait()
+
+            return self._destination
+
         def is_closing(self):
             if self.destination is None:
                 return pak.io.Connection.is_closing(self)
@@ -87,19 +110,42 @@ class Proxy(pak.AsyncPacketHandler):
             if length is None:
                 return None
 
+            tracer = self.proxy.tracer
+            if tracer is not None:
+                tracer.start_trace(self._read_direction)
+
             data = await self.read_data(length)
             if data is None:
                 return None
 
+            if tracer is not None:
+                tracer.mark(tracer.READ)
+
             buf = io.BytesIO(data)
 
-            return self._packet_from_data(buf)
+            metrics = self.proxy.metrics
+            if metrics is not None:
+                packet = metrics.decode_packet(self._packet_from_data, buf, size=len(data))
+            else:
+                packet = self._packet_from_data(buf)
+
+            if tracer is not None:
+                tracer.decoded(packet)
+
+            return packet
 
         def _written_packet_length(self, data):
             return len(data)
 
         def _written_packet_data(self, packet):
-            return packet.pack(ctx=self.ctx)
+            with self.proxy._timed("encode", type(packet), "outgoing"):
+                packet_data = packet.pack(ctx=self.ctx)
+
+            tracer = self.proxy.tracer
+            if tracer is not None:
+                tracer.mark(tracer.ENCODE, packet)
+
+            return packet_data
 
         async def write_packet_instance(self, packet):
             # TODO: Do we want to add quality of life writing for nested packets?
@@ -114,6 +160,14 @@ class Proxy(pak.AsyncPacketHandler):
                 packet_data
             )
 
+            metrics = self.proxy.metrics
+            if metrics is not None:
+                metrics.count_packet(type(packet), "outgoing", len(packet_data))
+
+            tracer = self.proxy.tracer
+            if tracer is not None:
+                tracer.finish(packet)
+
         @property
         def secrets(self):
             # TODO: It would be nice to always get these from the main client,
@@ -139,6 +193,8 @@ class Proxy(pak.AsyncPacketHandler):
     # allow for 'CommonConnection'.
 
     class ServerConnection(_Connection):
+        _read_direction = "clientbound"
+
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
 
@@ -172,8 +228,19 @@ class Proxy(pak.AsyncPacketHandler):
 
             self.fingerprint = (self.fingerprint + 1) % 100
 
-            packet_body = packet.pack_without_header(ctx=self.ctx)
-            packet_body = packet.cipher_data(packet_body, ctx=self.ctx, fingerprint=header.fingerprint)
+            tracer = self.proxy.tracer
+
+            with self.proxy._timed("encode", type(packet), "outgoing"):
+                packet_body = packet.pack_without_header(ctx=self.ctx)
+
+            if tracer is not None:
+                tracer.mark(tracer.ENCODE, packet)
+
+            with self.proxy._timed("cipher", type(packet), "outgoing"):
+                packet_body = packet.cipher_data(packet_body, ctx=self.ctx, fingerprint=header.fingerprint)
+
+            if tracer is not None:
+                tracer.mark(tracer.CIPHER, packet)
 
             return header.pack(ctx=self.ctx) + packet_body
 
@@ -184,9 +251,19 @@ class Proxy(pak.AsyncPacketHandler):
             if packet_cls is None:
                 packet_cls = ClientboundPacket.GenericWithID(header.id)
 
-            return packet_cls.unpack(buf, ctx=self.ctx)
+            body = buf.read()
+
+            packet = packet_cls.unpack(body, ctx=self.ctx)
+
+            # NOTE: We remember the body we received so
+            # that forwarding the packet doesn't repack it.
+            packet._memoize_packed_body(body, ctx=self.ctx)
+
+            return packet
 
     class ClientConnection(_Connection):
+        _read_direction = "serverbound"
+
         def __init__(self, proxy, *, is_satellite=False, main=None, **kwargs):
             super().__init__(proxy, **kwargs)
 
@@ -196,25 +273,21 @@ class Proxy(pak.AsyncPacketHandler):
                 self.main      = main
                 self.satellite = self.Pair(client=self, server=self.destination)
 
-                self.proxy.satellite_clients.append(self)
+                self.proxy.satellite_clients.add(self)
             else:
                 self.main      = self.Pair(client=self, server=self.destination)
                 self.satellite = None
 
-                self.proxy.main_clients.append(self)
+                self.proxy.main_clients.add(self)
 
             self._session_id = None
 
         def close(self):
-            try:
-                if self.is_satellite:
-                    self.proxy.satellite_clients.remove(self)
-                else:
-                    self.proxy.main_clients.remove(self)
-
-            # We might already have been closed.
-            except ValueError:
-                pass
+            # NOTE: We might already have been closed.
+            if self.is_satellite:
+                self.proxy.satellite_clients.discard(self)
+            else:
+                self.proxy.main_clients.discard(self)
 
             super().close()
 
@@ -234,11 +307,24 @@ class Proxy(pak.AsyncPacketHandler):
                 packet_cls = ServerboundPacket.GenericWithID(header.id)
 
             if self.secrets.packet_key_sources is not None:
-                buf = packet_cls.decipher_data(buf, ctx=self.ctx, fingerprint=header.fingerprint)
-            elif packet_cls.CIPHER is not None:
-                packet_cls = ServerboundPacket.GenericWithID(header.id)
+                with self.proxy._timed("cipher", packet_cls, "incoming"):
+                    body = packet_cls.decipher_data(buf, ctx=self.ctx, fingerprint=header.fingerprint)
+
+                tracer = self.proxy.tracer
+                if tracer is not None:
+                    tracer.mark(tracer.DECIPHER)
+
+            else:
+                if packet_cls.CIPHER is not None:
+                    packet_cls = ServerboundPacket.GenericWithID(header.id)
+
+                body = buf.read()
+
+            packet = packet_cls.unpack_with_fingerprint(header.fingerprint, body, ctx=self.ctx)
 
-            packet = packet_cls.unpack_with_fingerprint(header.fingerprint, buf, ctx=self.ctx)
+            # NOTE: We remember the deciphered body so that
+            # forwarding the packet doesn't repack it.
+            packet._memoize_packed_body(body, ctx=self.ctx)
 
             return packet
 
@@ -246,6 +332,11 @@ class Proxy(pak.AsyncPacketHandler):
     FORWARD_PACKET = pak.util.UniqueSentinel("FORWARD_PACEKT")
     DO_NOTHING     = pak.util.UniqueSentinel("DO_NOTHING") # TODO: Better name?
 
+    # How long, in seconds, we remember a satellite server that
+    # we told the game to connect to through us. If the game has
+    # not connected to us by then, it is assumed it never will.
+    SATELLITE_HANDOFF_TIMEOUT = 60
+
     def __init__(
         self,
         *,
@@ -259,6 +350,8 @@ class Proxy(pak.AsyncPacketHandler):
 
         main_server_address = None,
         main_server_ports   = None,
+
+        transport = None,
     ):
         super().__init__()
 
@@ -276,19 +369,68 @@ class Proxy(pak.AsyncPacketHandler):
         if main_server_address is None or main_server_ports is None:
             self.register_packet_listener(self._connect_to_main_server, serverbound.MainServerInfoPacket)
 
+        if transport is None:
+            transport = TCPTransport()
+
+        self.transport = transport
+
         self.main_srv     = None
-        self.main_clients = []
+        self.main_clients = set()
 
         self.satellite_srv     = None
-        self.satellite_clients = []
+        self.satellite_clients = set()
+
+        # Maps auth IDs to the satellite servers we are proxying
+        # along with their main clients and when they expire.
+        self._satellite_handoffs = {}
 
-        self._satellite_packets = []
+        self.tracer = None
 
         self.socket_policy_srv = None
 
     def register_packet_listener(self, listener, *packet_types, after=False, **flags):
         super().register_packet_listener(listener, *packet_types, after=after, **flags)
 
+    def enable_tracing(self, tracer=None, **kwargs):
+        """Enables tracing the latency added to forwarded packets.
+
+        Parameters
+        ----------
+        tracer : :class:`~.LatencyTracer` or ``None``
+            The tracer to record into.
+
+            If ``None``, then a new tracer is created.
+        **kwargs
+            Passed to :class:`~.LatencyTracer` when creating a new tracer.
+
+        Returns
+        -------
+        :class:`~.LatencyTracer`
+            The tracer being recorded into.
+        """
+
+        if tracer is None:
+            from ..stats import LatencyTracer
+
+            tracer = LatencyTracer(**kwargs)
+
+        self.tracer = tracer
+
+        return tracer
+
+    def disable_tracing(self):
+        """Disables tracing the latency added to forwarded packets."""
+
+        self.tracer = None
+
+    def stats(self):
+        stats = super().stats()
+
+        if self.tracer is not None:
+            stats["tracing"] = self.tracer.snapshot()
+
+        return stats
+
     def is_serving(self):
         return (
             self.main_srv      is not None and self.main_srv.is_serving()      and
@@ -323,32 +465,42 @@ class Proxy(pak.AsyncPacketHandler):
         await self.wait_closed()
 
     async def _listen_to_nested_packet(self, source_conn, packet, *, after):
-        packet = packet.immutable_copy()
+        listeners = self.listeners_for_packet(packet, after=after)
+        if len(listeners) <= 0:
+            return
 
-        async with self.listener_task_group(listen_sequentially=source_conn._listen_sequentially) as group:
-            for listener in self.listeners_for_packet(packet, after=after):
-                group.create_task(listener(source_conn, packet))
+        packet = immutable_view(packet)
 
-    async def _listen_to_packet(self, source_conn, packet):
-        async with self.listener_task_group(listen_sequentially=source_conn._listen_sequentially) as group:
-            before_listeners = self.listeners_for_packet(packet, after=False)
-            async def proxy_wrapper():
-                results = await asyncio.gather(*[listener(source_conn, packet) for listener in before_listeners])
+        await self._dispatch_to_listeners(listeners, source_conn, packet, listen_sequentially=source_conn._listen_sequentially)
+
+    async def _proxy_packet(self, source_conn, packet):
+        results = await self._await_listeners(self.listeners_for_packet(packet, after=False), source_conn, packet)
+
+        if self.tracer is not None:
+            self.tracer.mark(self.tracer.LISTENERS, packet)
 
-                if self.DO_NOTHING in results:
-                    return
+        if self.DO_NOTHING in results:
+            return
+
+        if self.REPLACE_PACKET in results:
+            await source_conn.destination._replace_packet(packet)
 
-                if self.REPLACE_PACKET in results:
-                    await source_conn.destination._replace_packet(packet)
+            return
 
-                    return
+        await source_conn.destination.write_packet_instance(packet)
 
-                await source_conn.destination.write_packet_instance(packet)
+        await self._await_listeners(self.listeners_for_packet(packet, after=True), source_conn, packet)
+
+    async def _listen_to_packet(self, source_conn, packet):
+        # NOTE: When listening sequentially we proxy the
+        # packet inline, avoiding creating a task for it.
+        if source_conn._listen_sequentially:
+            await self._proxy_packet(source_conn, packet)
 
-                after_listeners = self.listeners_for_packet(packet, after=True)
-                await asyncio.gather(*[listener(source_conn, packet) for listener in after_listeners])
+            return
 
-            group.create_task(proxy_wrapper())
+        async with self.listener_task_group(listen_sequentially=False) as group:
+            group.create_task(self._proxy_packet(source_conn, packet))
 
     async def _listen_impl(self, source_conn):
         while self.is_serving() and not source_conn.is_closing():
@@ -365,14 +517,20 @@ class Proxy(pak.AsyncPacketHandler):
         client_task = asyncio.create_task(self._listen_impl(client))
 
         # The server connection gets initialized later.
-        while client.destination is None:
-            if client.is_closing():
+        if client.destination is None:
+            destination_task = asyncio.create_task(client.wait_for_destination())
+
+            # The client task finishes if the client closes
+            # before the server connection gets initialized.
+            await asyncio.wait([client_task, destination_task], return_when=asyncio.FIRST_COMPLETED)
+
+            if not destination_task.done():
+                destination_task.cancel()
+
                 await client_task
 
                 return
 
-            await pak.util.yield_exec()
-
         await asyncio.gather(client_task, self._listen_impl(client.destination))
 
     async def new_main_connection(self, client_reader, client_writer):
@@ -397,14 +555,43 @@ class Proxy(pak.AsyncPacketHandler):
             await self.listen(client)
 
     async def open_main_server(self):
-        return await asyncio.start_server(self.new_main_connection, self.host_address, self.host_main_port)
+        return await self.transport.start_server(self.new_main_connection, self.host_address, self.host_main_port)
+
+    def _expire_satellite_handoffs(self, now):
+        # Handoffs are kept in the order they expire,
+        # so we only ever need to look at the oldest.
+        while len(self._satellite_handoffs) > 0:
+            auth_id, (_, _, expiry) = next(iter(self._satellite_handoffs.items()))
+            if expiry > now:
+                return
+
+            self._satellite_handoffs.pop(auth_id)
+
+    def _add_satellite_handoff(self, packet, main_client, *, now=None):
+        if now is None:
+            now = asyncio.get_running_loop().time()
+
+        self._expire_satellite_handoffs(now)
+
+        # Remove any previous handoff so that
+        # the order of expiry is maintained.
+        self._satellite_handoffs.pop(packet.auth_id, None)
 
-    def _satellite_info_with_auth_id(self, auth_id):
-        for packet, main_client in self._satellite_packets:
-            if packet.auth_id == auth_id:
-                return packet, main_client
+        self._satellite_handoffs[packet.auth_id] = (packet, main_client, now + self.SATELLITE_HANDOFF_TIMEOUT)
 
-        return None, None
+    def _pop_satellite_handoff(self, auth_id, *, now=None):
+        if now is None:
+            now = asyncio.get_running_loop().time()
+
+        self._expire_satellite_handoffs(now)
+
+        handoff = self._satellite_handoffs.pop(auth_id, None)
+        if handoff is None:
+            return None, None
+
+        packet, main_client, _ = handoff
+
+        return packet, main_client
 
     async def new_satellite_connection(self, client_reader, client_writer):
         client = self.ClientConnection(self, is_satellite=True, reader=client_reader, writer=client_writer)
@@ -413,7 +600,7 @@ class Proxy(pak.AsyncPacketHandler):
             await self.listen(client)
 
     async def open_satellite_server(self):
-        return await asyncio.start_server(self.new_satellite_connection, self.host_address, self.host_satellite_port)
+        return await self.transport.start_server(self.new_satellite_connection, self.host_address, self.host_satellite_port)
 
     async def new_socket_policy_connection(self, reader, writer):
         writer.write(self.SOCKET_POLICY_RESPONSE)
@@ -423,12 +610,12 @@ class Proxy(pak.AsyncPacketHandler):
         await writer.wait_closed()
 
     async def open_socket_policy_server(self):
-        return await asyncio.start_server(self.new_socket_policy_connection, self.host_address, self.host_socket_policy_port)
+        return await self.transport.start_server(self.new_socket_policy_connection, self.host_address, self.host_socket_policy_port)
 
     async def open_streams(self, address, ports):
         for port in random.sample(ports, len(ports)):
             try:
-                return await asyncio.open_connection(address, port)
+                return await self.transport.open_connection(address, port)
 
             except Exception:
                 continue
@@ -456,10 +643,11 @@ class Proxy(pak.AsyncPacketHandler):
         await asyncio.gather(*server_tasks)
 
     async def start(self):
-        await self.startup()
+        async with self._monitoring_loop_lag():
+            await self.startup()
 
-        async with self:
-            await self.on_start()
+            async with self:
+                await self.on_start()
 
     def run(self):
         try:
@@ -505,7 +693,7 @@ class Proxy(pak.AsyncPacketHandler):
         if packet.should_ignore:
             return self.FORWARD_PACKET
 
-        self._satellite_packets.append((packet, source.destination))
+        self._add_satellite_handoff(packet, source.destination)
 
         proxied = packet.copy(
             address = self.expected_address,
@@ -520,14 +708,12 @@ class Proxy(pak.AsyncPacketHandler):
     async def _complete_satellite_proxy(self, source, packet):
         # TODO: I'm probably forgetting to close a previous satellite connection here.
 
-        original_packet, main_client = self._satellite_info_with_auth_id(packet.auth_id)
+        original_packet, main_client = self._pop_satellite_handoff(packet.auth_id)
         if original_packet is None:
             source.close()
 
             return
 
-        self._satellite_packets.remove((original_packet, main_client))
-
         source.main    = source.Pair(client=main_client, server=main_client.destination)
         source.secrets = main_client.secrets
 
@@ -1,5 +1,3 @@
-from aioconsole import aprint
-
 from public import public
 
 from .server import MinimalServer
@@ -32,6 +30,8 @@ class LoggingServer(MinimalServer):
         else:
             connection_name = "MAIN"
 
+        from aioconsole import aprint
+
         await aprint(f"{connection_name}: {bound}: {packet}")
 
     async def _log_all_incoming_packets(self, client, packet):
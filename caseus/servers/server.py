@@ -1,5 +1,6 @@
 import asyncio
 import io
+import math
 import random
 import pak
 
@@ -7,21 +8,107 @@ from public import public
 
 from ..packets import (
     ServerboundPacket,
+    immutable_view,
     serverbound,
     clientbound,
 )
 
 from ..secrets import Secrets
 
+from ..util import AsyncPacketHandler, TCPTransport
+
 from .. import types
 
 @public
-class MinimalServer(pak.AsyncPacketHandler):
+class MinimalServer(AsyncPacketHandler):
     SOCKET_POLICY_RESPONSE = b'<cross-domain-policy><allow-access-from domain="*" to-ports="*" secure="false" /></cross-domain-policy>\x00'
 
     MAX_AUTH_TOKEN         = 2**31 - 1
     MAX_VERIFICATION_TOKEN = 2**31 - 1
 
+    # How often, in seconds, connections are checked for
+    # whether their keep alive deadlines have passed.
+    KEEP_ALIVE_SWEEP_INTERVAL = 1
+
+    class _KeepAliveWheel:
+        # A hashed timer wheel for the keep alive deadlines of connections.
+        #
+        # Each slot of the wheel holds the connections whose deadlines
+        # fall within a single tick. Refreshing a deadline then only
+        # moves a connection between slots, and a single periodic sweep
+        # over the elapsed slots finds every expired connection, instead
+        # of each connection holding its own sleeping task.
+
+        def __init__(self, *, timeout, tick):
+            self.timeout = timeout
+            self.tick    = tick
+
+            # NOTE: We have one more slot than is needed to
+            # span the timeout so that a refreshed deadline
+            # never lands in a slot which is yet to be swept
+            # for the current revolution of the wheel.
+            self._slots = [set() for _ in range(math.ceil(timeout / tick) + 1)]
+
+            self._deadlines    = {}
+            self._slot_indices = {}
+
+            self._last_swept_tick = None
+
+        def _tick_for_time(self, time):
+            return int(time // self.tick)
+
+        def refresh(self, connection, *, now):
+            deadline = now + self.timeout
+            index    = self._tick_for_time(deadline) % len(self._slots)
+
+            previous_index = self._slot_indices.get(connection)
+            if previous_index != index:
+                if previous_index is not None:
+                    self._slots[previous_index].discard(connection)
+
+                self._slots[index].add(connection)
+                self._slot_indices[connection] = index
+
+            self._deadlines[connection] = deadline
+
+        def remove(self, connection):
+            index = self._slot_indices.pop(connection, None)
+            if index is None:
+                return
+
+            self._slots[index].discard(connection)
+            self._deadlines.pop(connection)
+
+        def pop_expired(self, *, now):
+            # We only sweep ticks which have fully elapsed so
+            # that every deadline within a swept slot has passed.
+            last_elapsed_tick = self._tick_for_time(now) - 1
+
+            if self._last_swept_tick is None:
+                first_tick = last_elapsed_tick
+            else:
+                # Never sweep more than a full revolution.
+                first_tick = max(self._last_swept_tick + 1, last_elapsed_tick - len(self._slots) + 1)
+
+            self._last_swept_tick = last_elapsed_tick
+
+            expired = []
+            for tick in range(first_tick, last_elapsed_tick + 1):
+                slot = self._slots[tick % len(self._slots)]
+
+                for connection in list(slot):
+                    # If the sweep lags behind, a refreshed deadline
+                    # may be a full revolution ahead of the swept tick
+                    # while sharing its slot, in which case it stays put.
+                    if self._deadlines[connection] > now:
+                        continue
+
+                    self.remove(connection)
+
+                    expired.append(connection)
+
+            return expired
+
     class Connection(pak.io.Connection):
         class SynchronizedAttr:
             def __init__(self, initial_value):
@@ -59,7 +146,7 @@ class MinimalServer(pak.AsyncPacketHandler):
                 self.main      = main
                 self.satellite = self
 
-                self.server.satellite_clients.append(self)
+                self.server.satellite_clients.add(self)
             else:
                 # NOTE: The game sets both connections
                 # to the main connection when constructing
@@ -67,46 +154,25 @@ class MinimalServer(pak.AsyncPacketHandler):
                 self.main      = self
                 self.satellite = self
 
-                self.server.main_clients.append(self)
-
-            self._keep_alive_lock = asyncio.Lock()
-            self._keep_alive_task = None
+                self.server.main_clients.add(self)
 
             self._listen_sequentially = True
 
-        async def _refresh_keep_alive(self):
-            async with self._keep_alive_lock:
-                if self._keep_alive_task is not None:
-                    self._keep_alive_task.cancel()
-                    await self._keep_alive_task
-
-                self._keep_alive_task = asyncio.create_task(self.server._keep_alive_close(self))
+        def _refresh_keep_alive(self):
+            self.server._keep_alive_wheel.refresh(self, now=asyncio.get_running_loop().time())
 
         def close(self):
-            try:
-                if self.is_satellite:
-                    self.server.satellite_clients.remove(self)
-                else:
-                    self.server.main_clients.remove(self)
-
-            # We might already have been closed.
-            except ValueError:
-                pass
+            # NOTE: We might already have been closed.
+            if self.is_satellite:
+                self.server.satellite_clients.discard(self)
+            else:
+                self.server.main_clients.discard(self)
 
-            if self._keep_alive_task is not None:
-                self._keep_alive_task.cancel()
+            if self.server._keep_alive_wheel is not None:
+                self.server._keep_alive_wheel.remove(self)
 
             super().close()
 
-        async def wait_closed(self):
-
-            if self._keep_alive_task is not None:
-                await self._keep_alive_task
-
-                self._keep_alive_task = None
-
-            await super().wait_closed()
-
         @property
         def secrets(self):
             return self.ctx.secrets
@@ -145,6 +211,13 @@ class MinimalServer(pak.AsyncPacketHandler):
 
             buf = io.BytesIO(data)
 
+            metrics = self.server.metrics
+            if metrics is not None:
+                return metrics.decode_packet(self._packet_from_data, buf, size=len(data))
+
+            return self._packet_from_data(buf)
+
+        def _packet_from_data(self, buf):
             header = ServerboundPacket.Header.unpack(buf, ctx=self.ctx)
 
             packet_cls = ServerboundPacket.subclass_with_id(header.id, ctx=self.ctx)
@@ -152,14 +225,17 @@ class MinimalServer(pak.AsyncPacketHandler):
                 packet_cls = ServerboundPacket.GenericWithID(header.id)
 
             if self.secrets.packet_key_sources is not None:
-                buf = packet_cls.decipher_data(buf, ctx=self.ctx, fingerprint=header.fingerprint)
+                with self.server._timed("cipher", packet_cls, "incoming"):
+                    buf = packet_cls.decipher_data(buf, ctx=self.ctx, fingerprint=header.fingerprint)
+
             elif packet_cls.CIPHER is not None:
                 packet_cls = ServerboundPacket.GenericWithID(header.id)
 
             return packet_cls.unpack_with_fingerprint(header.fingerprint, buf, ctx=self.ctx)
 
         async def write_packet_instance(self, packet):
-            packet_data = packet.pack(ctx=self.ctx)
+            with self.server._timed("encode", type(packet), "outgoing"):
+                packet_data = packet.pack(ctx=self.ctx)
 
             type_ctx = pak.Type.Context(ctx=self.ctx)
 
@@ -169,6 +245,10 @@ class MinimalServer(pak.AsyncPacketHandler):
                 packet_data
             )
 
+            metrics = self.server.metrics
+            if metrics is not None:
+                metrics.count_packet(type(packet), "outgoing", len(packet_data))
+
             await self.server._listen_to_copied_packet(self, packet, outgoing=True)
 
     def __init__(
@@ -186,6 +266,8 @@ class MinimalServer(pak.AsyncPacketHandler):
         game_version                 = None,
         auth_key                     = None,
         client_verification_template = None,
+
+        transport = None,
     ):
         super().__init__()
 
@@ -196,6 +278,14 @@ class MinimalServer(pak.AsyncPacketHandler):
 
         self.keep_alive_timeout = keep_alive_timeout
 
+        if keep_alive_timeout is not None:
+            self._keep_alive_wheel = self._KeepAliveWheel(
+                timeout = keep_alive_timeout,
+                tick    = self.KEEP_ALIVE_SWEEP_INTERVAL,
+            )
+        else:
+            self._keep_alive_wheel = None
+
         self.loader_stage_size = loader_stage_size
 
         self.initial_secrets = Secrets(
@@ -204,13 +294,18 @@ class MinimalServer(pak.AsyncPacketHandler):
             client_verification_template = client_verification_template,
         )
 
+        if transport is None:
+            transport = TCPTransport()
+
+        self.transport = transport
+
         self.main_srv     = None
-        self.main_clients = []
+        self.main_clients = set()
 
         self.socket_policy_srv = None
 
         self.satellite_srv     = None
-        self.satellite_clients = []
+        self.satellite_clients = set()
 
     def register_packet_listener(self, listener, *packet_types, outgoing=False, **flags):
         super().register_packet_listener(listener, *packet_types, outgoing=outgoing, **flags)
@@ -253,16 +348,18 @@ class MinimalServer(pak.AsyncPacketHandler):
         if len(listeners) <= 0:
             return
 
-        packet = packet.immutable_copy()
+        packet = immutable_view(packet)
 
-        async with self.listener_task_group(listen_sequentially=client._listen_sequentially) as group:
-            for listener in listeners:
-                group.create_task(listener(client, packet))
+        await self._dispatch_to_listeners(listeners, client, packet, listen_sequentially=client._listen_sequentially)
 
     async def _listen_to_incoming_packet(self, client, packet):
-        async with self.listener_task_group(listen_sequentially=client._listen_sequentially) as group:
-            for listener in self.listeners_for_packet(packet, outgoing=False):
-                group.create_task(listener(client, packet))
+        await self._dispatch_to_listeners(
+            self.listeners_for_packet(packet, outgoing=False),
+
+            client, packet,
+
+            listen_sequentially = client._listen_sequentially,
+        )
 
     async def listen(self, client):
         while self.is_serving() and not client.is_closing():
@@ -279,17 +376,17 @@ class MinimalServer(pak.AsyncPacketHandler):
             finally:
                 await self.end_listener_tasks()
 
-    async def _keep_alive_close(self, client):
-        # This will be canceled when a keep alive is received.
+    async def _sweep_keep_alives(self):
+        loop = asyncio.get_running_loop()
 
-        try:
-            await asyncio.sleep(self.keep_alive_timeout)
-
-            client.close()
-            await client.wait_closed()
+        while True:
+            await asyncio.sleep(self.KEEP_ALIVE_SWEEP_INTERVAL)
 
-        except asyncio.CancelledError:
-            return
+            # NOTE: We only need to close the expired connections,
+            # as closing them ends their listening, after which
+            # they are waited on to finish closing.
+            for client in self._keep_alive_wheel.pop_expired(now=loop.time()):
+                client.close()
 
     async def new_main_connection(self, client_reader, client_writer):
         client = self.Connection(
@@ -302,13 +399,13 @@ class MinimalServer(pak.AsyncPacketHandler):
         )
 
         async with client:
-            if self.keep_alive_timeout is not None:
-                await client._refresh_keep_alive()
+            if self._keep_alive_wheel is not None:
+                client._refresh_keep_alive()
 
             await self.listen(client)
 
     async def open_main_server(self):
-        return await asyncio.start_server(self.new_main_connection, self.host_main_address, self.host_main_port)
+        return await self.transport.start_server(self.new_main_connection, self.host_main_address, self.host_main_port)
 
     async def new_socket_policy_connection(self, reader, writer):
         writer.write(self.SOCKET_POLICY_RESPONSE)
@@ -318,7 +415,7 @@ class MinimalServer(pak.AsyncPacketHandler):
         await writer.wait_closed()
 
     async def open_socket_policy_server(self):
-        return await asyncio.start_server(self.new_socket_policy_connection, self.host_main_address, self.host_socket_policy_port)
+        return await self.transport.start_server(self.new_socket_policy_connection, self.host_main_address, self.host_socket_policy_port)
 
     async def startup(self):
         self.main_srv = await self.open_main_server()
@@ -334,13 +431,17 @@ class MinimalServer(pak.AsyncPacketHandler):
         if self.socket_policy_srv is not None:
             server_tasks.append(self.socket_policy_srv.serve_forever())
 
+        if self._keep_alive_wheel is not None:
+            server_tasks.append(self._sweep_keep_alives())
+
         await asyncio.gather(*server_tasks)
 
     async def start(self):
-        await self.startup()
+        async with self._monitoring_loop_lag():
+            await self.startup()
 
-        async with self:
-            await self.on_start()
+            async with self:
+                await self.on_start()
 
     def run(self):
         try:
@@ -489,10 +590,10 @@ class MinimalServer(pak.AsyncPacketHandler):
 
     @pak.packet_listener(serverbound.KeepAlivePacket)
     async def _on_keep_alive(self, client, packet):
-        if self.keep_alive_timeout is None:
+        if self._keep_alive_wheel is None:
             return
 
-        await client._refresh_keep_alive()
+        client._refresh_keep_alive()
 
     @pak.packet_listener(serverbound.TribulleWrapperPacket)
     async def _on_tribulle_wrapper(self, client, packet):
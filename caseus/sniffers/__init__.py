@@ -1,2 +1,7 @@
-from .debug   import *
-from .sniffer import *
+from .capture    import *
+from .debug      import *
+from .pcap       import *
+from .reassembly import *
+from .ring       import *
+from .sniffer    import *
+from .workers    import *
@@ -0,0 +1,537 @@
+r"""Backends for capturing the TCP segments a :class:`~.Sniffer` decodes."""
+
+import abc
+import asyncio
+import ctypes
+import queue
+import socket
+import struct
+import threading
+
+from public import public
+
+@public
+class TCPSegment:
+    """A captured TCP segment.
+
+    Parameters
+    ----------
+    src_addr : :class:`str`
+        The source IPv4 address.
+    src_port : :class:`int`
+        The source port.
+    dst_addr : :class:`str`
+        The destination IPv4 address.
+    dst_port : :class:`int`
+        The destination port.
+    seq : :class:`int`
+        The sequence number of the segment.
+    flags : :class:`int`
+        The TCP flags of the segment.
+    payload : :class:`bytes`
+        The payload of the segment.
+    """
+
+    FIN = 0x01
+    SYN = 0x02
+    RST = 0x04
+
+    IP_PROTO_TCP = 6
+
+    def __init__(self, src_addr, src_port, dst_addr, dst_port, *, seq, flags, payload):
+        self.src_addr = src_addr
+        self.src_port = src_port
+        self.dst_addr = dst_addr
+        self.dst_port = dst_port
+        self.seq      = seq
+        self.flags    = flags
+        self.payload  = payload
+
+    @classmethod
+    def from_ipv4(cls, data):
+        """Parses a :class:`TCPSegment` from an IPv4 packet.
+
+        Parameters
+        ----------
+        data : :class:`bytes`
+            The IPv4 packet, starting at its header.
+
+        Returns
+        -------
+        :class:`TCPSegment` or ``None``
+            The parsed segment, or ``None`` if ``data`` is not
+            an IPv4 packet containing the start of a TCP segment.
+        """
+
+        if len(data) < 20 or data[0] >> 4 != 4:
+            return None
+
+        # Only TCP, and only the first (or sole) fragment.
+        if data[9] != cls.IP_PROTO_TCP or int.from_bytes(data[6:8], "big") & 0x1FFF != 0:
+            return None
+
+        header_length = (data[0] & 0x0F) * 4
+        total_length  = int.from_bytes(data[2:4], "big")
+
+        if len(data) < header_length + 20:
+            return None
+
+        src_port, dst_port, seq = struct.unpack_from("!HHI", data, header_length)
+
+        data_offset = (data[header_length + 12] >> 4) * 4
+        flags       = data[header_length + 13]
+
+        return cls(
+            socket.inet_ntoa(data[12:16]), src_port,
+            socket.inet_ntoa(data[16:20]), dst_port,
+
+            seq   = seq,
+            flags = flags,
+
+            # NOTE: 'total_length' excludes any link-layer padding.
+            payload = data[header_length + data_offset : total_length],
+        )
+
+    def __repr__(self):
+        return (
+            f"{type(self).__qualname__}("
+            f"{self.src_addr}:{self.src_port} -> {self.dst_addr}:{self.dst_port}, "
+            f"seq={self.seq}, flags={self.flags:#x}, payload={len(self.payload)} bytes)"
+        )
+
+@public
+class CaptureBackend(abc.ABC):
+    r"""A source of :class:`TCPSegment`\s.
+
+    Captured segments are passed to ``callback`` from
+    within the running event loop, unless reading has
+    been paused with :meth:`pause_reading`.
+
+    Parameters
+    ----------
+    callback : callable
+        The function to call with each captured :class:`TCPSegment`.
+    interface : :class:`str` or ``None``
+        The interface to capture on.
+
+        If ``None``, then all interfaces are captured on.
+    """
+
+    def __init__(self, callback, *, interface=None):
+        self.callback  = callback
+        self.interface = interface
+
+        self.endpoints = []
+
+        self.paused = False
+
+    def pause_reading(self):
+        """Stops passing segments to ``callback`` until :meth:`resume_reading`.
+
+        Segments captured in the meantime are left buffered,
+        so that whatever consumes them may catch up without
+        holding up the event loop.
+        """
+
+        self.paused = True
+
+    def resume_reading(self):
+        """Resumes passing segments to ``callback``."""
+
+        self.paused = False
+
+    def set_endpoints(self, endpoints):
+        """Sets the endpoints whose traffic should be captured.
+
+        Parameters
+        ----------
+        endpoints : iterable of (:class:`str`, iterable of :class:`int`)
+            Pairs of IPv4 addresses and their ports.
+        """
+
+        self.endpoints = [(addr, tuple(ports)) for addr, ports in endpoints if addr and ports]
+
+    def _matches(self, src_addr, src_port, dst_addr, dst_port):
+        for addr, ports in self.endpoints:
+            if src_addr == addr and src_port in ports:
+                return True
+
+            if dst_addr == addr and dst_port in ports:
+                return True
+
+        return False
+
+    @abc.abstractmethod
+    def start(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def stop(self):
+        raise NotImplementedError
+
+@public
+class ScapyCapture(CaptureBackend):
+    """A :class:`CaptureBackend` using :mod:`scapy`.
+
+    This works wherever :mod:`scapy` can sniff, but fully
+    dissects each frame on the interface in Python.
+
+    Segments are handed from :mod:`scapy`'s thread to the
+    event loop through a bounded queue. Once it's full, such
+    as while reading is paused, :mod:`scapy`'s thread waits
+    for room, leaving the kernel to buffer captured traffic.
+    """
+
+    # The most segments waiting to be passed to the callback.
+    MAX_PENDING = 4096
+
+    # How often a waiting capture thread checks whether it's stopped, in seconds.
+    STOP_CHECK_INTERVAL = 0.1
+
+    def __init__(self, callback, **kwargs):
+        super().__init__(callback, **kwargs)
+
+        self._sniffer = None
+        self._loop    = None
+
+        self._pending      = queue.Queue(self.MAX_PENDING)
+        self._drain_needed = False
+        self._stopping     = threading.Event()
+
+    def _should_handle(self, frame):
+        # We import these lazily, upon first capturing,
+        # to improve performance upon importing our library.
+        from scapy.layers.inet import TCP, IP
+
+        if TCP not in frame or IP not in frame:
+            return False
+
+        ip  = frame[IP]
+        tcp = frame[TCP]
+
+        return self._matches(ip.src, tcp.sport, ip.dst, tcp.dport)
+
+    def _handle(self, frame):
+        from scapy.layers.inet import TCP, IP
+
+        ip  = frame[IP]
+        tcp = frame[TCP]
+
+        segment = TCPSegment(
+            ip.src, tcp.sport,
+            ip.dst, tcp.dport,
+
+            seq     = tcp.seq,
+            flags   = int(tcp.flags),
+            payload = bytes(tcp.payload),
+        )
+
+        # NOTE: Scapy calls us from its own thread, which
+        # waits here while the event loop is behind.
+        while not self._stopping.is_set():
+            try:
+                self._pending.put(segment, timeout=self.STOP_CHECK_INTERVAL)
+
+            except queue.Full:
+                continue
+
+            break
+
+        else:
+            return
+
+        # NOTE: The event loop is only woken once for
+        # however many segments are queued meanwhile.
+        if not self._drain_needed:
+            self._drain_needed = True
+
+            self._loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        self._drain_needed = False
+
+        while not self.paused:
+            try:
+                segment = self._pending.get_nowait()
+
+            except queue.Empty:
+                return
+
+            self.callback(segment)
+
+    def resume_reading(self):
+        super().resume_reading()
+
+        if self._loop is not None:
+            self._drain()
+
+    def start(self):
+        from scapy.sendrecv import AsyncSniffer
+
+        self._loop = asyncio.get_running_loop()
+
+        self._stopping.clear()
+
+        self._sniffer = AsyncSniffer(
+            iface   = self.interface,
+            lfilter = self._should_handle,
+            prn     = self._handle,
+            store   = False,
+        )
+
+        self._sniffer.start()
+
+    def stop(self):
+        if self._sniffer is not None:
+            self._stopping.set()
+
+            self._sniffer.stop()
+
+            self._sniffer = None
+
+@public
+class RawSocketCapture(CaptureBackend):
+    """A :class:`CaptureBackend` using a raw Linux ``AF_PACKET`` socket.
+
+    A classic BPF filter compiled from the endpoints is attached
+    to the socket so that the kernel only hands us the relevant
+    IPv4 TCP segments, whose headers are then parsed with :mod:`struct`.
+    """
+
+    ETH_P_IP         = 0x0800
+    SO_ATTACH_FILTER = 26
+
+    PACKET_OUTGOING = 4
+    ARPHRD_LOOPBACK = 772
+
+    MAX_FRAME_SIZE = 0x10000
+
+    # The most instructions the kernel accepts in a filter.
+    BPF_MAXINSNS = 4096
+
+    # Classic BPF opcodes.
+    _BPF_LD_W_ABS   = 0x20
+    _BPF_LD_H_ABS   = 0x28
+    _BPF_LD_B_ABS   = 0x30
+    _BPF_LD_H_IND   = 0x48
+    _BPF_LDX_B_MSH  = 0xB1
+    _BPF_JMP_JEQ_K  = 0x15
+    _BPF_JMP_JSET_K = 0x45
+    _BPF_JMP_JA     = 0x05
+    _BPF_RET_K      = 0x06
+
+    def __init__(self, callback, **kwargs):
+        super().__init__(callback, **kwargs)
+
+        self._socket = None
+        self._loop   = None
+
+    @classmethod
+    def compile_filter(cls, endpoints):
+        """Compiles a classic BPF program matching traffic to and from the endpoints.
+
+        The program operates on packets starting at their
+        IPv4 header, as a ``SOCK_DGRAM`` packet socket sees them.
+
+        Parameters
+        ----------
+        endpoints : iterable of (:class:`str`, iterable of :class:`int`)
+            Pairs of IPv4 addresses and their ports.
+
+        Returns
+        -------
+        :class:`list`
+            The list of ``(code, jt, jf, k)`` instructions.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the program would be too long for the kernel,
+            or an address has too many ports to jump over.
+        """
+
+        # Instructions may jump to labels, which are resolved
+        # into relative offsets once the program is laid out.
+        #
+        # NOTE: Conditional jumps may only skip ahead 255
+        # instructions, and so each endpoint has its own
+        # copy of the 'accept' return right after it, and
+        # only unconditional jumps go any further.
+        program = [
+            # Only TCP.
+            (cls._BPF_LD_B_ABS,   None,     None,            9),
+            (cls._BPF_JMP_JEQ_K,  None,     "prologue-drop", TCPSegment.IP_PROTO_TCP),
+
+            # Only the first (or sole) fragment, which has the TCP header.
+            (cls._BPF_LD_H_ABS,   None,            None, 6),
+            (cls._BPF_JMP_JSET_K, "prologue-drop", None, 0x1FFF),
+
+            # X = IP header length.
+            (cls._BPF_LDX_B_MSH, None, None, 0),
+            (cls._BPF_JMP_JA,    None, None, "endpoints"),
+
+            "prologue-drop",
+            (cls._BPF_RET_K, None, None, 0),
+
+            "endpoints",
+        ]
+
+        for i, (addr, ports) in enumerate(endpoints):
+            addr = int.from_bytes(socket.inet_aton(addr), "big")
+
+            accept_label = f"{i}-accept"
+
+            for direction, addr_offset, port_offset in (("src", 12, 0), ("dst", 16, 2)):
+                next_label = f"{i}-{direction}-next"
+
+                program.append((cls._BPF_LD_W_ABS,  None, None,       addr_offset))
+                program.append((cls._BPF_JMP_JEQ_K, None, next_label, addr))
+                program.append((cls._BPF_LD_H_IND,  None, None,       port_offset))
+
+                for port in ports:
+                    program.append((cls._BPF_JMP_JEQ_K, accept_label, None, port))
+
+                program.append(next_label)
+
+            end_label = f"{i}-end"
+
+            program.extend([
+                (cls._BPF_JMP_JA, None, None, end_label),
+
+                accept_label,
+                (cls._BPF_RET_K, None, None, cls.MAX_FRAME_SIZE),
+
+                end_label,
+            ])
+
+        program.append((cls._BPF_RET_K, None, None, 0))
+
+        labels       = {}
+        instructions = []
+        for item in program:
+            if isinstance(item, str):
+                labels[item] = len(instructions)
+            else:
+                instructions.append(item)
+
+        if len(instructions) > cls.BPF_MAXINSNS:
+            raise ValueError(f"Filter for endpoints is too long ({len(instructions)} > {cls.BPF_MAXINSNS} instructions)")
+
+        def resolve_jump(target, index):
+            if target is None:
+                return 0
+
+            offset = labels[target] - index - 1
+            if offset > 0xFF:
+                raise ValueError("Filter for endpoints has too many ports for a single address")
+
+            return offset
+
+        return [
+            (
+                code,
+
+                resolve_jump(jt, index),
+                resolve_jump(jf, index),
+
+                labels[k] - index - 1 if isinstance(k, str) else k,
+            )
+
+            for index, (code, jt, jf, k) in enumerate(instructions)
+        ]
+
+    def _attach_filter(self):
+        instructions = self.compile_filter(
+            (addr, ports) for addr, ports in self.endpoints if self._is_ipv4(addr)
+        )
+
+        filter_data = ctypes.create_string_buffer(b"".join(
+            struct.pack("=HBBI", code, jt, jf, k) for code, jt, jf, k in instructions
+        ))
+
+        fprog = struct.pack("HP", len(instructions), ctypes.addressof(filter_data))
+
+        # NOTE: The kernel copies the program,
+        # so 'filter_data' may then be freed.
+        self._socket.setsockopt(socket.SOL_SOCKET, self.SO_ATTACH_FILTER, fprog)
+
+    @staticmethod
+    def _is_ipv4(addr):
+        try:
+            socket.inet_aton(addr)
+
+        except OSError:
+            return False
+
+        return True
+
+    def set_endpoints(self, endpoints):
+        super().set_endpoints(endpoints)
+
+        if self._socket is not None:
+            self._attach_filter()
+
+    def pause_reading(self):
+        super().pause_reading()
+
+        if self._socket is not None:
+            self._loop.remove_reader(self._socket.fileno())
+
+    def resume_reading(self):
+        super().resume_reading()
+
+        if self._socket is not None:
+            self._loop.add_reader(self._socket.fileno(), self._read_ready)
+
+    def _read_ready(self):
+        # NOTE: The callback may pause reading, leaving
+        # the rest of the frames buffered by the kernel.
+        while not self.paused:
+            try:
+                data, (_, _, pkttype, hatype, _) = self._socket.recvfrom(self.MAX_FRAME_SIZE)
+
+            except (BlockingIOError, InterruptedError):
+                return
+
+            # On loopback, each frame is seen both
+            # going out and coming in, so we only
+            # take the incoming copy.
+            if pkttype == self.PACKET_OUTGOING and hatype == self.ARPHRD_LOOPBACK:
+                continue
+
+            segment = TCPSegment.from_ipv4(data)
+            if segment is not None:
+                self.callback(segment)
+
+    def start(self):
+        # NOTE: Using 'SOCK_DGRAM' strips the link-layer
+        # header, so that we always start at the IP header.
+        self._socket = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(self.ETH_P_IP))
+
+        try:
+            self._attach_filter()
+
+            if self.interface is not None:
+                self._socket.bind((self.interface, self.ETH_P_IP))
+
+            self._socket.setblocking(False)
+
+            self._loop = asyncio.get_running_loop()
+
+            if not self.paused:
+                self._loop.add_reader(self._socket.fileno(), self._read_ready)
+
+        except Exception:
+            self._socket.close()
+            self._socket = None
+
+            raise
+
+    def stop(self):
+        if self._socket is None:
+            return
+
+        self._loop.remove_reader(self._socket.fileno())
+
+        self._socket.close()
+        self._socket = None
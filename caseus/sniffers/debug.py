@@ -2,8 +2,6 @@ import pak
 
 from public import public
 
-from aioconsole import aprint
-
 from .sniffer import Sniffer
 
 from ..packets import Packet, ServerboundPacket
@@ -26,6 +24,8 @@ class LoggingSniffer(Sniffer):
         else:
             bound = "Clientbound"
 
+        from aioconsole import aprint
+
         await aprint(f"{server.name}: {bound}: {packet}")
 
     async def _log_specific_packets(self, server, connection, packet):
@@ -0,0 +1,215 @@
+r"""Streaming reading of :class:`~.TCPSegment`\s from capture files.
+
+Both the pcap and pcapng formats are supported. Records are read one
+at a time, so captures of any size may be read in constant memory.
+"""
+
+import os
+import struct
+
+from public import public
+
+from .capture import TCPSegment
+
+@public
+class CaptureFileError(Exception):
+    """An error raised when a capture file is malformed."""
+
+# Link-layer header types, see https://www.tcpdump.org/linktypes.html.
+_LINKTYPE_NULL       = 0
+_LINKTYPE_ETHERNET   = 1
+_LINKTYPE_RAW        = 101
+_LINKTYPE_LOOP       = 108
+_LINKTYPE_LINUX_SLL  = 113
+_LINKTYPE_IPV4       = 228
+_LINKTYPE_LINUX_SLL2 = 276
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+_AF_INET = 2
+
+_PCAP_MAGICS = {
+    b"\xD4\xC3\xB2\xA1": "<",
+    b"\xA1\xB2\xC3\xD4": ">",
+
+    # Nanosecond resolution.
+    b"\x4D\x3C\xB2\xA1": "<",
+    b"\xA1\xB2\x3C\x4D": ">",
+}
+
+_PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# NOTE: This reads the same in either byte order.
+_PCAPNG_SECTION_HEADER        = 0x0A0D0D0A
+_PCAPNG_INTERFACE_DESCRIPTION = 1
+_PCAPNG_SIMPLE_PACKET         = 3
+_PCAPNG_ENHANCED_PACKET       = 6
+
+def _ipv4_from_frame(linktype, frame):
+    if linktype in (_LINKTYPE_RAW, _LINKTYPE_IPV4):
+        return frame
+
+    if linktype == _LINKTYPE_ETHERNET:
+        offset    = 12
+        ethertype = int.from_bytes(frame[offset : offset + 2], "big")
+
+        while ethertype in _ETHERTYPE_VLAN:
+            offset    += 4
+            ethertype  = int.from_bytes(frame[offset : offset + 2], "big")
+
+        if ethertype != _ETHERTYPE_IPV4:
+            return None
+
+        return frame[offset + 2:]
+
+    if linktype in (_LINKTYPE_NULL, _LINKTYPE_LOOP):
+        # NOTE: The family is in the byte order of the capturing
+        # machine for 'NULL', so we check for both byte orders.
+        if frame[:4] not in (_AF_INET.to_bytes(4, "little"), _AF_INET.to_bytes(4, "big")):
+            return None
+
+        return frame[4:]
+
+    if linktype == _LINKTYPE_LINUX_SLL:
+        if int.from_bytes(frame[14:16], "big") != _ETHERTYPE_IPV4:
+            return None
+
+        return frame[16:]
+
+    if linktype == _LINKTYPE_LINUX_SLL2:
+        if int.from_bytes(frame[0:2], "big") != _ETHERTYPE_IPV4:
+            return None
+
+        return frame[20:]
+
+    return None
+
+def _read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise CaptureFileError("Unexpected end of capture file")
+
+    return data
+
+def _read_pcap_frames(file, byte_order):
+    header = _read_exactly(file, 20)
+
+    # NOTE: The upper bits may hold FCS information.
+    linktype = struct.unpack(f"{byte_order}I", header[16:20])[0] & 0x0FFFFFFF
+
+    record_header = struct.Struct(f"{byte_order}IIII")
+
+    while True:
+        data = file.read(record_header.size)
+        if len(data) == 0:
+            return
+
+        if len(data) != record_header.size:
+            raise CaptureFileError("Unexpected end of capture file")
+
+        _, _, captured_length, _ = record_header.unpack(data)
+
+        yield linktype, _read_exactly(file, captured_length)
+
+def _read_pcapng_frames(file):
+    byte_order = "<"
+    linktypes  = []
+
+    # We already read the block type of the first section header.
+    block_type = _PCAPNG_SECTION_HEADER
+
+    while True:
+        if block_type == _PCAPNG_SECTION_HEADER:
+            length_data = _read_exactly(file, 4)
+            magic_data  = _read_exactly(file, 4)
+
+            if struct.unpack("<I", magic_data)[0] == _PCAPNG_BYTE_ORDER_MAGIC:
+                byte_order = "<"
+            elif struct.unpack(">I", magic_data)[0] == _PCAPNG_BYTE_ORDER_MAGIC:
+                byte_order = ">"
+            else:
+                raise CaptureFileError("Invalid pcapng byte order magic")
+
+            block_length = struct.unpack(f"{byte_order}I", length_data)[0]
+
+            # Each section has its own interfaces.
+            linktypes = []
+
+            body = _read_exactly(file, block_length - 12)
+
+        else:
+            block_length = struct.unpack(f"{byte_order}I", _read_exactly(file, 4))[0]
+
+            body = _read_exactly(file, block_length - 8)
+
+            if block_type == _PCAPNG_INTERFACE_DESCRIPTION:
+                linktypes.append(struct.unpack_from(f"{byte_order}H", body, 0)[0])
+
+            elif block_type == _PCAPNG_ENHANCED_PACKET:
+                interface_id, _, _, captured_length, _ = struct.unpack_from(f"{byte_order}IIIII", body, 0)
+
+                yield linktypes[interface_id], body[20 : 20 + captured_length]
+
+            elif block_type == _PCAPNG_SIMPLE_PACKET:
+                original_length = struct.unpack_from(f"{byte_order}I", body, 0)[0]
+
+                # The captured length is only implied by the block length.
+                captured_length = min(original_length, len(body) - 8)
+
+                yield linktypes[0], body[4 : 4 + captured_length]
+
+        block_type_data = file.read(4)
+        if len(block_type_data) == 0:
+            return
+
+        if len(block_type_data) != 4:
+            raise CaptureFileError("Unexpected end of capture file")
+
+        block_type = struct.unpack(f"{byte_order}I", block_type_data)[0]
+
+@public
+def read_capture_file(file):
+    """Reads the IPv4 TCP segments from a capture file.
+
+    Parameters
+    ----------
+    file : path-like or binary file object
+        The pcap or pcapng capture file to read.
+
+    Yields
+    ------
+    :class:`~.TCPSegment`
+        The segments in the order they were captured.
+
+    Raises
+    ------
+    :exc:`CaptureFileError`
+        If the capture file is malformed.
+    """
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            yield from read_capture_file(f)
+
+        return
+
+    magic = file.read(4)
+
+    if magic == _PCAPNG_SECTION_HEADER.to_bytes(4, "big"):
+        frames = _read_pcapng_frames(file)
+
+    elif magic in _PCAP_MAGICS:
+        frames = _read_pcap_frames(file, _PCAP_MAGICS[magic])
+
+    else:
+        raise CaptureFileError("Unknown capture file format")
+
+    for linktype, frame in frames:
+        ipv4 = _ipv4_from_frame(linktype, frame)
+        if ipv4 is None:
+            continue
+
+        segment = TCPSegment.from_ipv4(ipv4)
+        if segment is not None:
+            yield segment
@@ -0,0 +1,142 @@
+r"""Reassembly of captured :class:`~.TCPSegment`\s into in-order streams."""
+
+from public import public
+
+from .capture import TCPSegment
+
+@public
+class TCPReassembler:
+    """Reassembles one direction of a TCP connection.
+
+    Segments may be fed in any order and may be retransmitted
+    or overlap. Only bytes which directly follow those already
+    emitted are returned from :meth:`feed`, with out-of-order
+    segments held until the gap before them is filled.
+
+    Parameters
+    ----------
+    max_pending_size : :class:`int`
+        The maximum number of out-of-order bytes to hold.
+
+        If more bytes than this are held, then the gap before them
+        is assumed to be lost, and is skipped. The number of skipped
+        bytes is tracked in the :attr:`skipped_size` attribute.
+    """
+
+    MAX_PENDING_SIZE = 1 << 20
+
+    _SEQ_MODULUS = 1 << 32
+
+    def __init__(self, *, max_pending_size=MAX_PENDING_SIZE):
+        self.max_pending_size = max_pending_size
+
+        self.next_seq     = None
+        self.skipped_size = 0
+
+        self._pending      = {}
+        self._pending_size = 0
+
+    @property
+    def pending_size(self):
+        """The number of out-of-order bytes being held."""
+
+        return self._pending_size
+
+    def _offset(self, seq):
+        # The signed distance from the next expected
+        # sequence number, accounting for wraparound.
+
+        offset = (seq - self.next_seq) % self._SEQ_MODULUS
+        if offset >= self._SEQ_MODULUS // 2:
+            offset -= self._SEQ_MODULUS
+
+        return offset
+
+    def _add_pending(self, seq, payload):
+        existing = self._pending.get(seq)
+        if existing is not None:
+            if len(existing) >= len(payload):
+                return
+
+            self._pending_size -= len(existing)
+
+        self._pending[seq]  = payload
+        self._pending_size += len(payload)
+
+    def _skip_gap(self):
+        seq = min(self._pending, key=self._offset)
+
+        self.skipped_size += self._offset(seq)
+        self.next_seq      = seq
+
+    def _take_pending(self):
+        chunks = []
+
+        while True:
+            found = False
+
+            # NOTE: There are rarely more than a few pending
+            # segments, and so we simply scan through them.
+            for seq in list(self._pending):
+                offset = self._offset(seq)
+                if offset > 0:
+                    continue
+
+                found = True
+
+                payload = self._pending.pop(seq)
+                self._pending_size -= len(payload)
+
+                # Skip any part we've already emitted.
+                if -offset < len(payload):
+                    payload = payload[-offset:]
+
+                    chunks.append(payload)
+                    self.next_seq = (self.next_seq + len(payload)) % self._SEQ_MODULUS
+
+            if not found:
+                return chunks
+
+    def feed(self, segment):
+        """Feeds a segment to the reassembler.
+
+        Parameters
+        ----------
+        segment : :class:`~.TCPSegment`
+            The segment to feed.
+
+        Returns
+        -------
+        :class:`bytes`
+            The newly in-order bytes of the stream.
+        """
+
+        seq     = segment.seq
+        payload = segment.payload
+
+        if segment.flags & TCPSegment.SYN:
+            # The SYN takes up a sequence number of its own.
+            seq = (seq + 1) % self._SEQ_MODULUS
+
+            self.next_seq = seq
+
+            self._pending.clear()
+            self._pending_size = 0
+
+        if len(payload) == 0:
+            return b""
+
+        if self.next_seq is None:
+            # We started capturing partway through the stream.
+            self.next_seq = seq
+
+        self._add_pending(seq, payload)
+
+        chunks = self._take_pending()
+
+        while self._pending_size > self.max_pending_size:
+            self._skip_gap()
+
+            chunks.extend(self._take_pending())
+
+        return b"".join(chunks)
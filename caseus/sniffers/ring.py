@@ -0,0 +1,285 @@
+r"""A shared memory ring buffer for passing records between processes."""
+
+import contextlib
+import struct
+
+from multiprocessing import shared_memory
+
+from public import public
+
+# NOTE: A 'nullcontext' may be entered any number of times.
+_NOT_LOCKED = contextlib.nullcontext()
+
+@public
+class SharedRingBuffer:
+    """A single-producer, single-consumer ring buffer in shared memory.
+
+    Variable-length records are written by one process with
+    :meth:`put` and read by another with :meth:`get`, without any
+    locking. The producer alone writes the write position and drop
+    counter, and the consumer alone writes the read position.
+
+    Neither side is notified of the other's progress by the
+    buffer itself. Instead, before waiting on some other means
+    of notification, the consumer bumps :attr:`consumer_waits`
+    and the producer bumps :attr:`producer_waits`, so that the
+    other side knows to notify them once per wait.
+
+    .. note::
+
+        Python offers no memory fences, and so without a ``lock``
+        this relies on stores to shared memory becoming visible
+        in the order they're made, which is the case on x86-64.
+
+        On hosts with weaker memory ordering, such as AArch64, a
+        ``lock`` shared by both sides must be passed, which is
+        held while accessing the buffer and acts as a fence.
+
+    Parameters
+    ----------
+    size : :class:`int` or ``None``
+        The number of bytes available for records.
+
+        Must be specified when creating a new buffer.
+    name : :class:`str` or ``None``
+        The name of an existing buffer to attach to.
+
+        If ``None``, then a new buffer is created.
+    lock : :class:`multiprocessing.Lock` or ``None``
+        The lock to hold while accessing the buffer.
+
+        If ``None``, then no lock is held.
+    """
+
+    # The write position, read position, drop counter, and closed flag.
+    _HEADER      = struct.Struct("=QQQB")
+    _HEADER_SIZE = 64
+
+    # The counts of waits by the producer and the consumer.
+    _WAITS          = struct.Struct("=Q")
+    _PRODUCER_WAITS = 32
+    _CONSUMER_WAITS = 40
+
+    _RECORD_LENGTH = struct.Struct("=I")
+
+    # Marks that the next record starts at the beginning of the buffer.
+    _WRAP_MARKER = 0xFFFFFFFF
+
+    def __init__(self, size=None, *, name=None, lock=None):
+        if name is None:
+            if size is None:
+                raise TypeError("The size of a new ring buffer must be specified")
+
+            self._memory = shared_memory.SharedMemory(create=True, size=self._HEADER_SIZE + size)
+            self._memory.buf[:self._HEADER_SIZE] = bytes(self._HEADER_SIZE)
+
+            self._owner = True
+
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+
+            self._owner = False
+
+        self._buf      = self._memory.buf
+        self._capacity = self._memory.size - self._HEADER_SIZE
+
+        self.lock = lock
+
+    @property
+    def name(self):
+        """The name other processes may attach to the buffer with."""
+
+        return self._memory.name
+
+    @property
+    def capacity(self):
+        """The number of bytes available for records."""
+
+        return self._capacity
+
+    def _locked(self):
+        if self.lock is None:
+            return _NOT_LOCKED
+
+        return self.lock
+
+    def _header(self):
+        return self._HEADER.unpack_from(self._buf, 0)
+
+    @property
+    def used_size(self):
+        """The number of bytes taken up by unread records."""
+
+        write_pos, read_pos, _, _ = self._header()
+
+        return write_pos - read_pos
+
+    @property
+    def dropped(self):
+        """The number of records which were dropped by the producer."""
+
+        return self._header()[2]
+
+    @property
+    def closed(self):
+        """Whether the producer will write no more records."""
+
+        return self._header()[3] != 0
+
+    @property
+    def producer_waits(self):
+        """How many times the producer has waited for room."""
+
+        return self._WAITS.unpack_from(self._buf, self._PRODUCER_WAITS)[0]
+
+    @property
+    def consumer_waits(self):
+        """How many times the consumer has waited for records."""
+
+        return self._WAITS.unpack_from(self._buf, self._CONSUMER_WAITS)[0]
+
+    def wait_for_room(self):
+        """Marks that the producer is about to wait for room.
+
+        Returns
+        -------
+        :class:`int`
+            The new value of :attr:`producer_waits`.
+        """
+
+        with self._locked():
+            waits = self.producer_waits + 1
+            self._WAITS.pack_into(self._buf, self._PRODUCER_WAITS, waits)
+
+        return waits
+
+    def wait_for_records(self):
+        """Marks that the consumer is about to wait for records.
+
+        Returns
+        -------
+        :class:`int`
+            The new value of :attr:`consumer_waits`.
+        """
+
+        with self._locked():
+            waits = self.consumer_waits + 1
+            self._WAITS.pack_into(self._buf, self._CONSUMER_WAITS, waits)
+
+        return waits
+
+    def count_drop(self):
+        """Counts a record as dropped by the producer."""
+
+        with self._locked():
+            struct.pack_into("=Q", self._buf, 16, self.dropped + 1)
+
+    def close_writing(self):
+        """Marks that the producer will write no more records."""
+
+        with self._locked():
+            self._buf[24] = 1
+
+    def put(self, record):
+        """Writes a record to the buffer.
+
+        Parameters
+        ----------
+        record : bytes-like
+            The record to write.
+
+        Returns
+        -------
+        :class:`bool`
+            Whether there was room for the record.
+        """
+
+        with self._locked():
+            return self._put(record)
+
+    def _put(self, record):
+        write_pos, read_pos, _, _ = self._header()
+
+        size   = self._RECORD_LENGTH.size + len(record)
+        offset = write_pos % self._capacity
+
+        if size > self._capacity:
+            return False
+
+        # Records are never split across the end of the buffer.
+        padding = 0
+        if offset + size > self._capacity:
+            padding = self._capacity - offset
+
+        if write_pos + padding + size - read_pos > self._capacity:
+            return False
+
+        start = self._HEADER_SIZE
+
+        if padding > 0:
+            if padding >= self._RECORD_LENGTH.size:
+                self._RECORD_LENGTH.pack_into(self._buf, start + offset, self._WRAP_MARKER)
+
+            offset = 0
+
+        self._RECORD_LENGTH.pack_into(self._buf, start + offset, len(record))
+
+        data_start = start + offset + self._RECORD_LENGTH.size
+        self._buf[data_start : data_start + len(record)] = record
+
+        # NOTE: The write position is only advanced
+        # once the record has been fully written.
+        struct.pack_into("=Q", self._buf, 0, write_pos + padding + size)
+
+        return True
+
+    def get(self):
+        """Reads the next record from the buffer.
+
+        Returns
+        -------
+        :class:`bytes` or ``None``
+            The next record, or ``None`` if there are no unread records.
+        """
+
+        with self._locked():
+            return self._get()
+
+    def _get(self):
+        write_pos, read_pos, _, _ = self._header()
+
+        if read_pos == write_pos:
+            return None
+
+        start  = self._HEADER_SIZE
+        offset = read_pos % self._capacity
+
+        if self._capacity - offset < self._RECORD_LENGTH.size:
+            read_pos += self._capacity - offset
+            offset    = 0
+
+        else:
+            length = self._RECORD_LENGTH.unpack_from(self._buf, start + offset)[0]
+
+            if length == self._WRAP_MARKER:
+                read_pos += self._capacity - offset
+                offset    = 0
+
+        length = self._RECORD_LENGTH.unpack_from(self._buf, start + offset)[0]
+
+        data_start = start + offset + self._RECORD_LENGTH.size
+        record     = bytes(self._buf[data_start : data_start + length])
+
+        struct.pack_into("=Q", self._buf, 8, read_pos + self._RECORD_LENGTH.size + length)
+
+        return record
+
+    def close(self):
+        """Detaches from the buffer, unlinking it if this process created it."""
+
+        self._buf = None
+
+        self._memory.close()
+
+        if self._owner:
+            self._memory.unlink()
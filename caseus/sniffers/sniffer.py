@@ -3,16 +3,12 @@
 import abc
 import asyncio
 import io
+import socket
 import pak
 
 from pathlib import Path
 from public  import public
 
-# We import these namespace-less to improve
-# performance upon importing our library.
-from scapy.layers.inet import TCP, IP
-from scapy.sendrecv import AsyncSniffer
-
 from ..packets import (
     Packet,
     ServerboundPacket,
@@ -23,20 +19,75 @@ from ..packets import (
 
 from ..secrets import Secrets
 
+from ..util import AsyncPacketHandler
+
+from .capture    import TCPSegment, RawSocketCapture, ScapyCapture
+from .pcap       import read_capture_file
+from .reassembly import TCPReassembler
+
 from .. import types
 
 @public
-class Sniffer(pak.AsyncPacketHandler):
+class Sniffer(AsyncPacketHandler):
     MAIN_IP_ADDR = "51.38.60.113"
     MAIN_PORTS   = [11801, 12801, 13801, 14801]
 
     # TODO: Reduce code duplication between this
     # and the proxy connection classes.
     class _Connection(pak.io.Connection):
-        def __init__(self, *, sniffer):
-            super().__init__(ctx=Packet.Context())
+        class _FlowControl:
+            # Stands in as the transport of our reader
+            # so that we know when its buffer is full.
 
-            self.sniffer = sniffer
+            def __init__(self):
+                self._resumed = asyncio.Event()
+                self._resumed.set()
+
+            def pause_reading(self):
+                self._resumed.clear()
+
+            def resume_reading(self):
+                self._resumed.set()
+
+            async def wait_resumed(self):
+                await self._resumed.wait()
+
+        class _Reader(asyncio.StreamReader):
+            # Lets us know when decoding has caught
+            # up with all the data we've been fed.
+
+            def __init__(self):
+                super().__init__()
+
+                self.idle = asyncio.Event()
+
+            def feed_data(self, data):
+                self.idle.clear()
+
+                super().feed_data(data)
+
+            async def _wait_for_data(self, func_name):
+                self.idle.set()
+
+                await super()._wait_for_data(func_name)
+
+        def __init__(self, *, session):
+            self._flow_control = self._FlowControl()
+
+            reader = self._Reader()
+            reader.set_transport(self._flow_control)
+
+            super().__init__(
+                reader = reader,
+                writer = pak.io.ByteStreamWriter(),
+
+                ctx = Packet.Context(session.secrets),
+            )
+
+            self.session = session
+            self.sniffer = session.sniffer
+
+            self.reassembler = TCPReassembler()
 
         @property
         def secrets(self):
@@ -46,12 +97,31 @@ class Sniffer(pak.AsyncPacketHandler):
         def secrets(self, value):
             self.ctx = Packet.Context(value)
 
-        async def open_streams(self):
-            self.reader = asyncio.StreamReader()
-            self.writer = pak.io.ByteStreamWriter()
+        def feed_segment(self, segment):
+            payload = self.reassembler.feed(segment)
+            if len(payload) == 0:
+                return False
+
+            self.reader.feed_data(payload)
+
+            return True
+
+        def feed_eof(self):
+            self.reader.feed_eof()
 
-        def feed_data(self, data):
-            self.reader.feed_data(data)
+        async def wait_idle(self):
+            """Waits until the connection has decoded everything it can.
+
+            That is, until its reader is waiting for more data,
+            which it may do with part of a packet buffered, or
+            until it has stopped reading.
+            """
+
+            await self.reader.idle.wait()
+
+        async def drain(self):
+            # Waits until the reader's buffer is no longer full.
+            await self._flow_control.wait_resumed()
 
         async def _read_length(self):
             type_ctx = pak.Type.Context(ctx=self.ctx)
@@ -93,8 +163,12 @@ class Sniffer(pak.AsyncPacketHandler):
 
     class ServerboundConnection(_Connection):
         async def _read_length(self):
+            reported_length = await super()._read_length()
+            if reported_length is None:
+                return None
+
             # The fingerprint is not included in the packet length.
-            return await super()._read_length() + 1
+            return reported_length + 1
 
         def _packet_from_data(self, buf):
             header = ServerboundPacket.Header.unpack(buf, ctx=self.ctx)
@@ -104,108 +178,380 @@ class Sniffer(pak.AsyncPacketHandler):
                 packet_cls = ServerboundPacket.GenericWithID(header.id)
 
             if self.secrets.packet_key_sources is not None:
-                buf = packet_cls.decipher_data(buf, secrets=self.secrets)
+                buf = packet_cls.decipher_data(buf, ctx=self.ctx, fingerprint=header.fingerprint)
             elif packet_cls.CIPHER is not None:
                 packet_cls = ServerboundPacket.GenericWithID(header.id)
 
             return packet_cls.unpack_with_fingerprint(header.fingerprint, buf, ctx=self.ctx)
 
-    class ServerInfo:
-        def __init__(self, name, ip_addr, ports, *, sniffer):
-            self.name    = name
-            self.ip_addr = ip_addr
-            self.ports   = ports
+    class Session:
+        """A captured session between a game client and a server.
+
+        Sessions are keyed by their TCP 4-tuple, and each
+        has its own connections and :class:`~.Secrets`.
+        """
+
+        def __init__(self, name, client_addr, client_port, server_addr, server_port, *, sniffer, main=None):
+            self.name = name
+
+            self.client_addr = client_addr
+            self.client_port = client_port
+            self.server_addr = server_addr
+            self.server_port = server_port
 
             self.sniffer = sniffer
 
-            self.clientbound = sniffer.ClientboundConnection(sniffer=sniffer)
-            self.serverbound = sniffer.ServerboundConnection(sniffer=sniffer)
+            if main is None:
+                self.main    = self
+                self.secrets = sniffer.initial_secrets
+            else:
+                self.main    = main
+                self.secrets = main.secrets
 
-        async def open_streams(self):
-            await self.clientbound.open_streams()
-            await self.serverbound.open_streams()
+            # The satellite session of a main session,
+            # and the satellite server it expects.
+            self.satellite          = None
+            self.expected_satellite = None
 
-        def connection_for_ip(self, ip):
-            if ip.dst == self.ip_addr:
+            self.clientbound = sniffer.ClientboundConnection(session=self)
+            self.serverbound = sniffer.ServerboundConnection(session=self)
+
+            self._finished = set()
+
+        @property
+        def key(self):
+            return (self.client_addr, self.client_port, self.server_addr, self.server_port)
+
+        @property
+        def is_satellite(self):
+            return self.main is not self
+
+        @property
+        def secrets(self):
+            return self._secrets
+
+        @secrets.setter
+        def secrets(self, value):
+            self._secrets = value
+
+            # NOTE: The connections are not yet
+            # created when we're first constructed.
+            if hasattr(self, "clientbound"):
+                self.clientbound.secrets = value
+                self.serverbound.secrets = value
+
+        def connections(self):
+            return (self.clientbound, self.serverbound)
+
+        def connection_for_segment(self, segment):
+            if segment.dst_addr == self.server_addr and segment.dst_port == self.server_port:
                 return self.serverbound
 
             return self.clientbound
 
-        async def _listen(self):
-            await asyncio.gather(
-                self.sniffer._listen_to_packets(self, self.clientbound),
-                self.sniffer._listen_to_packets(self, self.serverbound),
+        def handle_segment(self, segment):
+            """Handles a :class:`~.TCPSegment` of the session.
+
+            Returns
+            -------
+            :class:`Sniffer._Connection` or ``None``
+                The connection data was fed to, if any.
+            """
+
+            connection = self.connection_for_segment(segment)
+
+            fed = connection.feed_segment(segment)
+
+            if segment.flags & TCPSegment.RST:
+                self._finished.update(self.connections())
+
+            elif segment.flags & TCPSegment.FIN and connection.reassembler.pending_size == 0:
+                self._finished.add(connection)
+
+            return connection if fed else None
+
+        def is_finished(self):
+            return len(self._finished) == 2
+
+        def feed_eof(self):
+            for connection in self.connections():
+                connection.feed_eof()
+
+        def _start_listening(self):
+            return [
+                asyncio.create_task(self.sniffer._listen_to_packets(self, connection))
+
+                for connection in self.connections()
+            ]
+
+        def __repr__(self):
+            return (
+                f"<{type(self).__qualname__} {self.name} "
+                f"{self.client_addr}:{self.client_port} -> {self.server_addr}:{self.server_port}>"
             )
 
-    def __init__(self):
+    def __init__(self, *, secrets=None, capture_backend=None, interface=None):
         super().__init__()
 
-        self.main      = self.ServerInfo("MAIN", self.MAIN_IP_ADDR, self.MAIN_PORTS, sniffer=self)
-        self.satellite = self.ServerInfo("SATELLITE", "", [], sniffer=self)
+        if secrets is None:
+            secrets = Secrets()
 
-        self.sniffer = AsyncSniffer(
-            lfilter = self._should_handle_tcp_packet,
-            prn     = self._handle_tcp_packet,
-        )
+        if capture_backend is None:
+            # NOTE: Raw packet sockets are only available on Linux.
+            if hasattr(socket, "AF_PACKET"):
+                capture_backend = RawSocketCapture
+            else:
+                capture_backend = ScapyCapture
 
-    def _server_info_from_ip(self, ip):
-        for server in (self.main, self.satellite):
-            if server.ip_addr in (ip.src, ip.dst):
-                return server
+        self.initial_secrets = secrets
 
-        return None
+        # Maps TCP 4-tuples to their sessions.
+        self.sessions = {}
 
-    def _should_handle_tcp_packet(self, packet):
-        if TCP not in packet:
-            return False
+        # Maps client addresses and satellite server
+        # endpoints to the main sessions expecting them.
+        self._expected_satellites = {}
 
-        if IP not in packet:
-            return False
+        # Maps auth IDs to the main sessions they were sent to,
+        # to tell apart satellite sessions from the same address.
+        self._satellite_auth_ids = {}
 
-        tcp = packet[TCP]
-        ip  = packet[IP]
+        self._main_endpoints = {(self.MAIN_IP_ADDR, port) for port in self.MAIN_PORTS}
 
-        server = self._server_info_from_ip(ip)
-        if server is None:
-            return False
+        self._session_tasks = set()
+        self._stopped       = None
 
-        if tcp.sport not in server.ports and tcp.dport not in server.ports:
-            return False
+        self.capture = capture_backend(self._handle_tcp_segment, interface=interface)
+        self._update_capture_endpoints()
 
-        if len(tcp.payload) == 0:
-            return False
+    def _update_capture_endpoints(self):
+        endpoints = {}
 
-        return True
+        for addr, port in self._main_endpoints:
+            endpoints.setdefault(addr, set()).add(port)
 
-    def _handle_tcp_packet(self, packet):
-        ip = packet[IP]
+        for _, addr, port in self._expected_satellites:
+            endpoints.setdefault(addr, set()).add(port)
 
-        server     = self._server_info_from_ip(ip)
-        connection = server.connection_for_ip(ip)
+        for session in self.sessions.values():
+            endpoints.setdefault(session.server_addr, set()).add(session.server_port)
 
-        connection.feed_data(bytes(packet[TCP].payload))
+        self.capture.set_endpoints(endpoints.items())
 
-    async def _listen_dispatch(self, server, connection, packet, **flags):
-        async with self.listener_task_group(listen_sequentially=False) as group:
-            for listener in self.listeners_for_packet(packet, **flags):
-                group.create_task(listener(server, connection, packet))
+    def _new_session(self, segment):
+        # Only start sessions at their beginning or at data,
+        # so that trailing segments of finished sessions don't
+        # start new ones.
+        if len(segment.payload) == 0 and not segment.flags & TCPSegment.SYN:
+            return None
 
-    async def _listen_to_packets(self, server, connection):
-        async for packet in connection.continuously_read_packets():
-            await self._listen_dispatch(server, connection, packet)
+        for client_addr, client_port, server_addr, server_port in (
+            (segment.src_addr, segment.src_port, segment.dst_addr, segment.dst_port),
+            (segment.dst_addr, segment.dst_port, segment.src_addr, segment.src_port),
+        ):
+            if (server_addr, server_port) in self._main_endpoints:
+                session = self.Session("MAIN", client_addr, client_port, server_addr, server_port, sniffer=self)
 
-    async def _listen_impl(self):
-        server_listeners = [
-            self.main._listen(),
-            self.satellite._listen(),
-        ]
+                break
+
+            main = self._expected_satellites.get((client_addr, server_addr, server_port))
+            if main is not None:
+                session = self.Session("SATELLITE", client_addr, client_port, server_addr, server_port, sniffer=self, main=main)
+
+                main.satellite = session
+
+                break
+
+        else:
+            return None
+
+        self.sessions[session.key] = session
 
-        server_listeners = [asyncio.create_task(coro) for coro in server_listeners]
+        for task in session._start_listening():
+            self._session_tasks.add(task)
+            task.add_done_callback(self._session_tasks.discard)
 
-        while not any(task.done() for task in server_listeners):
-            await pak.util.yield_exec()
+        if session.is_satellite:
+            self._update_capture_endpoints()
 
-        await asyncio.gather(*server_listeners)
+        return session
+
+    def _session_for_segment(self, segment):
+        session = self.sessions.get((segment.src_addr, segment.src_port, segment.dst_addr, segment.dst_port))
+        if session is not None:
+            return session
+
+        return self.sessions.get((segment.dst_addr, segment.dst_port, segment.src_addr, segment.src_port))
+
+    def _expect_satellite(self, main, auth_id, address, ports):
+        if main.expected_satellite is not None:
+            old_address, old_ports = main.expected_satellite
+
+            for port in old_ports:
+                self._expected_satellites.pop((main.client_addr, old_address, port), None)
+
+        main.expected_satellite = (address, ports)
+
+        self._satellite_auth_ids[auth_id] = main
+
+        for port in ports:
+            self._expected_satellites[(main.client_addr, address, port)] = main
+
+        self._update_capture_endpoints()
+
+    def _end_session(self, session):
+        session.feed_eof()
+
+        del self.sessions[session.key]
+
+        if not session.is_satellite:
+            for auth_id, main in list(self._satellite_auth_ids.items()):
+                if main is session:
+                    del self._satellite_auth_ids[auth_id]
+
+        if not session.is_satellite and session.expected_satellite is not None:
+            address, ports = session.expected_satellite
+
+            for port in ports:
+                if self._expected_satellites.get((session.client_addr, address, port)) is session:
+                    del self._expected_satellites[(session.client_addr, address, port)]
+
+        self._update_capture_endpoints()
+
+    def _handle_tcp_segment(self, segment):
+        session = self._session_for_segment(segment)
+        if session is None:
+            session = self._new_session(segment)
+            if session is None:
+                return None
+
+        connection = session.handle_segment(segment)
+
+        if session.is_finished():
+            self._end_session(session)
+
+        return connection
+
+    def _may_open_satellite(self, segment):
+        # Whether a segment opening a connection could be
+        # to a satellite server which a main session from
+        # the same address has not yet been decoded far
+        # enough to expect.
+
+        main_client_addrs = {
+            session.client_addr
+
+            for session in self.sessions.values()
+            if not session.is_satellite
+        }
+
+        # NOTE: The segment may be the client's SYN or the server's SYN-ACK.
+        for client_addr, server_addr, server_port in (
+            (segment.src_addr, segment.dst_addr, segment.dst_port),
+            (segment.dst_addr, segment.src_addr, segment.src_port),
+        ):
+            if (server_addr, server_port) in self._main_endpoints:
+                return False
+
+            if client_addr in main_client_addrs:
+                return True
+
+        return False
+
+    async def _catch_up(self):
+        # Waits until all fed data has been decoded
+        # and our listeners have had a chance to run.
+
+        # NOTE: We wait for each reader to block rather than
+        # for its buffer to empty, since a truncated packet
+        # would otherwise leave us waiting forever.
+        await asyncio.gather(*(
+            connection.wait_idle()
+
+            for session in self.sessions.values()
+            for connection in session.connections()
+        ))
+
+        await asyncio.sleep(0)
+
+    async def replay(self, file):
+        """Decodes the traffic in a capture file.
+
+        The capture file is streamed, and reading from
+        it is paused while the decoded packets are
+        listened to, so that files of any size may
+        be replayed in constant memory.
+
+        Parameters
+        ----------
+        file : path-like or binary file object
+            The pcap or pcapng capture file to replay.
+        """
+
+        async def segments():
+            for segment in read_capture_file(file):
+                yield segment
+
+        await self._replay_segments(segments())
+
+    async def _replay_segments(self, segments):
+        self._stopped = asyncio.Event()
+
+        listen_task = asyncio.create_task(self.listen())
+
+        try:
+            async for segment in segments:
+                opening = segment.flags & TCPSegment.SYN and self._session_for_segment(segment) is None
+
+                # NOTE: Since we read much faster than the game's
+                # client would, we catch up on decoding when a
+                # connection is opened so that the satellite server
+                # is known by the time its connection is opened.
+                if opening and self._may_open_satellite(segment):
+                    await self._catch_up()
+
+                connection = self._handle_tcp_segment(segment)
+
+                if opening:
+                    # Let a new session start listening before it is
+                    # fed any data, so that its packets are decoded
+                    # in the order they were captured.
+                    await asyncio.sleep(0)
+
+                if connection is not None:
+                    await connection.drain()
+
+        finally:
+            self._stopped.set()
+
+            await listen_task
+
+    async def _listen_dispatch(self, session, connection, packet, **flags):
+        await self._dispatch_to_listeners(
+            self.listeners_for_packet(packet, **flags),
+
+            session, connection, packet,
+
+            listen_sequentially = False,
+        )
+
+    async def _listen_to_packets(self, session, connection):
+        try:
+            async for packet in connection.continuously_read_packets():
+                await self._listen_dispatch(session, connection, packet)
+
+        finally:
+            # Nothing more will be decoded.
+            connection.reader.idle.set()
+
+    async def _listen_impl(self):
+        await self._stopped.wait()
+
+        # Let the sessions decode what they've been fed.
+        for session in self.sessions.values():
+            session.feed_eof()
+
+        await asyncio.gather(*self._session_tasks)
 
     async def listen(self):
         try:
@@ -215,7 +561,10 @@ class Sniffer(pak.AsyncPacketHandler):
             await self.end_listener_tasks()
 
     def close(self):
-        self.sniffer.stop()
+        self.capture.stop()
+
+        if self._stopped is not None:
+            self._stopped.set()
 
     def __enter__(self):
         return self
@@ -224,10 +573,9 @@ class Sniffer(pak.AsyncPacketHandler):
         self.close()
 
     async def startup(self):
-        await self.main.open_streams()
-        await self.satellite.open_streams()
+        self._stopped = asyncio.Event()
 
-        self.sniffer.start()
+        self.capture.start()
 
     async def on_start(self):
         await self.listen()
@@ -246,10 +594,30 @@ class Sniffer(pak.AsyncPacketHandler):
             pass
 
     @pak.packet_listener(serverbound.HandshakePacket)
-    async def _fill_in_game_version(self, server, source, packet):
-        source.secrets = source.secrets.copy(game_version=packet.game_version)
+    async def _fill_in_game_version(self, session, source, packet):
+        session.secrets = session.secrets.copy(game_version=packet.game_version)
 
     @pak.packet_listener(clientbound.ChangeSatelliteServerPacket)
-    async def _change_satellite_server(self, server, source, packet):
-        self.satellite.ip_addr = packet.address
-        self.satellite.ports   = packet.ports
+    async def _change_satellite_server(self, session, source, packet):
+        if packet.should_ignore:
+            return
+
+        self._expect_satellite(session.main, packet.auth_id, packet.address, packet.ports)
+
+    @pak.packet_listener(serverbound.SatelliteDelayedIdentificationPacket)
+    async def _identify_satellite(self, session, source, packet):
+        # NOTE: Satellite sessions are first attributed to the
+        # latest main session from the same address to expect
+        # them, which is wrong when several game clients on
+        # the same machine connect to the same satellite.
+        main = self._satellite_auth_ids.pop(packet.auth_id, None)
+        if main is None or main is session.main:
+            return
+
+        if session.main.satellite is session:
+            session.main.satellite = None
+
+        session.main    = main
+        session.secrets = main.secrets
+
+        main.satellite = session
@@ -0,0 +1,703 @@
+r"""Decoding of captured traffic in separate worker processes."""
+
+import asyncio
+import collections
+import functools
+import multiprocessing
+import os
+import platform
+import socket
+import struct
+import zlib
+
+from public import public
+
+from .capture import TCPSegment, CaptureBackend, RawSocketCapture, ScapyCapture
+from .pcap    import read_capture_file
+from .ring    import SharedRingBuffer
+
+# The source address and port, destination address and port, sequence number, and flags.
+_SEGMENT_HEADER = struct.Struct("!4sH4sHIB")
+
+def _pack_segment(segment):
+    return _SEGMENT_HEADER.pack(
+        socket.inet_aton(segment.src_addr), segment.src_port,
+        socket.inet_aton(segment.dst_addr), segment.dst_port,
+
+        segment.seq,
+        segment.flags,
+    ) + segment.payload
+
+def _unpack_segment(record):
+    src_addr, src_port, dst_addr, dst_port, seq, flags = _SEGMENT_HEADER.unpack_from(record, 0)
+
+    return TCPSegment(
+        socket.inet_ntoa(src_addr), src_port,
+        socket.inet_ntoa(dst_addr), dst_port,
+
+        seq     = seq,
+        flags   = flags,
+        payload = record[_SEGMENT_HEADER.size:],
+    )
+
+class _WorkerCapture(CaptureBackend):
+    # Stands in as the capture backend of a worker's sniffer,
+    # reporting its endpoints to the capturing process.
+
+    def __init__(self, callback, *, interface=None, conn):
+        super().__init__(callback, interface=interface)
+
+        self._conn = conn
+
+    def set_endpoints(self, endpoints):
+        old_endpoints = self.endpoints
+
+        super().set_endpoints(endpoints)
+
+        if self.endpoints != old_endpoints:
+            self._conn.send(self.endpoints)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+def _notify(conn):
+    # NOTE: The message itself doesn't matter,
+    # only that the other process is woken.
+    try:
+        conn.send_bytes(b"")
+
+    except OSError:
+        pass
+
+async def _ring_segments(ring, wake_conn, progress_conn, wakeup_timeout):
+    loop  = asyncio.get_running_loop()
+    woken = asyncio.Event()
+
+    hung_up = False
+
+    def on_wake():
+        nonlocal hung_up
+
+        try:
+            while wake_conn.poll():
+                wake_conn.recv_bytes()
+
+        except EOFError:
+            hung_up = True
+
+            loop.remove_reader(wake_conn.fileno())
+
+        woken.set()
+
+    loop.add_reader(wake_conn.fileno(), on_wake)
+
+    notified_producer_waits = 0
+
+    try:
+        while True:
+            record = ring.get()
+
+            if record is None:
+                # NOTE: We check whether the ring was closed before
+                # checking for records again so that we don't miss
+                # any written just before it was closed.
+                if ring.closed or hung_up:
+                    record = ring.get()
+                    if record is None:
+                        return
+
+                else:
+                    woken.clear()
+                    ring.wait_for_records()
+
+                    # NOTE: We check for records again once we've
+                    # marked that we're waiting, so that we don't
+                    # miss any written just beforehand. And as that
+                    # may still be missed without memory fences, we
+                    # don't wait indefinitely to be woken.
+                    record = ring.get()
+                    if record is None:
+                        try:
+                            await asyncio.wait_for(woken.wait(), wakeup_timeout)
+
+                        except asyncio.TimeoutError:
+                            pass
+
+                        continue
+
+            # Let the producer know there's room once per time it waits.
+            producer_waits = ring.producer_waits
+            if producer_waits != notified_producer_waits:
+                notified_producer_waits = producer_waits
+
+                _notify(progress_conn)
+
+            yield _unpack_segment(record)
+
+    finally:
+        if not hung_up:
+            loop.remove_reader(wake_conn.fileno())
+
+async def _decode_worker_main(sniffer_factory, ring_name, ring_lock, conn, wake_conn, progress_conn, wakeup_timeout):
+    ring = SharedRingBuffer(name=ring_name, lock=ring_lock)
+
+    try:
+        sniffer = sniffer_factory(capture_backend=functools.partial(_WorkerCapture, conn=conn))
+
+        await sniffer._replay_segments(_ring_segments(ring, wake_conn, progress_conn, wakeup_timeout))
+
+    finally:
+        ring.close()
+
+        conn.close()
+        wake_conn.close()
+        progress_conn.close()
+
+def _run_decode_worker(*args):
+    asyncio.run(_decode_worker_main(*args))
+
+class _RoutedConnection:
+    # A TCP connection whose segments are being passed to workers.
+
+    __slots__ = ("indices", "client_addr", "fin_sources")
+
+    def __init__(self, indices, client_addr):
+        self.indices     = indices
+        self.client_addr = client_addr
+
+        self.fin_sources = set()
+
+@public
+class DecodeWorkerPool:
+    r"""Decodes captured traffic in separate worker processes.
+
+    Captured :class:`~.TCPSegment`\s are written into a
+    :class:`~.SharedRingBuffer` for each worker, and each
+    worker decodes and listens to them with its own :class:`~.Sniffer`.
+    This way the capturing process is never held up by decoding, and
+    decoding may make use of multiple cores.
+
+    Main sessions are sharded by their TCP 4-tuples, so that
+    game clients behind the same address are still spread
+    among workers. Connections to other servers, such as
+    satellite servers, are passed to every worker decoding
+    a main session from the same address, so that satellite
+    sessions are decoded alongside their main sessions.
+
+    Workers are woken through pipes as segments are written
+    for them, and likewise let the capturing process know
+    once there's room again after it has had to wait.
+
+    On machines not in :attr:`STRONGLY_ORDERED_MACHINES`, such as
+    AArch64, each ring buffer is given a lock shared with its
+    worker, since the order of stores to shared memory is not
+    otherwise kept.
+
+    Parameters
+    ----------
+    sniffer_factory : callable
+        What to call in each worker to make its :class:`~.Sniffer`,
+        such as a :class:`~.Sniffer` subclass.
+
+        It is called with a ``capture_backend`` keyword argument
+        which must be passed along to :class:`~.Sniffer`, and must
+        be picklable to be sent to the workers.
+    num_workers : :class:`int` or ``None``
+        The number of worker processes.
+
+        If ``None``, then the number of CPUs is used.
+    ring_size : :class:`int`
+        The size in bytes of each worker's ring buffer.
+    backpressure : :class:`str`
+        What to do when a worker's ring buffer is full.
+
+        If ``"drop"``, then the segment is dropped and counted
+        in :attr:`drop_counts`. If ``"block"``, then reading from
+        the capture backend is paused until there's room in the
+        ring buffer, leaving captured traffic to be buffered in
+        the meantime without holding up the event loop.
+
+        Replaying a capture file always waits for room.
+    capture_backend : subclass of :class:`~.CaptureBackend` or ``None``
+        The capture backend to use.
+
+        If ``None``, then one is chosen as :class:`~.Sniffer` would.
+    interface : :class:`str` or ``None``
+        The interface to capture on.
+    mp_context : :class:`multiprocessing.context.BaseContext` or ``None``
+        The :mod:`multiprocessing` context to start workers with.
+
+        If ``None``, then the ``"spawn"`` context is used, as forking
+        a process with a running event loop is not safe.
+    """
+
+    RING_SIZE = 1 << 24
+
+    # The longest to wait to be notified by the other side of a
+    # ring buffer, in case a notification is missed, in seconds.
+    WAKEUP_TIMEOUT = 0.1
+
+    BACKPRESSURE_POLICIES = ("drop", "block")
+
+    # The machines whose stores to shared memory become visible
+    # to other processes in the order they're made. On others,
+    # each ring buffer is accessed while holding a lock.
+    STRONGLY_ORDERED_MACHINES = frozenset({"x86_64", "amd64", "x86", "i386", "i686"})
+
+    def __init__(
+        self,
+        sniffer_factory,
+        *,
+        num_workers     = None,
+        ring_size       = RING_SIZE,
+        backpressure    = "drop",
+        capture_backend = None,
+        interface       = None,
+        mp_context      = None,
+    ):
+        if backpressure not in self.BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {repr(backpressure)}")
+
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+
+        if capture_backend is None:
+            # NOTE: Raw packet sockets are only available on Linux.
+            if hasattr(socket, "AF_PACKET"):
+                capture_backend = RawSocketCapture
+            else:
+                capture_backend = ScapyCapture
+
+        if mp_context is None:
+            mp_context = multiprocessing.get_context("spawn")
+
+        self.sniffer_factory = sniffer_factory
+        self.num_workers     = num_workers
+        self.ring_size       = ring_size
+        self.backpressure    = backpressure
+        self.mp_context      = mp_context
+
+        self.lock_rings = platform.machine().lower() not in self.STRONGLY_ORDERED_MACHINES
+
+        self.capture = capture_backend(self._handle_tcp_segment, interface=interface)
+
+        self.rings     = []
+        self.processes = []
+
+        self._conns            = []
+        self._wake_conns       = []
+        self._progress_conns   = []
+        self._worker_endpoints = []
+
+        # The endpoints of the main servers, as first reported by the workers.
+        self._main_endpoints = set()
+
+        # Maps sorted pairs of TCP endpoints to their connections.
+        self._connections = {}
+
+        # Maps client addresses to how many main sessions from them each worker has.
+        self._client_workers = {}
+
+        # The consumer wait counts of each ring that workers were last woken for.
+        self._woken_waits = []
+
+        # Segments waiting for room, in the order they were captured.
+        self._blocked      = collections.deque()
+        self._flush_handle = None
+
+        self._room               = []
+        self._endpoints_received = None
+        self._stopped            = None
+
+        self._final_drop_counts = []
+
+    @property
+    def drop_counts(self):
+        """The number of segments dropped for each worker."""
+
+        if len(self.rings) == 0:
+            return self._final_drop_counts
+
+        return [ring.dropped for ring in self.rings]
+
+    @property
+    def dropped(self):
+        """The total number of dropped segments."""
+
+        return sum(self.drop_counts)
+
+    def _update_endpoints(self, index):
+        conn = self._conns[index]
+
+        try:
+            while conn.poll():
+                self._worker_endpoints[index] = conn.recv()
+
+                # NOTE: Workers first report their endpoints
+                # upon making their sniffers, before they've
+                # learned of any satellite servers.
+                if not self._endpoints_received[index].is_set():
+                    self._endpoints_received[index].set()
+
+                    self._main_endpoints.update(
+                        (addr, port) for addr, ports in self._worker_endpoints[index] for port in ports
+                    )
+
+        except EOFError:
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+
+            self._endpoints_received[index].set()
+
+        endpoints = {}
+        for worker_endpoints in self._worker_endpoints:
+            for addr, ports in worker_endpoints:
+                endpoints.setdefault(addr, set()).update(ports)
+
+        self.capture.set_endpoints(endpoints.items())
+
+    def _worker_for_key(self, key):
+        # NOTE: We use 'crc32' as it's cheap and deterministic.
+        return zlib.crc32(repr(key).encode()) % self.num_workers
+
+    def _route_connection(self, segment):
+        for client_addr, client_port, server_addr, server_port in (
+            (segment.src_addr, segment.src_port, segment.dst_addr, segment.dst_port),
+            (segment.dst_addr, segment.dst_port, segment.src_addr, segment.src_port),
+        ):
+            if (server_addr, server_port) in self._main_endpoints:
+                return (self._worker_for_key((client_addr, client_port, server_addr, server_port)),), client_addr
+
+        # The connection may be to a satellite server,
+        # which only workers decoding a main session
+        # from the same address could be expecting.
+        indices = set()
+        for addr in (segment.src_addr, segment.dst_addr):
+            indices.update(self._client_workers.get(addr, ()))
+
+        if len(indices) > 0:
+            return tuple(sorted(indices)), None
+
+        return (self._worker_for_key((segment.src_addr, segment.src_port, segment.dst_addr, segment.dst_port)),), None
+
+    def _forget_connection(self, key, connection):
+        del self._connections[key]
+
+        if connection.client_addr is None:
+            return
+
+        workers = self._client_workers[connection.client_addr]
+
+        workers[connection.indices[0]] -= 1
+        if workers[connection.indices[0]] == 0:
+            del workers[connection.indices[0]]
+
+            if len(workers) == 0:
+                del self._client_workers[connection.client_addr]
+
+    def _workers_for_segment(self, segment):
+        src = (segment.src_addr, segment.src_port)
+        dst = (segment.dst_addr, segment.dst_port)
+
+        key = (src, dst) if src <= dst else (dst, src)
+
+        connection = self._connections.get(key)
+        if connection is None:
+            indices, client_addr = self._route_connection(segment)
+
+            # NOTE: Like sniffers, we only track connections
+            # from their beginning or at data, so that trailing
+            # segments of finished connections aren't tracked.
+            if len(segment.payload) == 0 and not segment.flags & TCPSegment.SYN:
+                return indices
+
+            connection = self._connections[key] = _RoutedConnection(indices, client_addr)
+
+            if client_addr is not None:
+                workers = self._client_workers.setdefault(client_addr, collections.Counter())
+
+                workers[indices[0]] += 1
+
+        if segment.flags & TCPSegment.FIN:
+            connection.fin_sources.add(src)
+
+        if segment.flags & TCPSegment.RST or len(connection.fin_sources) == 2:
+            self._forget_connection(key, connection)
+
+        return connection.indices
+
+    def _put(self, index, record):
+        ring = self.rings[index]
+
+        if not ring.put(record):
+            return False
+
+        # Wake the worker once per time it waits.
+        consumer_waits = ring.consumer_waits
+        if consumer_waits != self._woken_waits[index]:
+            self._woken_waits[index] = consumer_waits
+
+            _notify(self._wake_conns[index])
+
+        return True
+
+    def _put_or_wait(self, index, record):
+        # Returns whether the record was put, and otherwise
+        # marks that we're waiting for room for it.
+
+        if self._put(index, record):
+            return True
+
+        self.rings[index].wait_for_room()
+
+        # NOTE: We try again once we've marked that we're
+        # waiting, so that we don't miss room made just
+        # beforehand. And as that may still be missed
+        # without memory fences, we don't wait indefinitely
+        # to be notified.
+        return self._put(index, record)
+
+    def _handle_progress(self, index):
+        conn = self._progress_conns[index]
+
+        try:
+            while conn.poll():
+                conn.recv_bytes()
+
+        except EOFError:
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+
+        self._room[index].set()
+
+        if len(self._blocked) > 0:
+            self._flush_blocked()
+
+    def _flush_blocked(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+
+            self._flush_handle = None
+
+        while len(self._blocked) > 0:
+            index, record = self._blocked[0]
+
+            if not self.processes[index].is_alive():
+                self.rings[index].count_drop()
+
+            elif not self._put_or_wait(index, record):
+                self._flush_handle = asyncio.get_running_loop().call_later(self.WAKEUP_TIMEOUT, self._flush_blocked)
+
+                return
+
+            self._blocked.popleft()
+
+        self.capture.resume_reading()
+
+    def _handle_tcp_segment(self, segment):
+        record = _pack_segment(segment)
+
+        for index in self._workers_for_segment(segment):
+            # NOTE: Once any segments are waiting for room,
+            # later segments wait behind them to stay in order.
+            if len(self._blocked) > 0:
+                self._blocked.append((index, record))
+
+                continue
+
+            if self._put(index, record):
+                continue
+
+            if self.backpressure == "block" and self.processes[index].is_alive():
+                self._blocked.append((index, record))
+
+                self.capture.pause_reading()
+
+                self._flush_handle = asyncio.get_running_loop().call_soon(self._flush_blocked)
+
+                continue
+
+            self.rings[index].count_drop()
+
+    async def startup(self, *, capture=True):
+        loop = asyncio.get_running_loop()
+
+        self._stopped            = asyncio.Event()
+        self._endpoints_received = []
+
+        for index in range(self.num_workers):
+            ring_lock = self.mp_context.Lock() if self.lock_rings else None
+
+            ring = SharedRingBuffer(self.ring_size, lock=ring_lock)
+
+            # NOTE: Each pipe is received from by its first end and sent to by its second.
+            parent_conn,     child_conn          = self.mp_context.Pipe(duplex=False)
+            child_wake_conn, wake_conn           = self.mp_context.Pipe(duplex=False)
+            progress_conn,   child_progress_conn = self.mp_context.Pipe(duplex=False)
+
+            process = self.mp_context.Process(
+                target = _run_decode_worker,
+
+                args = (
+                    self.sniffer_factory,
+                    ring.name,
+                    ring_lock,
+                    child_conn,
+                    child_wake_conn,
+                    child_progress_conn,
+                    self.WAKEUP_TIMEOUT,
+                ),
+
+                daemon = True,
+            )
+
+            process.start()
+
+            child_conn.close()
+            child_wake_conn.close()
+            child_progress_conn.close()
+
+            self.rings.append(ring)
+            self.processes.append(process)
+
+            self._conns.append(parent_conn)
+            self._wake_conns.append(wake_conn)
+            self._progress_conns.append(progress_conn)
+            self._worker_endpoints.append([])
+            self._woken_waits.append(0)
+            self._room.append(asyncio.Event())
+            self._endpoints_received.append(asyncio.Event())
+
+            loop.add_reader(parent_conn.fileno(),   self._update_endpoints, index)
+            loop.add_reader(progress_conn.fileno(), self._handle_progress,  index)
+
+        # Each worker reports its endpoints upon making
+        # its sniffer, and we wait for those before capturing.
+        for received in self._endpoints_received:
+            await received.wait()
+
+        if capture:
+            self.capture.start()
+
+    async def shutdown(self):
+        loop = asyncio.get_running_loop()
+
+        self.capture.stop()
+
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+
+            self._flush_handle = None
+
+        for index, _ in self._blocked:
+            self.rings[index].count_drop()
+
+        self._blocked.clear()
+
+        for ring, wake_conn in zip(self.rings, self._wake_conns):
+            ring.close_writing()
+
+            _notify(wake_conn)
+
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+
+        for conn in (*self._conns, *self._progress_conns):
+            if not conn.closed:
+                loop.remove_reader(conn.fileno())
+
+                conn.close()
+
+        for conn in self._wake_conns:
+            conn.close()
+
+        self._final_drop_counts = self.drop_counts
+
+        for ring in self.rings:
+            ring.close()
+
+        self.rings.clear()
+        self.processes.clear()
+
+        self._conns.clear()
+        self._wake_conns.clear()
+        self._progress_conns.clear()
+        self._worker_endpoints.clear()
+        self._woken_waits.clear()
+        self._room.clear()
+
+        self._main_endpoints.clear()
+        self._connections.clear()
+        self._client_workers.clear()
+
+    async def _put_waiting(self, index, record):
+        room = self._room[index]
+
+        while True:
+            room.clear()
+
+            if self._put_or_wait(index, record):
+                return
+
+            if not self.processes[index].is_alive():
+                self.rings[index].count_drop()
+
+                return
+
+            try:
+                await asyncio.wait_for(room.wait(), self.WAKEUP_TIMEOUT)
+
+            except asyncio.TimeoutError:
+                pass
+
+    async def replay(self, file):
+        """Decodes the traffic in a capture file in the workers.
+
+        Parameters
+        ----------
+        file : path-like or binary file object
+            The pcap or pcapng capture file to replay.
+        """
+
+        await self.startup(capture=False)
+
+        try:
+            for segment in read_capture_file(file):
+                record = _pack_segment(segment)
+
+                for index in self._workers_for_segment(segment):
+                    await self._put_waiting(index, record)
+
+                # NOTE: Let the endpoints of satellite
+                # servers be reported as they're learned.
+                await asyncio.sleep(0)
+
+        finally:
+            await self.shutdown()
+
+    def close(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+    async def start(self):
+        await self.startup()
+
+        try:
+            await self._stopped.wait()
+
+        finally:
+            await self.shutdown()
+
+    def run(self):
+        try:
+            asyncio.run(self.start())
+
+        except KeyboardInterrupt:
+            pass
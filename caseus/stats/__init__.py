@@ -0,0 +1,6 @@
+from .histogram import *
+from .http      import *
+from .loop_lag  import *
+from .metrics   import *
+from .profiler  import *
+from .tracing   import *
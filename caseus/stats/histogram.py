@@ -0,0 +1,187 @@
+r"""A compact histogram for recording latencies and the like."""
+
+from public import public
+
+@public
+class Histogram:
+    r"""A log-linear histogram of non-negative :class:`int`\s.
+
+    In the manner of an HDR histogram, values are recorded into
+    buckets whose width grows with the magnitude of the values
+    they hold, so that every recorded value is represented with
+    the same relative precision no matter its magnitude, while
+    only taking up a bucket for each distinct magnitude recorded.
+
+    Parameters
+    ----------
+    precision_bits : :class:`int`
+        The number of bits of precision kept for each value.
+
+        Values are represented within a relative
+        error of ``2 ** -precision_bits``.
+    """
+
+    PRECISION_BITS = 5
+
+    def __init__(self, *, precision_bits=PRECISION_BITS):
+        self.precision_bits = precision_bits
+
+        self.count = 0
+        self.sum   = 0
+        self.min   = None
+        self.max   = None
+
+        # Maps bucket indices to their counts.
+        self._buckets = {}
+
+    def _index(self, value):
+        # NOTE: Values below '2 ** (precision_bits + 1)'
+        # each get their own bucket, and above that each
+        # power of two is split into '2 ** precision_bits'
+        # buckets.
+        exponent = value.bit_length() - self.precision_bits - 1
+        if exponent <= 0:
+            return value
+
+        return (exponent << self.precision_bits) + (value >> exponent)
+
+    def _bounds(self, index):
+        # Returns the lowest value of a bucket and the
+        # lowest value of the next bucket.
+
+        exponent = max((index >> self.precision_bits) - 1, 0)
+        mantissa = index - (exponent << self.precision_bits)
+
+        return mantissa << exponent, (mantissa + 1) << exponent
+
+    def record(self, value, count=1):
+        """Records a value.
+
+        Parameters
+        ----------
+        value : :class:`int`
+            The non-negative value to record.
+        count : :class:`int`
+            The number of times to record ``value``.
+        """
+
+        index = self._index(value)
+
+        self._buckets[index] = self._buckets.get(index, 0) + count
+
+        self.count += count
+        self.sum   += value * count
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Records all the values of another :class:`Histogram`.
+
+        Parameters
+        ----------
+        other : :class:`Histogram`
+            The histogram to merge in.
+
+            It must have the same precision as this one.
+        """
+
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Histograms of differing precision may not be merged")
+
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+
+        self.count += other.count
+        self.sum   += other.sum
+
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    @property
+    def mean(self):
+        """The mean of the recorded values, or ``None`` if there are none."""
+
+        if self.count == 0:
+            return None
+
+        return self.sum / self.count
+
+    def percentile(self, percentile):
+        """Gets the value at a percentile of the recorded values.
+
+        Parameters
+        ----------
+        percentile : :class:`float`
+            The percentile, from ``0`` to ``100``.
+
+        Returns
+        -------
+        :class:`int` or ``None``
+            The highest value equivalent to the value at ``percentile``,
+            or ``None`` if there are no recorded values.
+        """
+
+        if self.count == 0:
+            return None
+
+        target = max(percentile / 100 * self.count, 1)
+
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+
+            if seen >= target:
+                _, upper = self._bounds(index)
+
+                return min(upper - 1, self.max)
+
+        return self.max
+
+    def buckets(self):
+        """Gets the non-empty buckets of the histogram.
+
+        Returns
+        -------
+        :class:`list` of (:class:`int`, :class:`int`, :class:`int`)
+            The lowest value of each bucket, the lowest value
+            of the next bucket, and the number of recorded
+            values in the bucket, in ascending order.
+        """
+
+        return [(*self._bounds(index), self._buckets[index]) for index in sorted(self._buckets)]
+
+    def count_at_or_below(self, value):
+        """Gets the number of recorded values at or below a value.
+
+        Only buckets wholly at or below ``value`` are counted.
+
+        Parameters
+        ----------
+        value : :class:`int`
+            The value to count up to.
+
+        Returns
+        -------
+        :class:`int`
+            The number of recorded values at or below ``value``.
+        """
+
+        if self.max is not None and value >= self.max:
+            return self.count
+
+        return sum(
+            count
+
+            for index, count in self._buckets.items()
+            if self._bounds(index)[1] - 1 <= value
+        )
+
+    def __repr__(self):
+        return f"<{type(self).__qualname__} count={self.count} min={self.min} max={self.max}>"
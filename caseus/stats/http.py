@@ -0,0 +1,73 @@
+r"""A tiny HTTP endpoint for exporting :class:`~.Metrics`."""
+
+import asyncio
+import json
+
+from public import public
+
+async def _handle_request(metrics, reader, writer):
+    try:
+        request_line = await reader.readline()
+
+        # Skip the headers.
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        parts = request_line.decode("latin-1").split()
+
+        if len(parts) < 2 or parts[0] != "GET":
+            status, content_type, body = "405 Method Not Allowed", "text/plain", "Method Not Allowed\n"
+
+        elif parts[1] == "/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", metrics.prometheus_text()
+
+        elif parts[1] == "/metrics.json":
+            status, content_type, body = "200 OK", "application/json", json.dumps(metrics.snapshot())
+
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", "Not Found\n"
+
+        body = body.encode("utf-8")
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n"
+            f"\r\n".encode("latin-1") +
+
+            body
+        )
+
+        await writer.drain()
+
+    finally:
+        writer.close()
+
+@public
+async def serve_metrics(metrics, *, host="127.0.0.1", port=9464):
+    """Serves metrics over HTTP.
+
+    The metrics are served in the Prometheus text format
+    at ``/metrics``, and as a JSON snapshot at ``/metrics.json``.
+
+    Parameters
+    ----------
+    metrics : :class:`~.Metrics`
+        The metrics to serve.
+    host : :class:`str`
+        The address to serve on.
+    port : :class:`int`
+        The port to serve on.
+
+    Returns
+    -------
+    :class:`asyncio.Server`
+        The server, which is already serving.
+    """
+
+    return await asyncio.start_server(
+        lambda reader, writer: _handle_request(metrics, reader, writer),
+
+        host, port,
+    )
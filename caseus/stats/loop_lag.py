@@ -0,0 +1,189 @@
+r"""Monitoring of the lag of an :mod:`asyncio` event loop."""
+
+import asyncio
+import collections
+import heapq
+import itertools
+import time
+
+from public import public
+
+from .histogram import Histogram
+from .profiler  import _listener_name, _packet_name
+
+@public
+class LoopLagMonitor:
+    r"""Monitors the lag of the running event loop.
+
+    The monitor repeatedly sleeps for ``interval`` seconds, and
+    the lag is how much later than expected it then wakes up,
+    which is recorded into a :class:`~.Histogram` of nanoseconds.
+
+    Lag is caused by code which holds up the event loop, and so
+    the listeners which ran since the monitor last woke up are
+    tracked. When the lag exceeds ``spike_threshold``, a spike
+    is recorded along with the listeners which took the most
+    time since the monitor last woke up, and the listeners which
+    were still running at the time.
+
+    The monitor is enabled on a handler with
+    :meth:`~.AsyncPacketHandler.enable_loop_lag_monitor`.
+
+    Parameters
+    ----------
+    interval : :class:`float`
+        The number of seconds between measurements.
+    spike_threshold : :class:`float`
+        The number of seconds of lag beyond which a spike is recorded.
+    max_spikes : :class:`int`
+        The number of most recent spikes to keep.
+    """
+
+    INTERVAL        = 0.1
+    SPIKE_THRESHOLD = 0.05
+    MAX_SPIKES      = 100
+
+    # The number of listeners to record for each spike.
+    SPIKE_LISTENERS = 5
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self, *, interval=INTERVAL, spike_threshold=SPIKE_THRESHOLD, max_spikes=MAX_SPIKES):
+        self.interval        = interval
+        self.spike_threshold = spike_threshold
+
+        self.lag    = Histogram()
+        self.spikes = collections.deque(maxlen=max_spikes)
+
+        # The longest running listeners which finished since we last
+        # woke up, as a heap of at most 'SPIKE_LISTENERS' entries.
+        #
+        # NOTE: Only those longest are ever recorded, and keeping
+        # no more than them bounds the heap even when we're not
+        # running to clear it, such as for a sniffer.
+        self._recent = []
+
+        # Maps tokens to the listeners which are running.
+        self._active = {}
+        self._tokens = itertools.count()
+
+    def reset(self):
+        """Forgets all recorded lag and spikes."""
+
+        self.lag    = Histogram()
+        self.spikes.clear()
+
+    def listener_started(self, listener, packet_cls):
+        """Notes that a listener started running.
+
+        Parameters
+        ----------
+        listener : callable
+            The listener.
+        packet_cls : subclass of :class:`pak.Packet`
+            The class of the packet it's listening to.
+
+        Returns
+        -------
+        :class:`int`
+            The token to pass to :meth:`listener_finished`.
+        """
+
+        token = next(self._tokens)
+
+        self._active[token] = (listener, packet_cls, time.perf_counter_ns())
+
+        return token
+
+    def listener_finished(self, token, duration):
+        """Notes that a listener finished running.
+
+        Parameters
+        ----------
+        token : :class:`int`
+            The token returned from :meth:`listener_started`.
+        duration : :class:`int`
+            How long the listener ran for in nanoseconds.
+        """
+
+        listener, packet_cls, _ = self._active.pop(token)
+
+        # NOTE: The token breaks ties between durations.
+        entry = (duration, token, listener, packet_cls)
+
+        if len(self._recent) < self.SPIKE_LISTENERS:
+            heapq.heappush(self._recent, entry)
+
+        else:
+            heapq.heappushpop(self._recent, entry)
+
+    def _record_spike(self, lag):
+        recent = sorted(self._recent, reverse=True)
+
+        now = time.perf_counter_ns()
+
+        self.spikes.append(dict(
+            time = time.time(),
+            lag  = lag,
+
+            recent_listeners = [
+                dict(
+                    listener = _listener_name(getattr(listener, "__func__", listener)),
+                    packet   = _packet_name(packet_cls),
+                    duration = duration,
+                )
+
+                for duration, _, listener, packet_cls in recent
+            ],
+
+            active_listeners = [
+                dict(
+                    listener = _listener_name(getattr(listener, "__func__", listener)),
+                    packet   = _packet_name(packet_cls),
+                    duration = now - start,
+                )
+
+                for listener, packet_cls, start in self._active.values()
+            ],
+        ))
+
+    async def run(self):
+        """Monitors the running event loop until cancelled."""
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            expected = loop.time() + self.interval
+
+            await asyncio.sleep(self.interval)
+
+            lag = max(int((loop.time() - expected) * 1_000_000_000), 0)
+
+            self.lag.record(lag)
+
+            if lag > self.spike_threshold * 1_000_000_000:
+                self._record_spike(lag)
+
+            self._recent.clear()
+
+    def snapshot(self):
+        """Gets a snapshot of the recorded lag and spikes.
+
+        Returns
+        -------
+        :class:`dict`
+            The lag and spikes as plain data, with durations in nanoseconds.
+        """
+
+        return dict(
+            count = self.lag.count,
+            max   = self.lag.max,
+
+            percentiles = {
+                percentile: self.lag.percentile(percentile)
+
+                for percentile in self.PERCENTILES
+            },
+
+            spikes = list(self.spikes),
+        )
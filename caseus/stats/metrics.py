@@ -0,0 +1,293 @@
+r"""A registry of traffic metrics for packet handlers."""
+
+import time
+
+from public import public
+
+from .histogram import Histogram
+from .profiler  import _packet_name
+
+def _escape_label_value(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labels):
+    return "{" + ",".join(
+        f'{name}="{_escape_label_value(str(value))}"'
+
+        for name, value in labels.items() if value is not None
+    ) + "}"
+
+class _Timing:
+    # Records the time taken by the body of a 'with' statement.
+
+    __slots__ = ("metrics", "key", "start")
+
+    def __init__(self, metrics, name, packet_cls, direction):
+        self.metrics = metrics
+        self.key     = (name, packet_cls, direction)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.metrics.record_time(*self.key, time.perf_counter_ns() - self.start)
+
+@public
+class Metrics:
+    r"""A registry of traffic metrics.
+
+    Packets and bytes are counted per packet class and
+    direction, and the time taken to decode, encode, cipher,
+    and listen to packets is recorded into :class:`~.Histogram`\s
+    of nanoseconds per packet class and direction.
+
+    The direction of a packet is either ``"incoming"`` or
+    ``"outgoing"``, relative to the handler recording it.
+    Listeners are not told the direction of the packets
+    they listen to, and so their timings have a direction
+    of ``None``.
+
+    Metrics are enabled on a handler with
+    :meth:`~.AsyncPacketHandler.enable_metrics`.
+    """
+
+    # The names of the recorded timings.
+    DECODE   = "decode"
+    ENCODE   = "encode"
+    CIPHER   = "cipher"
+    LISTENER = "listener"
+
+    # The upper bounds, in seconds, of the
+    # histogram buckets exported to Prometheus.
+    EXPORTED_BUCKETS = (
+        0.00001, 0.000025, 0.00005,
+        0.0001,  0.00025,  0.0005,
+        0.001,   0.0025,   0.005,
+        0.01,    0.025,    0.05,
+        0.1,     0.25,     0.5,
+        1,
+    )
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        # Maps packet classes and directions to
+        # lists of their packet and byte counts.
+        self.packets = {}
+
+        # Maps timing names, packet classes, and
+        # directions to their histograms.
+        self.timings = {}
+
+    def reset(self):
+        """Forgets all recorded metrics."""
+
+        self.packets.clear()
+        self.timings.clear()
+
+    def count_packet(self, packet_cls, direction, size):
+        """Counts a packet.
+
+        Parameters
+        ----------
+        packet_cls : subclass of :class:`pak.Packet`
+            The class of the packet.
+        direction : :class:`str`
+            The direction of the packet.
+        size : :class:`int`
+            The size of the packet's data in bytes, excluding its length prefix.
+        """
+
+        key = (packet_cls, direction)
+
+        counts = self.packets.get(key)
+        if counts is None:
+            counts = [0, 0]
+
+            self.packets[key] = counts
+
+        counts[0] += 1
+        counts[1] += size
+
+    def record_time(self, name, packet_cls, direction, duration):
+        """Records a timing.
+
+        Parameters
+        ----------
+        name : :class:`str`
+            The name of the timing, such as :attr:`DECODE`.
+        packet_cls : subclass of :class:`pak.Packet`
+            The class of the packet.
+        direction : :class:`str`
+            The direction of the packet.
+        duration : :class:`int`
+            The duration in nanoseconds.
+        """
+
+        key = (name, packet_cls, direction)
+
+        histogram = self.timings.get(key)
+        if histogram is None:
+            histogram = Histogram()
+
+            self.timings[key] = histogram
+
+        histogram.record(duration)
+
+    def timing(self, name, packet_cls, direction):
+        """Records the time taken by the body of a ``with`` statement.
+
+        Parameters
+        ----------
+        name : :class:`str`
+            The name of the timing, such as :attr:`ENCODE`.
+        packet_cls : subclass of :class:`pak.Packet`
+            The class of the packet.
+        direction : :class:`str`
+            The direction of the packet.
+
+        Returns
+        -------
+        context manager
+            The context manager recording the time.
+        """
+
+        return _Timing(self, name, packet_cls, direction)
+
+    def timed(self, name, packet_cls, direction, func, /, *args, **kwargs):
+        """Calls a function and records the time it took.
+
+        Returns
+        -------
+        any
+            What ``func`` returned.
+        """
+
+        with self.timing(name, packet_cls, direction):
+            return func(*args, **kwargs)
+
+    def decode_packet(self, decode, buf, *, size):
+        """Decodes an incoming packet, counting it and recording the time it took.
+
+        Parameters
+        ----------
+        decode : callable
+            The function to decode the packet from ``buf`` with.
+        buf : file object
+            The packet data.
+        size : :class:`int`
+            The size of the packet's data in bytes, excluding its length prefix.
+
+        Returns
+        -------
+        :class:`pak.Packet`
+            The decoded packet.
+        """
+
+        start = time.perf_counter_ns()
+
+        packet = decode(buf)
+
+        self.record_time(self.DECODE, type(packet), "incoming", time.perf_counter_ns() - start)
+        self.count_packet(type(packet), "incoming", size)
+
+        return packet
+
+    def snapshot(self):
+        """Gets a snapshot of the metrics.
+
+        Returns
+        -------
+        :class:`dict`
+            The metrics as plain data, with durations in nanoseconds.
+        """
+
+        return dict(
+            packets = [
+                dict(
+                    packet    = _packet_name(packet_cls),
+                    direction = direction,
+                    count     = count,
+                    bytes     = size,
+                )
+
+                for (packet_cls, direction), (count, size) in self.packets.items()
+            ],
+
+            timings = [
+                dict(
+                    name      = name,
+                    packet    = _packet_name(packet_cls),
+                    direction = direction,
+                    count     = histogram.count,
+                    sum       = histogram.sum,
+                    min       = histogram.min,
+                    max       = histogram.max,
+
+                    percentiles = {
+                        percentile: histogram.percentile(percentile)
+
+                        for percentile in self.PERCENTILES
+                    },
+                )
+
+                for (name, packet_cls, direction), histogram in self.timings.items()
+            ],
+        )
+
+    def prometheus_text(self, *, prefix="caseus"):
+        """Exports the metrics in the Prometheus text format.
+
+        Parameters
+        ----------
+        prefix : :class:`str`
+            The prefix of the exported metric names.
+
+        Returns
+        -------
+        :class:`str`
+            The exported metrics.
+        """
+
+        lines = []
+
+        lines.append(f"# HELP {prefix}_packets_total The number of packets handled.")
+        lines.append(f"# TYPE {prefix}_packets_total counter")
+
+        for (packet_cls, direction), (count, _) in self.packets.items():
+            labels = _format_labels(dict(packet=_packet_name(packet_cls), direction=direction))
+
+            lines.append(f"{prefix}_packets_total{labels} {count}")
+
+        lines.append(f"# HELP {prefix}_packet_bytes_total The number of bytes of packets handled.")
+        lines.append(f"# TYPE {prefix}_packet_bytes_total counter")
+
+        for (packet_cls, direction), (_, size) in self.packets.items():
+            labels = _format_labels(dict(packet=_packet_name(packet_cls), direction=direction))
+
+            lines.append(f"{prefix}_packet_bytes_total{labels} {size}")
+
+        histograms_by_name = {}
+        for (name, packet_cls, direction), histogram in self.timings.items():
+            histograms_by_name.setdefault(name, []).append((packet_cls, direction, histogram))
+
+        for name, histograms in histograms_by_name.items():
+            metric = f"{prefix}_{name}_seconds"
+
+            lines.append(f"# HELP {metric} The time taken to {name} packets.")
+            lines.append(f"# TYPE {metric} histogram")
+
+            for packet_cls, direction, histogram in histograms:
+                labels = dict(packet=_packet_name(packet_cls), direction=direction)
+
+                for bound in self.EXPORTED_BUCKETS:
+                    count = histogram.count_at_or_below(int(bound * 1_000_000_000))
+
+                    lines.append(f"{metric}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+
+                lines.append(f"{metric}_bucket{_format_labels(dict(labels, le='+Inf'))} {histogram.count}")
+
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum / 1_000_000_000}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,225 @@
+r"""Profiling of the time taken by packet listeners."""
+
+import inspect
+import logging
+
+from public import public
+
+from .histogram import Histogram
+
+_logger = logging.getLogger(__name__)
+
+def _listener_name(listener):
+    name = getattr(listener, "__qualname__", None)
+    if name is None:
+        return repr(listener)
+
+    module = getattr(listener, "__module__", None)
+    if module is None:
+        return name
+
+    return f"{module}.{name}"
+
+def _packet_name(packet_cls):
+    # NOTE: Many packets share a name across directions,
+    # e.g. 'PlayerMovementPacket', so we qualify the name
+    # with the module to keep them apart.
+    return f"{packet_cls.__module__}.{packet_cls.__qualname__}"
+
+def _listener_location(listener):
+    # NOTE: A slow invocation is only logged once the listener
+    # has returned, when the stack is just the dispatcher's, and
+    # so we instead point to the source of the listener itself.
+    listener = inspect.unwrap(listener)
+
+    try:
+        filename          = inspect.getsourcefile(listener) or inspect.getfile(listener)
+        lines, first_line = inspect.getsourcelines(listener)
+
+    except (TypeError, OSError):
+        code = getattr(listener, "__code__", None)
+        if code is None:
+            return None
+
+        return f"{code.co_filename}:{code.co_firstlineno}"
+
+    return f"{filename}:{first_line}-{first_line + len(lines) - 1}"
+
+@public
+class ListenerProfiler:
+    r"""Profiles the time taken by each packet listener.
+
+    Each invocation of a listener is timed, and the time
+    is attributed to the listener's function and the class
+    of the packet it listened to. Invocations taking longer
+    than ``slow_threshold`` are logged as warnings along with
+    the listener's qualified name and its source file and lines.
+
+    Listeners are profiled on a handler with
+    :meth:`~.AsyncPacketHandler.enable_listener_profiling`.
+
+    Parameters
+    ----------
+    slow_threshold : :class:`float` or ``None``
+        The number of seconds beyond which an invocation is logged.
+
+        If ``None``, then no invocations are logged.
+    logger : :class:`logging.Logger` or ``None``
+        The logger to log slow invocations to.
+
+        If ``None``, then the ``caseus.stats.profiler`` logger is used.
+    """
+
+    SLOW_THRESHOLD = 0.05
+
+    # What the rows of 'top' may be sorted by.
+    SORT_KEYS = ("total", "max", "mean", "count")
+
+    def __init__(self, *, slow_threshold=SLOW_THRESHOLD, logger=None):
+        if logger is None:
+            logger = _logger
+
+        self.slow_threshold = slow_threshold
+        self.logger         = logger
+
+        # Maps listener functions and packet classes to their histograms.
+        self.timings = {}
+
+    @property
+    def slow_threshold(self):
+        return self._slow_threshold
+
+    @slow_threshold.setter
+    def slow_threshold(self, value):
+        self._slow_threshold = value
+
+        # NOTE: We compare against nanoseconds.
+        self._slow_threshold_ns = None if value is None else int(value * 1_000_000_000)
+
+    def reset(self):
+        """Forgets all recorded timings."""
+
+        self.timings.clear()
+
+    def record(self, listener, packet_cls, duration):
+        """Records an invocation of a listener.
+
+        Parameters
+        ----------
+        listener : callable
+            The listener which was invoked.
+        packet_cls : subclass of :class:`pak.Packet`
+            The class of the packet it listened to.
+        duration : :class:`int`
+            The duration of the invocation in nanoseconds.
+        """
+
+        # NOTE: We attribute bound methods to their
+        # functions so that the timings of several
+        # handlers of the same class are combined.
+        function = getattr(listener, "__func__", listener)
+
+        key = (function, packet_cls)
+
+        histogram = self.timings.get(key)
+        if histogram is None:
+            histogram = Histogram()
+
+            self.timings[key] = histogram
+
+        histogram.record(duration)
+
+        if self._slow_threshold_ns is not None and duration > self._slow_threshold_ns:
+            self.logger.warning(
+                "Slow listener %s (%s) took %.3fms for %s",
+
+                _listener_name(function),
+                _listener_location(function),
+                duration / 1_000_000,
+                _packet_name(packet_cls),
+            )
+
+    def top(self, n=10, *, by="total"):
+        """Gets the listeners which have taken the most time.
+
+        Parameters
+        ----------
+        n : :class:`int` or ``None``
+            The number of rows to get.
+
+            If ``None``, then all rows are gotten.
+        by : :class:`str`
+            What to sort the rows by, one of :attr:`SORT_KEYS`.
+
+        Returns
+        -------
+        :class:`list` of :class:`dict`
+            The rows for each listener and packet class, with
+            durations in nanoseconds, sorted in descending order.
+        """
+
+        if by not in self.SORT_KEYS:
+            raise ValueError(f"Cannot sort by {repr(by)}")
+
+        rows = [
+            dict(
+                listener = _listener_name(function),
+                packet   = _packet_name(packet_cls),
+                count    = histogram.count,
+                total    = histogram.sum,
+                mean     = histogram.mean,
+                max      = histogram.max,
+                p99      = histogram.percentile(99),
+            )
+
+            for (function, packet_cls), histogram in self.timings.items()
+        ]
+
+        rows.sort(key=lambda row: row[by], reverse=True)
+
+        if n is not None:
+            rows = rows[:n]
+
+        return rows
+
+    def format_top(self, n=10, *, by="total"):
+        """Formats the rows of :meth:`top` as a table.
+
+        Returns
+        -------
+        :class:`str`
+            The table, with durations in milliseconds.
+        """
+
+        header = ("Listener", "Packet", "Count", "Total (ms)", "Mean (ms)", "Max (ms)", "p99 (ms)")
+
+        table = [header] + [
+            (
+                row["listener"],
+                row["packet"],
+                str(row["count"]),
+
+                *(f"{row[column] / 1_000_000:.3f}" for column in ("total", "mean", "max", "p99")),
+            )
+
+            for row in self.top(n, by=by)
+        ]
+
+        widths = [max(len(row[column]) for row in table) for column in range(len(header))]
+
+        return "\n".join(
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+
+            for row in table
+        )
+
+    def snapshot(self):
+        """Gets a snapshot of the recorded timings.
+
+        Returns
+        -------
+        :class:`list` of :class:`dict`
+            Every row of :meth:`top`.
+        """
+
+        return self.top(None)
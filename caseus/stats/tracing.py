@@ -0,0 +1,259 @@
+r"""Tracing of the latency a :class:`~.Proxy` adds to forwarded packets."""
+
+import contextvars
+import json
+import os
+import time
+
+from public import public
+
+from .histogram import Histogram
+from .profiler  import _packet_name
+
+class _PacketTrace:
+    __slots__ = ("direction", "packet", "last_time", "spans")
+
+    def __init__(self, direction, start_time):
+        self.direction = direction
+        self.packet    = None
+        self.last_time = start_time
+
+        # The stages the packet went through, with their durations.
+        self.spans = []
+
+@public
+class LatencyTracer:
+    r"""Traces the latency added to packets as they're forwarded.
+
+    A sample of forwarded packets are traced from when their frame
+    begins to be read until their bytes have been written to their
+    destination. The time spent in each stage of forwarding is
+    recorded into :class:`~.Histogram`\s of nanoseconds per stage,
+    packet class, and direction, along with the total time.
+
+    The stages are :attr:`READ`, :attr:`DECIPHER`, :attr:`DECODE`,
+    :attr:`LISTENERS`, :attr:`ENCODE`, :attr:`CIPHER`, and :attr:`WRITE`,
+    with stages which a packet did not go through being skipped, and
+    the direction is either ``"serverbound"`` or ``"clientbound"``.
+
+    The trace of the packet being forwarded is kept in a
+    :class:`contextvars.ContextVar`, and so follows the
+    packet into any tasks its listeners are run in.
+
+    Tracing is enabled on a proxy with :meth:`~.Proxy.enable_tracing`.
+
+    Parameters
+    ----------
+    sample_interval : :class:`int`
+        One in every ``sample_interval`` packets is traced.
+    """
+
+    READ      = "read"
+    DECIPHER  = "decipher"
+    DECODE    = "decode"
+    LISTENERS = "listeners"
+    ENCODE    = "encode"
+    CIPHER    = "cipher"
+    WRITE     = "write"
+    TOTAL     = "total"
+
+    SAMPLE_INTERVAL = 16
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    _current_trace = contextvars.ContextVar("_current_trace", default=None)
+
+    def __init__(self, *, sample_interval=SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+
+        self._until_sample = 0
+
+        # Maps stages, packet classes, and directions to their histograms.
+        self.timings = {}
+
+    def reset(self):
+        """Forgets all recorded timings."""
+
+        self.timings.clear()
+
+    def start_trace(self, direction):
+        """Starts tracing a packet if it should be sampled.
+
+        This should be called when a frame begins to be read.
+
+        Parameters
+        ----------
+        direction : :class:`str`
+            The direction of the packet.
+        """
+
+        if self._until_sample > 0:
+            self._until_sample -= 1
+
+            # NOTE: We must forget the trace of
+            # the previous packet in this context.
+            self._current_trace.set(None)
+
+            return
+
+        self._until_sample = self.sample_interval - 1
+
+        self._current_trace.set(_PacketTrace(direction, time.perf_counter_ns()))
+
+    def mark(self, stage, packet=None):
+        """Marks the end of a stage for the packet being traced.
+
+        Parameters
+        ----------
+        stage : :class:`str`
+            The stage which ended.
+        packet : :class:`pak.Packet` or ``None``
+            The packet the stage was for.
+
+            If this is not the packet being traced, then
+            nothing is marked. This way the packets which
+            listeners write are not mistaken for the packet
+            being forwarded. Should be ``None`` for stages
+            before the packet is decoded.
+        """
+
+        trace = self._current_trace.get()
+        if trace is None or trace.packet is not packet:
+            return
+
+        now = time.perf_counter_ns()
+
+        trace.spans.append((stage, now - trace.last_time))
+        trace.last_time = now
+
+    def decoded(self, packet):
+        """Marks the end of decoding the packet being traced.
+
+        Parameters
+        ----------
+        packet : :class:`pak.Packet`
+            The decoded packet.
+        """
+
+        self.mark(self.DECODE)
+
+        trace = self._current_trace.get()
+        if trace is not None:
+            trace.packet = packet
+
+    def finish(self, packet):
+        """Marks the end of writing the packet being traced and records its trace.
+
+        Parameters
+        ----------
+        packet : :class:`pak.Packet`
+            The packet which was written.
+        """
+
+        trace = self._current_trace.get()
+        if trace is None or trace.packet is not packet:
+            return
+
+        self.mark(self.WRITE, packet)
+
+        self._current_trace.set(None)
+
+        packet_cls = type(packet)
+
+        total = 0
+        for stage, duration in trace.spans:
+            self._histogram(stage, packet_cls, trace.direction).record(duration)
+
+            total += duration
+
+        self._histogram(self.TOTAL, packet_cls, trace.direction).record(total)
+
+    def _histogram(self, stage, packet_cls, direction):
+        key = (stage, packet_cls, direction)
+
+        histogram = self.timings.get(key)
+        if histogram is None:
+            histogram = Histogram()
+
+            self.timings[key] = histogram
+
+        return histogram
+
+    def histogram(self, stage, packet_cls, direction):
+        """Gets the histogram of a stage.
+
+        Parameters
+        ----------
+        stage : :class:`str`
+            The stage, or :attr:`TOTAL`.
+        packet_cls : subclass of :class:`pak.Packet`
+            The class of the traced packets.
+        direction : :class:`str`
+            The direction of the traced packets.
+
+        Returns
+        -------
+        :class:`~.Histogram` or ``None``
+            The histogram, or ``None`` if no such packets have been traced.
+        """
+
+        return self.timings.get((stage, packet_cls, direction))
+
+    def snapshot(self, *, include_buckets=False):
+        """Gets a snapshot of the recorded timings.
+
+        Parameters
+        ----------
+        include_buckets : :class:`bool`
+            Whether to include the buckets of each histogram.
+
+        Returns
+        -------
+        :class:`list` of :class:`dict`
+            The timings as plain data, with durations in nanoseconds.
+        """
+
+        timings = []
+        for (stage, packet_cls, direction), histogram in self.timings.items():
+            timing = dict(
+                stage     = stage,
+                packet    = _packet_name(packet_cls),
+                direction = direction,
+                count     = histogram.count,
+                sum       = histogram.sum,
+                min       = histogram.min,
+                max       = histogram.max,
+
+                percentiles = {
+                    percentile: histogram.percentile(percentile)
+
+                    for percentile in self.PERCENTILES
+                },
+            )
+
+            if include_buckets:
+                timing["buckets"] = histogram.buckets()
+
+            timings.append(timing)
+
+        return timings
+
+    def dump(self, file):
+        """Dumps the recorded timings to a file as JSON.
+
+        The buckets of each histogram are included so that
+        the dumped timings may be analyzed further.
+
+        Parameters
+        ----------
+        file : path-like or text file object
+            The file to dump to.
+        """
+
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "w") as f:
+                self.dump(f)
+
+            return
+
+        json.dump(dict(sample_interval=self.sample_interval, timings=self.snapshot(include_buckets=True)), file)
@@ -80,6 +80,21 @@ class CompressedString(pak.Type):
 class ShiftedString(pak.Type):
     _default = ""
 
+    # NOTE: There are only five possible shift amounts,
+    # and so we translate bytes with tables made for
+    # each of them, indexed by the shift amount.
+    _UNSHIFT_TABLES = tuple(
+        bytes((byte + shift_amount) & 0xFF for byte in range(0x100))
+
+        for shift_amount in range(5)
+    )
+
+    _SHIFT_TABLES = tuple(
+        bytes((byte - shift_amount) & 0xFF for byte in range(0x100))
+
+        for shift_amount in range(5)
+    )
+
     @classmethod
     def _shift_amount(cls, *, ctx):
         shift_amount = ctx.secrets.game_version % 5
@@ -103,7 +118,7 @@ class ShiftedString(pak.Type):
 
         shift_amount = cls._shift_amount(ctx=ctx)
 
-        return bytes((byte + shift_amount) & 0xFF for byte in data).decode()
+        return data.translate(cls._UNSHIFT_TABLES[shift_amount]).decode()
 
     @classmethod
     def _pack(cls, value, *, ctx):
@@ -116,6 +131,6 @@ class ShiftedString(pak.Type):
 
         shift_amount = cls._shift_amount(ctx=ctx)
 
-        data = bytes((byte - shift_amount) & 0xFF for byte in value.encode())
+        data = value.encode().translate(cls._SHIFT_TABLES[shift_amount])
 
         return UnsignedShort.pack(len(data), ctx=ctx) + data
@@ -1 +1,3 @@
-from .crypto import *
+from .crypto    import *
+from .handler   import *
+from .transport import *
@@ -0,0 +1,295 @@
+import asyncio
+import contextlib
+import functools
+import time
+import pak
+
+from public import public
+
+# NOTE: A 'nullcontext' may be entered any number of times.
+_NOT_TIMED = contextlib.nullcontext()
+
+@public
+class AsyncPacketHandler(pak.AsyncPacketHandler):
+    """A :class:`pak.AsyncPacketHandler` which caches listener resolution.
+
+    The listeners for a :class:`~.Packet` are resolved once
+    per packet class and set of flags, and are then looked
+    up from a cache until a listener is registered or
+    unregistered.
+
+    Listeners which are listened to sequentially are
+    also awaited inline rather than in separate tasks.
+
+    Traffic metrics may be recorded with :meth:`enable_metrics`,
+    listeners may be profiled with :meth:`enable_listener_profiling`,
+    and the lag of the event loop may be monitored with
+    :meth:`enable_loop_lag_monitor`. All are reported by :meth:`stats`.
+    """
+
+    def __init__(self):
+        # NOTE: This must be set before calling the
+        # super constructor as that will register
+        # any decorated packet listeners.
+        self._listener_cache = {}
+
+        super().__init__()
+
+        # NOTE: When these are disabled, the cost to
+        # the hot paths is a single attribute check each.
+        self.metrics           = None
+        self.listener_profiler = None
+        self.loop_lag_monitor  = None
+
+    def enable_metrics(self, metrics=None):
+        """Enables recording traffic metrics.
+
+        Parameters
+        ----------
+        metrics : :class:`~.Metrics` or ``None``
+            The metrics to record into.
+
+            If ``None``, then new metrics are created.
+
+        Returns
+        -------
+        :class:`~.Metrics`
+            The metrics being recorded into.
+        """
+
+        if metrics is None:
+            from ..stats import Metrics
+
+            metrics = Metrics()
+
+        self.metrics = metrics
+
+        return metrics
+
+    def disable_metrics(self):
+        """Disables recording traffic metrics."""
+
+        self.metrics = None
+
+    def _timed(self, name, packet_cls, direction):
+        # Records the time taken by the body of a
+        # 'with' statement, if metrics are enabled.
+
+        metrics = self.metrics
+        if metrics is None:
+            return _NOT_TIMED
+
+        return metrics.timing(name, packet_cls, direction)
+
+    def enable_listener_profiling(self, profiler=None, **kwargs):
+        """Enables profiling the time taken by each listener.
+
+        Parameters
+        ----------
+        profiler : :class:`~.ListenerProfiler` or ``None``
+            The profiler to record into.
+
+            If ``None``, then a new profiler is created.
+        **kwargs
+            Passed to :class:`~.ListenerProfiler` when creating a new profiler.
+
+        Returns
+        -------
+        :class:`~.ListenerProfiler`
+            The profiler being recorded into.
+        """
+
+        if profiler is None:
+            from ..stats import ListenerProfiler
+
+            profiler = ListenerProfiler(**kwargs)
+
+        self.listener_profiler = profiler
+
+        return profiler
+
+    def disable_listener_profiling(self):
+        """Disables profiling the time taken by each listener."""
+
+        self.listener_profiler = None
+
+    def enable_loop_lag_monitor(self, monitor=None, **kwargs):
+        """Enables monitoring the lag of the event loop.
+
+        The monitor is run by :meth:`start`, and so this
+        should be called before the handler is started.
+
+        Parameters
+        ----------
+        monitor : :class:`~.LoopLagMonitor` or ``None``
+            The monitor to use.
+
+            If ``None``, then a new monitor is created.
+        **kwargs
+            Passed to :class:`~.LoopLagMonitor` when creating a new monitor.
+
+        Returns
+        -------
+        :class:`~.LoopLagMonitor`
+            The monitor being used.
+        """
+
+        if monitor is None:
+            from ..stats import LoopLagMonitor
+
+            monitor = LoopLagMonitor(**kwargs)
+
+        self.loop_lag_monitor = monitor
+
+        return monitor
+
+    def disable_loop_lag_monitor(self):
+        """Disables monitoring the lag of the event loop."""
+
+        self.loop_lag_monitor = None
+
+    @contextlib.asynccontextmanager
+    async def _monitoring_loop_lag(self):
+        if self.loop_lag_monitor is None:
+            yield
+
+            return
+
+        task = asyncio.create_task(self.loop_lag_monitor.run())
+
+        try:
+            yield
+
+        finally:
+            task.cancel()
+
+            try:
+                await task
+
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self):
+        """Gets a snapshot of the handler's statistics.
+
+        Returns
+        -------
+        :class:`dict`
+            The statistics as plain data.
+        """
+
+        stats = {}
+
+        if self.metrics is not None:
+            stats["metrics"] = self.metrics.snapshot()
+
+        if self.listener_profiler is not None:
+            stats["listeners"] = self.listener_profiler.snapshot()
+
+        if self.loop_lag_monitor is not None:
+            stats["loop_lag"] = self.loop_lag_monitor.snapshot()
+
+        return stats
+
+    def register_packet_listener(self, listener, *packet_types, **flags):
+        super().register_packet_listener(listener, *packet_types, **flags)
+
+        self._listener_cache.clear()
+
+    def unregister_packet_listener(self, listener):
+        super().unregister_packet_listener(listener)
+
+        self._listener_cache.clear()
+
+    def listeners_for_packet(self, packet, **flags):
+        # NOTE: Listeners for packet classes are not
+        # cached since they are very rarely requested.
+        if isinstance(packet, type):
+            return super().listeners_for_packet(packet, **flags)
+
+        try:
+            key = (type(packet), tuple(flags.items()))
+
+            listeners = self._listener_cache.get(key)
+
+        except TypeError:
+            # Unhashable flags.
+            return super().listeners_for_packet(packet, **flags)
+
+        if listeners is None:
+            # NOTE: Real listeners only depend on the
+            # type of the packet, and so may be cached.
+            listeners = tuple(super().listeners_for_packet(packet, **flags))
+
+            self._listener_cache[key] = listeners
+
+        return list(listeners)
+
+    def has_packet_listener(self, packet, **flags):
+        if isinstance(packet, type):
+            return super().has_packet_listener(packet, **flags)
+
+        return len(self.listeners_for_packet(packet, **flags)) > 0
+
+    async def _timed_listener(self, listener, *args):
+        # NOTE: The packet is always the last argument.
+        packet_cls = type(args[-1])
+
+        monitor = self.loop_lag_monitor
+        if monitor is not None:
+            token = monitor.listener_started(listener, packet_cls)
+
+        start = time.perf_counter_ns()
+
+        try:
+            return await listener(*args)
+
+        finally:
+            duration = time.perf_counter_ns() - start
+
+            if monitor is not None:
+                monitor.listener_finished(token, duration)
+
+            # NOTE: These may have been disabled while we ran.
+            if self.metrics is not None:
+                # Listeners are not told the direction of the
+                # packet, and so their timings have none.
+                self.metrics.record_time(self.metrics.LISTENER, packet_cls, None, duration)
+
+            if self.listener_profiler is not None:
+                self.listener_profiler.record(listener, packet_cls, duration)
+
+    def _timed_listeners(self, listeners):
+        return [functools.partial(self._timed_listener, listener) for listener in listeners]
+
+    async def _await_listeners(self, listeners, *args):
+        # NOTE: Listeners are awaited inline, without
+        # creating a task per listener. When there are
+        # several listeners, they are still run concurrently.
+
+        if len(listeners) <= 0:
+            return []
+
+        if self.metrics is not None or self.listener_profiler is not None or self.loop_lag_monitor is not None:
+            listeners = self._timed_listeners(listeners)
+
+        if len(listeners) == 1:
+            return [await listeners[0](*args)]
+
+        return await asyncio.gather(*[listener(*args) for listener in listeners])
+
+    async def _dispatch_to_listeners(self, listeners, *args, listen_sequentially):
+        if len(listeners) <= 0:
+            return
+
+        if listen_sequentially:
+            await self._await_listeners(listeners, *args)
+
+            return
+
+        if self.metrics is not None or self.listener_profiler is not None or self.loop_lag_monitor is not None:
+            listeners = self._timed_listeners(listeners)
+
+        async with self.listener_task_group(listen_sequentially=False) as group:
+            for listener in listeners:
+                group.create_task(listener(*args))
@@ -0,0 +1,298 @@
+r"""Pluggable transports for opening and serving connections."""
+
+import asyncio
+import itertools
+
+from public import public
+
+@public
+class Transport:
+    """How connections are opened and served.
+
+    Handlers such as :class:`~.Client`, :class:`~.Proxy` and
+    :class:`~.MinimalServer` open and serve their connections
+    through a transport, so that they may be wired together
+    without sockets by using a :class:`MemoryTransport`.
+    """
+
+    async def start_server(self, client_connected_cb, host, port):
+        """Starts serving connections.
+
+        Parameters
+        ----------
+        client_connected_cb : coroutine function
+            Called with the reader and writer of each new connection.
+        host : :class:`str` or ``None``
+            The address to serve on.
+        port : :class:`int`
+            The port to serve on.
+
+            If ``0``, then a free port is chosen.
+
+        Returns
+        -------
+        :class:`asyncio.Server` or alike
+            The server, which is serving once returned.
+        """
+
+        raise NotImplementedError
+
+    async def open_connection(self, host, port):
+        """Opens a connection.
+
+        Parameters
+        ----------
+        host : :class:`str`
+            The address to connect to.
+        port : :class:`int`
+            The port to connect to.
+
+        Returns
+        -------
+        pair of :class:`asyncio.StreamReader` and :class:`asyncio.StreamWriter` or alike
+            The reader and writer of the connection.
+        """
+
+        raise NotImplementedError
+
+@public
+class TCPTransport(Transport):
+    """A :class:`Transport` over TCP sockets.
+
+    This is what handlers use by default.
+    """
+
+    async def start_server(self, client_connected_cb, host, port):
+        return await asyncio.start_server(client_connected_cb, host, port)
+
+    async def open_connection(self, host, port):
+        return await asyncio.open_connection(host, port)
+
+class _MemoryPipe:
+    # One direction of an in-memory connection.
+    #
+    # This acts as the transport of the reader it feeds,
+    # so that the reader pausing and resuming its reading
+    # applies backpressure to the writer feeding it.
+
+    def __init__(self, reader):
+        self.reader = reader
+
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+        self.closed = False
+
+        reader.set_transport(self)
+
+    def pause_reading(self):
+        self.writable.clear()
+
+    def resume_reading(self):
+        self.writable.set()
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+
+        self.reader.feed_eof()
+
+        # NOTE: Nothing more will be read, so
+        # we release any writer waiting to drain.
+        self.writable.set()
+
+@public
+class MemoryStreamWriter:
+    """An :class:`asyncio.StreamWriter` which writes to an in-memory connection.
+
+    .. note::
+
+        Like :class:`pak.io.ByteStreamWriter`, this does
+        not inherit from :class:`asyncio.StreamWriter`,
+        but has the same API and semantics.
+
+    Closing the writer closes both directions of
+    the connection, just as closing a socket would.
+    Data written once the connection is closed is
+    discarded.
+    """
+
+    def __init__(self, outgoing, incoming, *, sockname, peername):
+        self._outgoing = outgoing
+        self._incoming = incoming
+
+        self._extra_info = dict(
+            sockname = sockname,
+            peername = peername,
+        )
+
+        self._closed = asyncio.Event()
+
+    def get_extra_info(self, name, default=None):
+        return self._extra_info.get(name, default)
+
+    def write(self, data):
+        if self._outgoing.closed:
+            return
+
+        self._outgoing.reader.feed_data(data)
+
+    def writelines(self, data):
+        self.write(b"".join(data))
+
+    def can_write_eof(self):
+        return True
+
+    def write_eof(self):
+        self._outgoing.close()
+
+    async def drain(self):
+        # NOTE: Like 'asyncio.StreamWriter', we
+        # only yield when we need to wait.
+        if not self._outgoing.writable.is_set():
+            await self._outgoing.writable.wait()
+
+    def close(self):
+        self._outgoing.close()
+        self._incoming.close()
+
+        self._closed.set()
+
+    def is_closing(self):
+        return self._closed.is_set()
+
+    async def wait_closed(self):
+        await self._closed.wait()
+
+class _MemorySocket:
+    # Stands in for the socket of a 'MemoryServer'.
+
+    def __init__(self, address):
+        self._address = address
+
+    def getsockname(self):
+        return self._address
+
+@public
+class MemoryServer:
+    """An :class:`asyncio.Server` which serves in-memory connections.
+
+    Made by :meth:`MemoryTransport.start_server`.
+    """
+
+    def __init__(self, transport, client_connected_cb, address):
+        self.transport = transport
+        self.address   = address
+
+        self.sockets = [_MemorySocket(address)]
+
+        self._client_connected_cb = client_connected_cb
+
+        self._closed = asyncio.Event()
+        self._tasks  = set()
+
+    def _accept(self, reader, writer):
+        task = asyncio.create_task(self._client_connected_cb(reader, writer))
+
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def is_serving(self):
+        return not self._closed.is_set()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+
+        self.transport._servers.pop(self.address, None)
+
+        self._closed.set()
+
+    async def wait_closed(self):
+        await self._closed.wait()
+
+    async def start_serving(self):
+        pass
+
+    async def serve_forever(self):
+        try:
+            await self._closed.wait()
+
+        except asyncio.CancelledError:
+            # NOTE: 'asyncio.Server' is closed
+            # when 'serve_forever' is cancelled.
+            self.close()
+
+            raise
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+        await self.wait_closed()
+
+@public
+class MemoryTransport(Transport):
+    """A :class:`Transport` over in-memory connections.
+
+    Connections are only made between handlers sharing
+    the same :class:`MemoryTransport`, and data is passed
+    between them without ever reaching the kernel, so that
+    the throughput of the protocol and packet dispatch can
+    be measured on its own, and large simulations may be
+    run in a single process.
+
+    Servers started on the ``None`` host may be connected
+    to on any host.
+    """
+
+    # The ports chosen for servers started on port '0', and
+    # for the local ends of connections, like ephemeral ports.
+    FIRST_EPHEMERAL_PORT = 49152
+
+    def __init__(self):
+        # Maps addresses to the servers serving on them.
+        self._servers = {}
+
+        self._ephemeral_ports = itertools.count(self.FIRST_EPHEMERAL_PORT)
+
+    async def start_server(self, client_connected_cb, host, port):
+        if port == 0:
+            port = next(self._ephemeral_ports)
+
+        address = (host, port)
+        if address in self._servers:
+            raise OSError(f"Address already in use: {address}")
+
+        server = MemoryServer(self, client_connected_cb, address)
+
+        self._servers[address] = server
+
+        return server
+
+    async def open_connection(self, host, port):
+        server = self._servers.get((host, port))
+        if server is None:
+            server = self._servers.get((None, port))
+
+        if server is None:
+            raise ConnectionRefusedError(f"Nothing is serving on address {(host, port)}")
+
+        client_address = ("127.0.0.1", next(self._ephemeral_ports))
+        server_address = (host, port)
+
+        client_reader = asyncio.StreamReader()
+        server_reader = asyncio.StreamReader()
+
+        clientbound = _MemoryPipe(client_reader)
+        serverbound = _MemoryPipe(server_reader)
+
+        client_writer = MemoryStreamWriter(serverbound, clientbound, sockname=client_address, peername=server_address)
+        server_writer = MemoryStreamWriter(clientbound, serverbound, sockname=server_address, peername=client_address)
+
+        server._accept(server_reader, server_writer)
+
+        return client_reader, client_writer
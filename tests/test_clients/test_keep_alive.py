@@ -0,0 +1,109 @@
+import asyncio
+import random
+import pak
+import caseus
+
+def _connection(secrets=None):
+    if secrets is None:
+        secrets = caseus.Secrets()
+
+    return caseus.Client.BaseConnection(secrets=secrets, reader=asyncio.StreamReader(), writer=pak.io.ByteStreamWriter())
+
+class _Client:
+    def __init__(self):
+        # The satellite connection starts as the main connection.
+        self.main      = _connection()
+        self.satellite = self.main
+
+    def keep_alives_written(self):
+        frame = self.main._packet_frame(caseus.serverbound.KeepAlivePacket(), fingerprint=0)
+
+        return len(self.main.writer.written_data) // len(frame)
+
+def test_keep_alive_scheduler():
+    async def main():
+        scheduler = caseus.clients.KeepAliveScheduler()
+
+        first  = _Client()
+        second = _Client()
+
+        scheduler.register(first)
+        task = scheduler._task
+
+        scheduler.register(second)
+        assert scheduler._task is task
+
+        await scheduler.tick()
+
+        # Both keep alive packets go to the main connection.
+        for client in (first, second):
+            assert client.keep_alives_written() == 2
+
+        scheduler.unregister(first)
+        assert scheduler._task is task
+
+        await scheduler.tick()
+
+        assert first.keep_alives_written()  == 2
+        assert second.keep_alives_written() == 4
+
+        scheduler.unregister(second)
+        assert scheduler._task is None
+
+        await asyncio.sleep(0)
+        assert task.done()
+
+    asyncio.run(main())
+
+def test_keep_alive_scheduler_jitter():
+    assert caseus.clients.KeepAliveScheduler(interval=15)._next_delay() == 15
+
+    scheduler = caseus.clients.KeepAliveScheduler(interval=15, jitter=5)
+
+    random.seed(0)
+    delays = [scheduler._next_delay() for _ in range(1000)]
+
+    assert all(10 <= delay <= 20 for delay in delays)
+    assert len(set(delays)) > 1
+
+    # Delays are never negative.
+    scheduler = caseus.clients.KeepAliveScheduler(interval=1, jitter=5)
+    assert all(scheduler._next_delay() >= 0 for _ in range(1000))
+
+def test_frame_cache():
+    async def main():
+        packet = caseus.serverbound.KeepAlivePacket()
+        packet.make_immutable()
+
+        cache = {}
+
+        connection = _connection()
+        connection.fingerprint = 10
+
+        await connection.write_packet_instance(packet, frame_cache=cache)
+
+        frame = connection._packet_frame(packet, fingerprint=10)
+        assert cache == {(connection.ctx, 10): frame}
+
+        # The next fingerprint misses.
+        await connection.write_packet_instance(packet, frame_cache=cache)
+        assert len(cache) == 2
+
+        # The same fingerprint and context hit.
+        cache[(connection.ctx, 10)] = b"cached"
+
+        connection.fingerprint = 10
+        await connection.write_packet_instance(packet, frame_cache=cache)
+
+        assert connection.writer.written_data.endswith(b"cached")
+
+        # A different context misses.
+        other = _connection(caseus.Secrets(game_version=1))
+        other.fingerprint = 10
+
+        await other.write_packet_instance(packet, frame_cache=cache)
+
+        assert len(cache) == 3
+        assert other.writer.written_data == cache[(other.ctx, 10)] != b"cached"
+
+    asyncio.run(main())
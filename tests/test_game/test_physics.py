@@ -0,0 +1,72 @@
+import pytest
+import caseus
+
+np = pytest.importorskip("numpy")
+
+def _movement(session_id, x, y, velocity_x=0, velocity_y=0):
+    return caseus.clientbound.PlayerMovementPacket(
+        session_id = session_id,
+        x          = x,
+        y          = y,
+        velocity_x = velocity_x,
+        velocity_y = velocity_y,
+    )
+
+def test_room_physics_state():
+    state = caseus.game.RoomPhysicsState(own_session_id=3, capacity=1)
+
+    state.apply(_movement(1, 100, 200, velocity_x=1), now=0)
+    state.apply(_movement(2, 400, 200),               now=0)
+    state.apply(_movement(3, 110, 200, velocity_y=-2), now=0)
+
+    assert len(state) == 3
+    assert state.session_ids.tolist() == [1, 2, 3]
+
+    state.apply(caseus.clientbound.SetFacingPacket(session_id=2, facing_right=False))
+    assert state.facing_right.tolist() == [True, False, True]
+
+    # Players are only tracked once their position is known.
+    state.apply(caseus.clientbound.SetFacingPacket(session_id=4, facing_right=False))
+    assert 4 not in state
+    assert len(state) == 3
+
+    assert sorted(state.within_radius(100, 200, 20).tolist()) == [1, 3]
+
+    # One meter per second for a second is thirty pixels.
+    assert state.extrapolate(1).tolist() == [[130, 200], [400, 200], [110, 140]]
+    assert state.within_radius(100, 200, 20, now=1, extrapolate=True).tolist() == []
+
+    state.apply(
+        caseus.clientbound.MovePlayerPacket(
+            x                 = 10,
+            y                 = -10,
+            position_relative = True,
+            velocity_x        = 5,
+            velocity_relative = False,
+        ),
+
+        now = 1,
+    )
+
+    assert state.positions[state.slot(3)].tolist()  == [120, 190]
+    assert state.velocities[state.slot(3)].tolist() == [5, -2]
+
+    state.apply(caseus.clientbound.PlayerVictoryPacket(session_id=1))
+
+    assert 1 not in state
+    assert state.session_ids.tolist() == [3, 2]
+    assert state.slot(3) == 0
+
+    state.apply(caseus.clientbound.PlayerDiedPacket(2, 0, 0, caseus.enums.DeathType.Normal))
+
+    assert state.session_ids.tolist() == [3]
+
+    state.apply(caseus.clientbound.NewRoundPacket())
+    assert len(state) == 0
+
+    # A relative move of the untracked own player is ignored.
+    state.apply(caseus.clientbound.MovePlayerPacket(x=10, y=10, position_relative=True))
+    assert len(state) == 0
+
+    state.apply(caseus.clientbound.MovePlayerPacket(x=10, y=10, position_relative=False))
+    assert state.positions.tolist() == [[10, 10]]
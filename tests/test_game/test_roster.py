@@ -0,0 +1,37 @@
+import caseus
+
+def _info(session_id, username, score):
+    return caseus.PlayerInfo(session_id=session_id, username=username, score=score)
+
+def test_roster():
+    roster = caseus.game.Roster()
+
+    roster.apply(caseus.clientbound.SetPlayerListPacket(players=[
+        _info(1, "Cheese#0001", 10),
+        _info(2, "Mouse#0002",  30),
+        _info(3, "Shaman#0003", 20),
+    ]))
+
+    assert len(roster) == 3
+    assert roster.get_by_username("mouse#0002").session_id == 2
+    assert [player.session_id for player in roster.by_score()] == [2, 3, 1]
+
+    roster.apply(caseus.clientbound.SetPlayerScorePacket(session_id=1, score=40))
+    assert [player.session_id for player in roster.top(2)] == [1, 2]
+    assert roster.rank(3) == 2
+
+    roster.apply(caseus.clientbound.UpdatePlayerListPacket(player=_info(4, "New#0004", 30)))
+    assert [player.session_id for player in roster.by_score()] == [1, 2, 4, 3]
+
+    roster.apply(caseus.clientbound.SetShamanPacket(session_id=3))
+    roster.apply(caseus.clientbound.SetCheesesPacket(session_id=2, cheeses=1))
+    assert roster.shamans == [roster.get(3)]
+    assert roster.get(2).cheeses == 1
+
+    roster.apply(caseus.clientbound.PlayerDiedPacket(2, 0, 31, caseus.enums.DeathType.Normal))
+    assert not roster.get(2).alive
+    assert roster.rank(2) == 1
+
+    assert roster.remove(1).username == "Cheese#0001"
+    assert roster.get_by_username("Cheese#0001") is None
+    assert [player.session_id for player in roster.by_score()] == [2, 4, 3]
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+# Budgets in microseconds for the cumulative
+# import time of modules, with generous headroom.
+IMPORT_TIME_BUDGETS = {
+    "import caseus":         ("caseus",         50_000),
+    "import caseus.packets": ("caseus.packets", 750_000),
+}
+
+def _import_times(statement):
+    # NOTE: A fresh interpreter is needed so that nothing is already imported.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+
+        capture_output = True,
+        text           = True,
+        check          = True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, module = line[len("import time:"):].split("|")
+
+        times[module.strip()] = int(cumulative)
+
+    return times
+
+def test_lazy_imports():
+    times = _import_times("import caseus")
+
+    for module in ("caseus.packets", "caseus.clients", "aiohttp", "aioconsole"):
+        assert module not in times
+
+def test_import_time_budget():
+    for statement, (module, budget) in IMPORT_TIME_BUDGETS.items():
+        assert _import_times(statement)[module] < budget
+
+def test_star_import():
+    namespace = {}
+    exec("from caseus import *", namespace)
+
+    for name in ("Client", "Proxy", "Secrets", "MinimalServer", "packets", "clientbound", "ClientboundPacket", "LazyLoadShopPacket"):
+        assert name in namespace
@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+import caseus.loadtest
+import caseus.util
+
+@pytest.mark.parametrize("proxy", [False, True])
+@pytest.mark.parametrize("transport", [None, caseus.util.MemoryTransport])
+def test_local_load_test(proxy, transport):
+    if transport is not None:
+        transport = transport()
+
+    report = asyncio.run(caseus.loadtest.local_load_test(
+        proxy     = proxy,
+        transport = transport,
+
+        num_clients   = 10,
+        connect_rate  = 100,
+        duration      = 0.5,
+        movement_rate = 20,
+        chat_rate     = 10,
+    ))
+
+    assert report.failed    == 0
+    assert report.logged_in == 10
+
+    for stage in report.STAGES:
+        assert report.latencies[stage].count > 0
+
+    # Each client sends at least its handshake, system information, and login.
+    assert report.packets_sent     > 10 * 3
+    assert report.packets_received >= report.latencies[report.CHAT].count
+
+    assert report.snapshot()["logged_in"] == 10
+    assert "chat" in report.format()
@@ -0,0 +1,78 @@
+import pytest
+import pak
+import caseus
+
+np = pytest.importorskip("numpy")
+
+def _object_sync(*, removing):
+    return caseus.clientbound.ObjectSyncPacket(
+        objects = [
+            caseus.ClientboundObjectInfo(
+                object_id        = 1,
+                shaman_object_id = 3,
+                attributes       = caseus.ClientboundObjectInfo.Attributes(
+                    x                = 30,
+                    y                = -0.3,
+                    velocity_x       = 1.5,
+                    velocity_y       = -2,
+                    rotation         = 2.5,
+                    angular_velocity = -0.25,
+                    mice_collidable  = False,
+                    inactive         = True,
+                ),
+                add_if_missing = True,
+            ),
+
+            caseus.ClientboundObjectInfo(
+                object_id        = 2,
+                shaman_object_id = -1 if removing else 4,
+            ),
+
+            caseus.ClientboundObjectInfo(
+                object_id        = 3,
+                shaman_object_id = 5,
+            ),
+        ],
+    )
+
+@pytest.mark.parametrize("removing", [False, True])
+def test_columnar_object_sync(removing):
+    packet = _object_sync(removing=removing)
+    body   = packet.pack_without_header()
+
+    columnar = caseus.packets.ColumnarObjectSyncPacket.from_object_sync(packet)
+
+    objects = columnar.objects
+    assert objects.dtype == caseus.packets.object_info_dtype()
+
+    assert objects["object_id"].tolist()        == [1, 2, 3]
+    assert objects["shaman_object_id"].tolist() == [3, -1 if removing else 4, 5]
+
+    assert objects[0]["x"]                == pytest.approx(30)
+    assert objects[0]["y"]                == pytest.approx(-0.3)
+    assert objects[0]["velocity_y"]       == pytest.approx(-2)
+    assert objects[0]["angular_velocity"] == pytest.approx(-0.25)
+    assert objects[0]["inactive"]
+    assert objects[0]["add_if_missing"]
+
+    assert columnar.pack_without_header()               == body
+    assert columnar.object_sync().pack_without_header() == body
+
+def test_columnar_object_sync_truncated():
+    body = _object_sync(removing=True).pack_without_header()
+
+    with pytest.raises(pak.util.BufferOutOfDataError):
+        caseus.packets.ColumnarObjectSyncPacket.unpack(body[:-1])
+
+def test_columnar_object_sync_read_only():
+    packet = caseus.packets.ColumnarObjectSyncPacket.unpack(_object_sync(removing=False).pack_without_header())
+    packet.make_immutable()
+
+    with pytest.raises(ValueError):
+        packet.objects["x"] = 0
+
+    copy = packet.copy()
+    copy.objects["x"] = 0
+
+    assert (copy.objects["x"] == 0).all()
+    assert packet.objects[0]["x"] == pytest.approx(30)
@@ -0,0 +1,67 @@
+import pytest
+import pak
+import caseus
+
+LoadShopPacket = caseus.clientbound.LoadShopPacket
+
+def _load_shop():
+    return LoadShopPacket(
+        cheese  = 1234,
+        fraises = 56,
+
+        owned_items = [
+            LoadShopPacket.OwnedShopItemInfo(unique_id=1,   colors=[0xFF0000, -1]),
+            LoadShopPacket.OwnedShopItemInfo(unique_id=300, favorited=True),
+        ],
+
+        items = [
+            LoadShopPacket.ItemInfo(item_id=1, cheese_cost=20, needed_item=5),
+            LoadShopPacket.ItemInfo(item_id=2, cheese_cost=40),
+        ],
+
+        outfits            = [LoadShopPacket.OutfitInfo(outfit_id=1, look="1;0")],
+        owned_outfit_looks = ["1;0", "2;0"],
+
+        owned_shaman_objects = [
+            LoadShopPacket.OwnedShamanObjectInfo(shaman_object_id=1, equipped=True,  colors=None),
+            LoadShopPacket.OwnedShamanObjectInfo(shaman_object_id=2, equipped=False, colors=[1, 2]),
+        ],
+
+        shaman_objects = [LoadShopPacket.ShamanObjectInfo(shaman_object_id=101, cheese_cost=10)],
+
+        emojis          = [LoadShopPacket.EmojiInfo(emoji_id=1, fraise_cost=-1)],
+        owned_emoji_ids = [1, 1000],
+
+        banners           = [LoadShopPacket.BannerInfo(banner_id=3, cheese_cost=200)],
+        owned_banner_ids  = [3],
+        current_banner_id = 3,
+    )
+
+def test_lazy_load_shop():
+    packet = _load_shop()
+    body   = packet.pack_without_header()
+
+    lazy = caseus.packets.LazyLoadShopPacket.unpack(body)
+
+    assert lazy.cheese  == 1234
+    assert lazy.fraises == 56
+
+    assert len(lazy.items) == 2
+    assert not lazy.items.decoded
+
+    assert [item.cheese_cost for item in lazy.items] == [20, 40]
+    assert not lazy.items.decoded
+
+    assert lazy.items[0].needed_item == 5
+    assert lazy.items.decoded
+
+    for attr in ("owned_items", "outfits", "owned_outfit_looks", "owned_shaman_objects", "shaman_objects", "emojis", "owned_emoji_ids", "banners", "owned_banner_ids"):
+        assert getattr(lazy, attr) == getattr(packet, attr)
+
+    assert lazy.current_banner_id == 3
+
+    assert lazy.pack_without_header() == body
+    assert lazy.load_shop() == LoadShopPacket.unpack(body)
+
+    with pytest.raises(pak.util.BufferOutOfDataError):
+        caseus.packets.LazyLoadShopPacket.unpack(body[:30])
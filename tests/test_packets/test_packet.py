@@ -1,6 +1,127 @@
+import pytest
+import pak
 import caseus
 
 def test_packet_suffix():
     for parent_cls in (caseus.Packet, caseus.TribullePacket, caseus.LegacyPacket, caseus.ExtensionPacket):
         for packet_cls in parent_cls.subclasses():
             assert packet_cls.__qualname__.endswith("Packet")
+
+def test_immutable_view():
+    packet = caseus.serverbound.RoomMessagePacket(message="message", fingerprint=1)
+
+    view = caseus.packets.immutable_view(packet, fingerprint=2)
+    assert view.message     == "message"
+    assert view.fingerprint == 2
+
+    with pytest.raises(AttributeError):
+        view.message = "changed"
+
+    packet.message = "changed"
+    assert view.message == "message"
+
+    copy = view.copy(message="copied")
+    assert copy.message == "copied"
+    assert view.message == "message"
+
+def test_immutable_view_nested():
+    packet = caseus.clientbound.ChangeSatelliteServerPacket(auth_id=1, address="address", ports=[1, 2])
+
+    view = caseus.packets.immutable_view(packet)
+    assert view == packet
+
+    # Nested values are not shared.
+    packet.ports.append(3)
+    assert view.ports == [1, 2]
+
+    view.ports.append(4)
+    assert packet.ports == [1, 2, 3]
+
+def test_immutable_view_lazy_copy():
+    packet = caseus.clientbound.ChangeSatelliteServerPacket(auth_id=1, address="address", ports=[1, 2])
+    packet.make_immutable()
+
+    view = caseus.packets.immutable_view(packet)
+
+    # Mutable values are copied once, when first accessed.
+    assert view.ports == [1, 2]
+    assert view.ports is not packet.ports
+    assert view.ports is view.ports
+
+    nested_view = caseus.packets.immutable_view(caseus.packets.immutable_view(packet))
+    assert nested_view == packet
+
+    copy = nested_view.copy(auth_id=2)
+    copy.ports.append(3)
+
+    assert copy.auth_id      == 2
+    assert packet.ports      == [1, 2]
+    assert nested_view.ports == [1, 2]
+
+    class OtherPacket(pak.Packet):
+        values: pak.Int8[None]
+
+    other = OtherPacket(values=[1, 2])
+
+    # Other packets have their values copied upfront.
+    other_view = caseus.packets.immutable_view(other)
+    other.values.append(3)
+
+    assert other_view.values == [1, 2]
+
+def test_packed_body_memoization():
+    ctx    = caseus.Packet.Context()
+    packet = caseus.serverbound.RoomMessagePacket(message="message")
+    packet.make_immutable()
+
+    body = packet.pack_without_header(ctx=ctx)
+    assert packet.pack_without_header(ctx=ctx) is body
+
+    copy = packet.copy(message="changed")
+    assert copy.pack_without_header(ctx=ctx) != body
+
+    copy.message = "changed again"
+    copy.make_immutable()
+    assert copy.pack_without_header(ctx=ctx) == caseus.serverbound.RoomMessagePacket(message="changed again").pack_without_header(ctx=ctx)
+
+    assert packet.immutable_copy(message="changed").pack_without_header(ctx=ctx) != body
+
+    assert caseus.packets.immutable_view(packet).pack_without_header(ctx=ctx) is body
+    assert caseus.packets.immutable_view(packet, message="changed").pack_without_header(ctx=ctx) != body
+
+    # A body memoized while mutable is kept when made immutable,
+    # but forgotten when a field is set.
+    decoded = caseus.serverbound.RoomMessagePacket(message="message")
+    decoded._memoize_packed_body(body, ctx=ctx)
+    decoded.make_immutable()
+
+    assert decoded.pack_without_header(ctx=ctx) is body
+
+    decoded = caseus.serverbound.RoomMessagePacket(message="message")
+    decoded._memoize_packed_body(body, ctx=ctx)
+
+    decoded.message = "changed"
+    decoded.make_immutable()
+
+    assert decoded.pack_without_header(ctx=ctx) == caseus.serverbound.RoomMessagePacket(message="changed").pack_without_header(ctx=ctx)
+
+def test_captcha_image_array():
+    np = pytest.importorskip("numpy")
+
+    packet = caseus.clientbound.CaptchaPacket(
+        info = caseus.clientbound.CaptchaPacket.Info(
+            type   = caseus.enums.CaptchaType.ScaledColors,
+            scale  = 2,
+            width  = 2,
+            height = 2,
+
+            # The last pixel is left uncovered.
+            colors = [-1, 0x7F00FF00, 0],
+        ),
+    )
+
+    # The scaled colors wrap to '0xFFFFFFFE' and '0xFE01FE00'.
+    assert packet.image_array().tolist() == [
+        [[0xFF, 0xFF, 0xFE], [0x01, 0xFE, 0x01]],
+        [[0xFF, 0xFF, 0xFF], [0xFF, 0xFF, 0xFF]],
+    ]
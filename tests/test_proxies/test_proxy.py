@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+import pak
+import caseus
+
+def test_idle_sessions_cpu():
+    async def measure_idle_cpu():
+        proxy = caseus.Proxy(
+            host_address        = "127.0.0.1",
+            host_main_port      = 0,
+            host_satellite_port = 0,
+
+            host_socket_policy_port = None,
+        )
+
+        async with proxy:
+            await proxy.startup()
+
+            # Sessions which have not yet been told what
+            # main server to connect to, and so which have
+            # no server connection to listen to.
+            clients = [
+                proxy.ClientConnection(proxy, reader=asyncio.StreamReader(), writer=pak.io.ByteStreamWriter())
+
+                for _ in range(1000)
+            ]
+
+            listen_tasks = [asyncio.create_task(proxy.listen(client)) for client in clients]
+
+            # Let every session start waiting.
+            await asyncio.sleep(0.1)
+
+            wall_start = time.perf_counter()
+            cpu_start  = time.process_time()
+
+            await asyncio.sleep(0.5)
+
+            cpu_elapsed  = time.process_time()  - cpu_start
+            wall_elapsed = time.perf_counter() - wall_start
+
+            for client in clients:
+                client.close()
+
+            for task in listen_tasks:
+                task.cancel()
+
+            await asyncio.gather(*listen_tasks, return_exceptions=True)
+
+        return cpu_elapsed / wall_elapsed
+
+    assert asyncio.run(measure_idle_cpu()) < 0.1
+
+def test_latency_tracing(tmp_path):
+    async def main():
+        proxy  = caseus.Proxy()
+        tracer = proxy.enable_tracing(sample_interval=2)
+
+        packet = caseus.clientbound.SetFacingPacket(session_id=1, facing_right=True)
+        data   = packet.pack()
+
+        reader = asyncio.StreamReader()
+        reader.feed_data((caseus.types.PacketLength.pack(len(data)) + data) * 4)
+
+        client = proxy.ClientConnection(proxy, reader=asyncio.StreamReader(), writer=pak.io.ByteStreamWriter())
+        server = proxy.ServerConnection(proxy, destination=client, reader=reader, writer=pak.io.ByteStreamWriter())
+
+        client.destination = server
+
+        # A listener which writes its own packet, which should not be traced.
+        @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+        async def listener(source, packet):
+            await source.destination.write_packet(caseus.clientbound.PingPacket)
+
+        proxy.register_packet_listener(listener, caseus.clientbound.SetFacingPacket)
+
+        for _ in range(4):
+            packet = await server._read_next_packet()
+            packet.make_immutable()
+
+            await proxy._listen_to_packet(server, packet)
+
+        return tracer
+
+    tracer = asyncio.run(main())
+
+    stages = {
+        stage
+
+        for stage, packet_cls, direction in tracer.timings
+        if packet_cls is caseus.clientbound.SetFacingPacket and direction == "clientbound"
+    }
+
+    assert stages == {"read", "decode", "listeners", "encode", "write", "total"}
+
+    assert tracer.histogram("total", caseus.clientbound.SetFacingPacket, "clientbound").count == 2
+    assert tracer.histogram("total", caseus.clientbound.PingPacket,      "clientbound") is None
+
+    tracer.dump(tmp_path / "tracing.json")
+
+    dumped = json.loads((tmp_path / "tracing.json").read_text())
+
+    assert dumped["sample_interval"] == 2
+    assert {timing["stage"] for timing in dumped["timings"]} == stages
+
+def test_satellite_handoffs():
+    proxy = caseus.Proxy()
+
+    packets = [
+        caseus.clientbound.ChangeSatelliteServerPacket(auth_id=auth_id, address="10.0.0.3", ports=[5555])
+
+        for auth_id in range(3)
+    ]
+
+    timeout = proxy.SATELLITE_HANDOFF_TIMEOUT
+
+    proxy._add_satellite_handoff(packets[0], "main 0", now=0)
+    proxy._add_satellite_handoff(packets[1], "main 1", now=1)
+    proxy._add_satellite_handoff(packets[2], "main 2", now=2)
+
+    # Handoffs are looked up by auth ID.
+    assert proxy._pop_satellite_handoff(1, now=3) == (packets[1], "main 1")
+    assert proxy._pop_satellite_handoff(1, now=3) == (None, None)
+
+    # Handing off again refreshes the expiry.
+    proxy._add_satellite_handoff(packets[0], "main 0", now=3)
+
+    proxy._expire_satellite_handoffs(timeout + 2)
+    assert list(proxy._satellite_handoffs) == [0]
+
+    assert proxy._pop_satellite_handoff(2, now=timeout + 2) == (None, None)
+    assert proxy._pop_satellite_handoff(0, now=timeout + 3) == (None, None)
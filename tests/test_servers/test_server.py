@@ -0,0 +1,29 @@
+import caseus
+
+def test_keep_alive_wheel():
+    # Four slots, each one second wide.
+    wheel = caseus.MinimalServer._KeepAliveWheel(timeout=3, tick=1)
+
+    wheel.refresh("a", now=0)
+    wheel.refresh("b", now=0)
+
+    assert wheel.pop_expired(now=2.5) == []
+
+    # Refreshing moves a connection's deadline, and removing forgets it.
+    wheel.refresh("a", now=2.5)
+    wheel.remove("b")
+
+    assert wheel.pop_expired(now=4.5) == []
+
+    # The deadline of 5.5 wraps around to the second slot.
+    assert wheel.pop_expired(now=6.5) == ["a"]
+    assert wheel.pop_expired(now=9.5) == []
+
+    # A sweep which lags behind by more than a revolution still finds every deadline.
+    wheel.refresh("c", now=10)
+    wheel.refresh("d", now=11)
+
+    assert sorted(wheel.pop_expired(now=30)) == ["c", "d"]
+
+    # Removing twice is harmless.
+    wheel.remove("c")
@@ -0,0 +1,452 @@
+import asyncio
+import functools
+import platform
+import socket
+import struct
+import pak
+import pytest
+import caseus
+import caseus.sniffers
+
+@pytest.mark.skipif(not hasattr(socket, "AF_PACKET"), reason="Raw packet sockets are only available on Linux")
+def test_raw_socket_capture_loopback():
+    async def main():
+        received = asyncio.Queue()
+
+        async def on_client_connected(reader, writer):
+            writer.write(b"hello")
+            await writer.drain()
+
+            writer.close()
+
+        server = await asyncio.start_server(on_client_connected, "127.0.0.1", 0)
+        port   = server.sockets[0].getsockname()[1]
+
+        capture = caseus.sniffers.RawSocketCapture(received.put_nowait, interface="lo")
+        capture.set_endpoints([("127.0.0.1", [port])])
+
+        try:
+            capture.start()
+
+        except PermissionError:
+            pytest.skip("Raw packet sockets require privileges")
+
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+            assert await reader.read() == b"hello"
+
+            writer.close()
+
+            segments = []
+            while True:
+                segment = await asyncio.wait_for(received.get(), 1)
+                segments.append(segment)
+
+                if len(segment.payload) > 0:
+                    break
+
+            # The SYN is sent to the server.
+            assert segments[0].dst_port == port
+            assert segments[0].flags & caseus.sniffers.TCPSegment.SYN
+
+            assert segment.src_addr == "127.0.0.1"
+            assert segment.src_port == port
+            assert segment.payload  == b"hello"
+
+        finally:
+            capture.stop()
+
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+
+MAIN_SERVER      = ("10.0.0.2", 11801)
+SATELLITE_SERVER = ("10.0.0.3", 5555)
+
+SYN_ACK = 0x12
+
+class _TestSniffer(caseus.sniffers.Sniffer):
+    MAIN_IP_ADDR = MAIN_SERVER[0]
+    MAIN_PORTS   = [MAIN_SERVER[1]]
+
+def _ipv4_tcp(src, dst, seq, payload, *, flags=0x18):
+    (src_addr, src_port), (dst_addr, dst_port) = src, dst
+
+    tcp = struct.pack("!HHIIBBHHH", src_port, dst_port, seq, 0, 5 << 4, flags, 0xFFFF, 0, 0) + payload
+
+    return struct.pack(
+        "!BBHHHBBH4s4s",
+
+        0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0,
+
+        socket.inet_aton(src_addr), socket.inet_aton(dst_addr),
+    ) + tcp
+
+def _packet_stream(*packets):
+    ctx = caseus.Packet.Context()
+
+    stream = b""
+    for packet in packets:
+        data = packet.pack(ctx=ctx)
+
+        # The fingerprint is not included in the packet length.
+        length = len(data)
+        if isinstance(packet, caseus.ServerboundPacket):
+            length -= 1
+
+        stream += caseus.types.PacketLength.pack(length, ctx=pak.Type.Context(ctx=ctx)) + data
+
+    return stream
+
+def _write_pcap(path, segments):
+    with path.open("wb") as f:
+        # Little-endian pcap with raw IP link type.
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 0xFFFF, 101))
+
+        for segment in segments:
+            f.write(struct.pack("<IIII", 0, 0, len(segment), len(segment)) + segment)
+
+def _run_bpf(instructions, packet):
+    # Interprets just the classic BPF that our filters use.
+
+    Capture = caseus.sniffers.RawSocketCapture
+
+    a = x = 0
+    pc = 0
+    while True:
+        code, jt, jf, k = instructions[pc]
+        pc += 1
+
+        if code == Capture._BPF_LD_W_ABS:
+            a = int.from_bytes(packet[k:k + 4], "big")
+        elif code == Capture._BPF_LD_H_ABS:
+            a = int.from_bytes(packet[k:k + 2], "big")
+        elif code == Capture._BPF_LD_B_ABS:
+            a = packet[k]
+        elif code == Capture._BPF_LD_H_IND:
+            a = int.from_bytes(packet[x + k:x + k + 2], "big")
+        elif code == Capture._BPF_LDX_B_MSH:
+            x = (packet[k] & 0xF) * 4
+        elif code == Capture._BPF_JMP_JA:
+            pc += k
+        elif code == Capture._BPF_JMP_JEQ_K:
+            pc += jt if a == k else jf
+        elif code == Capture._BPF_JMP_JSET_K:
+            pc += jt if a & k else jf
+        elif code == Capture._BPF_RET_K:
+            return k
+        else:
+            raise ValueError(f"Unknown opcode: {code:#x}")
+
+def test_compile_filter_many_endpoints():
+    endpoints = [(f"10.1.{i // 250}.{i % 250}", [5000 + i]) for i in range(100)]
+
+    instructions = caseus.sniffers.RawSocketCapture.compile_filter(endpoints)
+
+    # Every jump fits in its instruction.
+    for instruction in instructions:
+        struct.pack("=HBBI", *instruction)
+
+    client = ("10.0.0.1", 4000)
+    for addr, (port,) in endpoints[::33] + endpoints[-1:]:
+        assert _run_bpf(instructions, _ipv4_tcp(client, (addr, port), 0, b"")) > 0
+        assert _run_bpf(instructions, _ipv4_tcp((addr, port), client, 0, b"")) > 0
+
+        assert _run_bpf(instructions, _ipv4_tcp(client, (addr, port + 1), 0, b"")) == 0
+
+    assert _run_bpf(instructions, _ipv4_tcp(client, ("10.2.0.0", 5000), 0, b"")) == 0
+
+    with pytest.raises(ValueError):
+        caseus.sniffers.RawSocketCapture.compile_filter([("10.0.0.1", range(200))])
+
+def test_tcp_reassembler():
+    reassembler = caseus.sniffers.TCPReassembler()
+
+    def feed(seq, payload, flags=0):
+        return reassembler.feed(caseus.sniffers.TCPSegment("a", 1, "b", 2, seq=seq, flags=flags, payload=payload))
+
+    # The sequence number wraps around.
+    assert feed(2**32 - 1, b"", caseus.sniffers.TCPSegment.SYN) == b""
+
+    assert feed(0,  b"abc")    == b"abc"
+    assert feed(6,  b"ghi")    == b""
+    assert feed(0,  b"abc")    == b""
+    assert feed(2,  b"cdef")   == b"defghi"
+    assert feed(12, b"mno")    == b""
+    assert feed(8,  b"ijklmn") == b"jklmno"
+
+    assert reassembler.pending_size == 0
+
+def test_replay_capture_file(tmp_path):
+    packets = [caseus.clientbound.SetFacingPacket(session_id=i, facing_right=True) for i in range(3)]
+    stream  = _packet_stream(*packets)
+
+    client = ("10.0.0.1", 5000)
+
+    # Split the stream into out-of-order and retransmitted segments.
+    isn = 1000
+    _write_pcap(tmp_path / "capture.pcap", [
+        _ipv4_tcp(MAIN_SERVER, client, isn, b"", flags=SYN_ACK),
+
+        _ipv4_tcp(MAIN_SERVER, client, isn + 1 + 10, stream[10:]),
+        _ipv4_tcp(MAIN_SERVER, client, isn + 1,      stream[:12]),
+        _ipv4_tcp(MAIN_SERVER, client, isn + 1,      stream[:12]),
+    ])
+
+    received = []
+
+    async def listener(session, connection, packet):
+        received.append(packet)
+
+    sniffer = _TestSniffer()
+    sniffer.register_packet_listener(listener, caseus.ClientboundPacket)
+
+    asyncio.run(sniffer.replay(tmp_path / "capture.pcap"))
+
+    assert received == packets
+
+def test_multiple_sessions(tmp_path):
+    clients = [("10.0.0.1", 5000), ("10.0.0.1", 5001), ("10.0.0.4", 5000)]
+
+    segments = []
+    for i, client in enumerate(clients):
+        segments.append(_ipv4_tcp(MAIN_SERVER, client, 0, b"", flags=SYN_ACK))
+        segments.append(_ipv4_tcp(MAIN_SERVER, client, 1, _packet_stream(
+            caseus.clientbound.SetFacingPacket(session_id=i, facing_right=True),
+
+            caseus.clientbound.ChangeSatelliteServerPacket(
+                auth_id = i,
+                address = SATELLITE_SERVER[0],
+                ports   = [SATELLITE_SERVER[1]],
+            ),
+        )))
+
+    for i, client in enumerate(clients):
+        satellite_client = (client[0], client[1] + 100)
+
+        segments.append(_ipv4_tcp(satellite_client, SATELLITE_SERVER, 0, b"", flags=caseus.sniffers.TCPSegment.SYN))
+        segments.append(_ipv4_tcp(SATELLITE_SERVER, satellite_client, 0, b"", flags=SYN_ACK))
+        segments.append(_ipv4_tcp(satellite_client, SATELLITE_SERVER, 1, _packet_stream(
+            caseus.serverbound.SatelliteDelayedIdentificationPacket(auth_id=i, fingerprint=0),
+        )))
+        segments.append(_ipv4_tcp(SATELLITE_SERVER, satellite_client, 1, _packet_stream(
+            caseus.clientbound.SetFacingPacket(session_id=i, facing_right=False),
+        )))
+
+    # An unrelated session to a satellite no client was told about.
+    segments.append(_ipv4_tcp(("10.0.0.5", 5000), SATELLITE_SERVER, 0, b"", flags=caseus.sniffers.TCPSegment.SYN))
+
+    _write_pcap(tmp_path / "capture.pcap", segments)
+
+    received = []
+
+    async def listener(session, connection, packet):
+        received.append((session.name, session.main.client_port, session.main.client_addr, packet.session_id, packet.facing_right))
+
+    sniffer = _TestSniffer()
+    sniffer.register_packet_listener(listener, caseus.clientbound.SetFacingPacket)
+
+    asyncio.run(sniffer.replay(tmp_path / "capture.pcap"))
+
+    assert sorted(received) == sorted(
+        [("MAIN",      port, addr, i, True)  for i, (addr, port) in enumerate(clients)] +
+        [("SATELLITE", port, addr, i, False) for i, (addr, port) in enumerate(clients)]
+    )
+
+    assert len(sniffer.sessions) == 6
+
+def test_replay_truncated_packet(tmp_path):
+    client = ("10.0.0.1", 5000)
+    stream = _packet_stream(caseus.clientbound.SetFacingPacket(session_id=1, facing_right=True))
+
+    _write_pcap(tmp_path / "capture.pcap", [
+        _ipv4_tcp(MAIN_SERVER, client, 0, b"", flags=SYN_ACK),
+
+        # Only part of the packet is captured.
+        _ipv4_tcp(MAIN_SERVER, client, 1, stream[:-2]),
+
+        # Could be to a satellite server, so decoding is caught up on.
+        _ipv4_tcp((client[0], 5001), SATELLITE_SERVER, 0, b"", flags=caseus.sniffers.TCPSegment.SYN),
+    ])
+
+    sniffer = _TestSniffer()
+
+    asyncio.run(asyncio.wait_for(sniffer.replay(tmp_path / "capture.pcap"), 5))
+
+def test_shared_ring_buffer():
+    ring = caseus.sniffers.SharedRingBuffer(32)
+
+    try:
+        other = caseus.sniffers.SharedRingBuffer(name=ring.name)
+
+        assert ring.put(b"a" * 10)
+        assert ring.put(b"b" * 10)
+
+        # Not enough room.
+        assert not ring.put(b"c" * 10)
+
+        assert other.get() == b"a" * 10
+
+        # The record wraps around to the start.
+        assert ring.put(b"c" * 10)
+
+        assert other.get() == b"b" * 10
+        assert other.get() == b"c" * 10
+        assert other.get() is None
+
+        ring.count_drop()
+        ring.close_writing()
+
+        assert other.dropped == 1
+        assert other.closed
+
+        other.close()
+
+    finally:
+        ring.close()
+
+class _RecordingSniffer(_TestSniffer):
+    def __init__(self, *, path, **kwargs):
+        super().__init__(**kwargs)
+
+        self.path = path
+
+    @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+    async def _record(self, session, connection, packet):
+        with open(self.path, "a") as f:
+            f.write(f"{session.client_addr}:{session.client_port} {packet.session_id}\n")
+
+def _recorded_segments(clients):
+    segments = []
+    for i, client in enumerate(clients):
+        segments.append(_ipv4_tcp(MAIN_SERVER, client, 0, b"", flags=SYN_ACK))
+        segments.append(_ipv4_tcp(MAIN_SERVER, client, 1, _packet_stream(
+            caseus.clientbound.SetFacingPacket(session_id=i, facing_right=True),
+        )))
+
+    return segments
+
+def test_decode_worker_pool(tmp_path):
+    # Several clients behind the same address.
+    clients = [("10.0.0.10", 5000 + i) for i in range(16)]
+
+    _write_pcap(tmp_path / "capture.pcap", _recorded_segments(clients))
+
+    pool = caseus.sniffers.DecodeWorkerPool(
+        functools.partial(_RecordingSniffer, path=tmp_path / "received.txt"),
+
+        num_workers = 2,
+
+        # Small enough that replaying must wait for room.
+        ring_size = 128,
+    )
+
+    asyncio.run(pool.replay(tmp_path / "capture.pcap"))
+
+    received = (tmp_path / "received.txt").read_text().splitlines()
+
+    assert sorted(received) == sorted(f"{addr}:{port} {i}" for i, (addr, port) in enumerate(clients))
+    assert pool.dropped == 0
+
+def test_decode_worker_pool_weakly_ordered(tmp_path, monkeypatch):
+    monkeypatch.setattr(platform, "machine", lambda: "aarch64")
+
+    clients = [("10.0.0.10", 5000 + i) for i in range(16)]
+
+    _write_pcap(tmp_path / "capture.pcap", _recorded_segments(clients))
+
+    pool = caseus.sniffers.DecodeWorkerPool(
+        functools.partial(_RecordingSniffer, path=tmp_path / "received.txt"),
+
+        num_workers = 2,
+        ring_size   = 128,
+    )
+
+    assert pool.lock_rings
+
+    asyncio.run(pool.replay(tmp_path / "capture.pcap"))
+
+    received = (tmp_path / "received.txt").read_text().splitlines()
+
+    assert sorted(received) == sorted(f"{addr}:{port} {i}" for i, (addr, port) in enumerate(clients))
+    assert pool.dropped == 0
+
+class _PausableCapture(caseus.sniffers.CaptureBackend):
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+def test_decode_worker_pool_block(tmp_path):
+    clients  = [("10.0.0.10", 5000 + i) for i in range(16)]
+    segments = [caseus.sniffers.TCPSegment.from_ipv4(data) for data in _recorded_segments(clients)]
+
+    pool = caseus.sniffers.DecodeWorkerPool(
+        functools.partial(_RecordingSniffer, path=tmp_path / "received.txt"),
+
+        num_workers     = 1,
+        ring_size       = 128,
+        backpressure    = "block",
+        capture_backend = _PausableCapture,
+    )
+
+    async def main():
+        await pool.startup(capture=False)
+
+        paused = False
+
+        try:
+            for segment in segments:
+                # Segments stop being captured while paused.
+                while pool.capture.paused:
+                    paused = True
+
+                    await asyncio.sleep(0.01)
+
+                pool._handle_tcp_segment(segment)
+
+            while pool.capture.paused:
+                await asyncio.sleep(0.01)
+
+        finally:
+            await pool.shutdown()
+
+        return paused
+
+    assert asyncio.run(main())
+
+    received = (tmp_path / "received.txt").read_text().splitlines()
+
+    assert sorted(received) == sorted(f"{addr}:{port} {i}" for i, (addr, port) in enumerate(clients))
+    assert pool.dropped == 0
+
+def test_decode_worker_pool_routing():
+    pool = caseus.sniffers.DecodeWorkerPool(_TestSniffer, num_workers=8, capture_backend=_PausableCapture)
+    pool._main_endpoints.add(MAIN_SERVER)
+
+    def segment(src, dst, *, flags=0x18, payload=b"data"):
+        return caseus.sniffers.TCPSegment.from_ipv4(_ipv4_tcp(src, dst, 0, payload, flags=flags))
+
+    # Main sessions from the same address are sharded by their 4-tuples.
+    main_workers = set()
+    for port in range(5000, 5016):
+        indices = pool._workers_for_segment(segment(("10.0.0.10", port), MAIN_SERVER))
+
+        assert len(indices) == 1
+        assert indices == pool._workers_for_segment(segment(MAIN_SERVER, ("10.0.0.10", port)))
+
+        main_workers.update(indices)
+
+    assert len(main_workers) > 1
+
+    # Satellite connections go to the workers with main sessions from the same address.
+    assert pool._workers_for_segment(segment(("10.0.0.10", 6000), SATELLITE_SERVER, flags=0x02, payload=b"")) == tuple(sorted(main_workers))
+
+    # Reset main sessions are forgotten.
+    for port in range(5000, 5016):
+        pool._workers_for_segment(segment(("10.0.0.10", port), MAIN_SERVER, flags=0x04, payload=b""))
+
+    assert len(pool._workers_for_segment(segment(("10.0.0.10", 6001), SATELLITE_SERVER, flags=0x02, payload=b""))) == 1
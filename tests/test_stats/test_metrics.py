@@ -0,0 +1,228 @@
+import asyncio
+import inspect
+import json
+import random
+import time
+import pak
+import caseus
+
+def test_histogram():
+    histogram = caseus.stats.Histogram()
+
+    values = [random.randrange(1_000_000) for _ in range(10_000)]
+    for value in values:
+        histogram.record(value)
+
+    values.sort()
+
+    assert histogram.count == len(values)
+    assert histogram.min   == values[0]
+    assert histogram.max   == values[-1]
+
+    for percentile in (50, 90, 99):
+        exact = values[int(percentile / 100 * len(values)) - 1]
+
+        assert abs(histogram.percentile(percentile) - exact) <= exact * 2**-histogram.precision_bits
+
+    assert histogram.count_at_or_below(histogram.max) == histogram.count
+
+def test_handler_metrics():
+    async def main():
+        proxy   = caseus.Proxy()
+        metrics = proxy.enable_metrics()
+
+        packet = caseus.clientbound.SetFacingPacket(session_id=1, facing_right=True)
+        data   = packet.pack()
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(caseus.types.PacketLength.pack(len(data)) + data)
+
+        connection = proxy.ServerConnection(proxy, reader=reader, writer=pak.io.ByteStreamWriter())
+
+        assert await connection._read_next_packet() == packet
+
+        received = []
+
+        @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+        async def listener(source, packet):
+            received.append(packet)
+
+        proxy.register_packet_listener(listener, caseus.clientbound.SetFacingPacket)
+
+        await proxy._dispatch_to_listeners(proxy.listeners_for_packet(packet, after=False), connection, packet, listen_sequentially=True)
+
+        assert received == [packet]
+
+        snapshot = proxy.stats()["metrics"]
+
+        assert snapshot["packets"] == [dict(
+            packet    = "caseus.packets.clientbound.main.SetFacingPacket",
+            direction = "incoming",
+            count     = 1,
+            bytes     = len(data),
+        )]
+
+        assert {(timing["name"], timing["direction"]) for timing in snapshot["timings"]} == {
+            ("decode",   "incoming"),
+            ("listener", None),
+        }
+
+        server = await caseus.stats.serve_metrics(metrics, port=0)
+        port   = server.sockets[0].getsockname()[1]
+
+        async def get(path):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+
+            response = await reader.read()
+            writer.close()
+
+            return response.split(b"\r\n\r\n", 1)[1].decode()
+
+        try:
+            text = await get("/metrics")
+
+            assert 'caseus_packets_total{packet="caseus.packets.clientbound.main.SetFacingPacket",direction="incoming"} 1' in text
+            assert 'caseus_decode_seconds_count{packet="caseus.packets.clientbound.main.SetFacingPacket",direction="incoming"} 1' in text
+
+            assert json.loads(await get("/metrics.json"))["packets"][0]["count"] == 1
+
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        proxy.disable_metrics()
+
+        assert proxy.stats() == {}
+
+    asyncio.run(main())
+
+def test_proxy_metrics_both_directions():
+    async def main():
+        proxy   = caseus.Proxy()
+        metrics = proxy.enable_metrics()
+
+        for connection_cls, packet, length_adjustment in [
+            (proxy.ServerConnection, caseus.clientbound.SetFacingPacket(),              0),
+
+            # NOTE: The fingerprint is not included in the packet length.
+            (proxy.ClientConnection, caseus.serverbound.SetFacingPacket(fingerprint=0), 1),
+        ]:
+            data = packet.pack()
+
+            reader = asyncio.StreamReader()
+            reader.feed_data(caseus.types.PacketLength.pack(len(data) - length_adjustment) + data)
+
+            connection = connection_cls(proxy, reader=reader, writer=pak.io.ByteStreamWriter())
+
+            assert await connection._read_next_packet() == packet
+
+        return metrics
+
+    metrics = asyncio.run(main())
+
+    assert {row["packet"] for row in metrics.snapshot()["packets"]} == {
+        "caseus.packets.clientbound.main.SetFacingPacket",
+        "caseus.packets.serverbound.main.SetFacingPacket",
+    }
+
+    samples = [line for line in metrics.prometheus_text().splitlines() if not line.startswith("#")]
+    series  = [line.rsplit(" ", 1)[0] for line in samples]
+
+    assert len(series) == len(set(series))
+
+def test_listener_profiler(caplog):
+    class Handler(caseus.util.AsyncPacketHandler):
+        @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+        async def _fast(self, packet):
+            pass
+
+        @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+        async def _slow(self, packet):
+            time.sleep(0.01)
+
+    async def main():
+        handler  = Handler()
+        profiler = handler.enable_listener_profiling(slow_threshold=0.005)
+
+        packet = caseus.clientbound.SetFacingPacket()
+
+        for _ in range(3):
+            await handler._dispatch_to_listeners(handler.listeners_for_packet(packet), packet, listen_sequentially=True)
+
+        return profiler
+
+    with caplog.at_level("WARNING", logger="caseus.stats.profiler"):
+        profiler = asyncio.run(main())
+
+    top = profiler.top(by="max")
+
+    assert [row["listener"].rsplit(".", 1)[1] for row in top] == ["_slow", "_fast"]
+    assert all(row["count"] == 3 and row["packet"] == "caseus.packets.clientbound.main.SetFacingPacket" for row in top)
+
+    assert len(caplog.records) == 3
+
+    # The listener's source is logged, instead of the dispatcher's stack.
+    message = caplog.records[0].getMessage()
+    assert "Handler._slow" in message
+    assert f"{__file__}:{inspect.getsourcelines(Handler._slow)[1]}-" in message
+    assert caplog.records[0].stack_info is None
+
+    assert "_slow" in profiler.format_top().splitlines()[1]
+
+def test_loop_lag_monitor():
+    class Handler(caseus.util.AsyncPacketHandler):
+        @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+        async def _blocking(self, packet):
+            # Hold up the event loop.
+            time.sleep(0.05)
+
+    async def main():
+        handler = Handler()
+        monitor = handler.enable_loop_lag_monitor(interval=0.01, spike_threshold=0.02)
+
+        async with handler._monitoring_loop_lag():
+            await asyncio.sleep(0.05)
+
+            packet = caseus.clientbound.SetFacingPacket()
+            await handler._dispatch_to_listeners(handler.listeners_for_packet(packet), packet, listen_sequentially=True)
+
+            await asyncio.sleep(0.05)
+
+        return handler
+
+    handler = asyncio.run(main())
+
+    lag = handler.stats()["loop_lag"]
+
+    assert lag["count"] > 0
+
+    # NOTE: There may be other spikes on a busy machine.
+    [spike] = [spike for spike in lag["spikes"] if len(spike["recent_listeners"]) > 0]
+
+    assert spike["lag"] >= 20_000_000
+    assert spike["recent_listeners"][0]["listener"].endswith("_blocking")
+    assert spike["recent_listeners"][0]["packet"] == "caseus.packets.clientbound.main.SetFacingPacket"
+
+def test_loop_lag_monitor_not_running():
+    class Handler(caseus.util.AsyncPacketHandler):
+        @pak.packet_listener(caseus.clientbound.SetFacingPacket)
+        async def _listener(self, packet):
+            pass
+
+    async def main():
+        # The monitor is enabled, but never run.
+        handler = Handler()
+        monitor = handler.enable_loop_lag_monitor()
+
+        packet = caseus.clientbound.SetFacingPacket()
+        for _ in range(100):
+            await handler._dispatch_to_listeners(handler.listeners_for_packet(packet), packet, listen_sequentially=True)
+
+        return monitor
+
+    monitor = asyncio.run(main())
+
+    assert len(monitor._recent) == monitor.SPIKE_LISTENERS
+    assert len(monitor._active) == 0
@@ -0,0 +1,24 @@
+import pak
+import caseus
+
+def test_shifted_string():
+    for game_version in range(5):
+        ctx = pak.Type.Context(ctx=caseus.ServerboundPacket.Context(caseus.Secrets(game_version=game_version, auth_key=0)))
+
+        data = caseus.types.ShiftedString.pack("shifted é", ctx=ctx)
+        assert data[2:] == bytes((byte - game_version) & 0xFF for byte in "shifted é".encode())
+
+        assert caseus.types.ShiftedString.unpack(data, ctx=ctx) == "shifted é"
+
+def test_shifted_string_long():
+    # Beyond 32 KiB, yet within the limit of the length prefix.
+    value = "shifted é" * 3400
+    assert 32 * 1024 <= len(value.encode()) <= 0xFFFF
+
+    for game_version in range(5):
+        ctx = pak.Type.Context(ctx=caseus.ServerboundPacket.Context(caseus.Secrets(game_version=game_version, auth_key=0)))
+
+        data = caseus.types.ShiftedString.pack(value, ctx=ctx)
+        assert data[2:] == bytes((byte - game_version) & 0xFF for byte in value.encode())
+
+        assert caseus.types.ShiftedString.unpack(data, ctx=ctx) == value
@@ -0,0 +1,17 @@
+import caseus
+
+def test_listener_cache_invalidation():
+    handler = caseus.util.AsyncPacketHandler()
+    packet  = caseus.clientbound.PlayerMovementPacket()
+
+    def listener(packet):
+        pass
+
+    assert handler.listeners_for_packet(packet, outgoing=False) == []
+
+    handler.register_packet_listener(listener, caseus.clientbound.PlayerMovementPacket, outgoing=False)
+    assert handler.listeners_for_packet(packet, outgoing=False) == [listener]
+    assert handler.listeners_for_packet(packet, outgoing=True)  == []
+
+    handler.unregister_packet_listener(listener)
+    assert handler.listeners_for_packet(packet, outgoing=False) == []
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+import caseus
+
+def test_memory_transport():
+    async def main():
+        transport = caseus.util.MemoryTransport()
+
+        async def on_client_connected(reader, writer):
+            writer.write(await reader.readexactly(5))
+            await writer.drain()
+
+            # Reads until the client closes.
+            assert await reader.read() == b""
+
+            writer.close()
+            await writer.wait_closed()
+
+        server = await transport.start_server(on_client_connected, None, 0)
+        port   = server.sockets[0].getsockname()[1]
+
+        reader, writer = await transport.open_connection("localhost", port)
+
+        writer.write(b"hello")
+        await writer.drain()
+
+        assert await reader.readexactly(5) == b"hello"
+
+        writer.close()
+        await writer.wait_closed()
+
+        assert await reader.read() == b""
+
+        server.close()
+        await server.wait_closed()
+
+        with pytest.raises(ConnectionRefusedError):
+            await transport.open_connection("localhost", port)
+
+    asyncio.run(main())
+
+def test_memory_transport_backpressure():
+    async def main():
+        transport = caseus.util.MemoryTransport()
+
+        connected = asyncio.Queue()
+
+        async def on_client_connected(reader, writer):
+            await connected.put(reader)
+
+        server = await transport.start_server(on_client_connected, None, 0)
+
+        _, writer = await transport.open_connection("localhost", server.sockets[0].getsockname()[1])
+
+        server_reader = await connected.get()
+
+        writer.write(bytes(1 << 20))
+
+        # The server has not read anything, so we wait to drain.
+        drain_task = asyncio.create_task(writer.drain())
+        await asyncio.sleep(0)
+
+        assert not drain_task.done()
+
+        await server_reader.readexactly(1 << 20)
+        await asyncio.wait_for(drain_task, 1)
+
+        writer.close()
+
+    asyncio.run(main())